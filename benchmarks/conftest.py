@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks.data import BOOKINGS_ENDPOINT, Season, generate_event_items, generate_season
+from snookxporter.clients.google.calendar import GoogleCalendarClient
+from snookxporter.clients.snookapp import SnookAppClient, SnookAppConfig
+from snookxporter.entities import CalendarEvent, Match
+
+SNOOK_APP_CONFIG = SnookAppConfig(base_url="http://snookapp.test", bookings_endpoint=BOOKINGS_ENDPOINT)
+
+
+@pytest.fixture(scope='session')
+def season() -> Season:
+    return generate_season()
+
+
+@pytest.fixture(scope='session')
+def snook_app_client() -> SnookAppClient:
+    return SnookAppClient(config=SNOOK_APP_CONFIG)
+
+
+@pytest.fixture(scope='session')
+def calendars_matches(season: Season, snook_app_client: SnookAppClient) -> list[list[Match]]:
+    return snook_app_client.route_schedule(
+        schedule=season.schedule, calendars_players=[calendar.players for calendar in season.calendars]
+    )
+
+
+@pytest.fixture(scope='session')
+def calendars_event_items(season: Season, calendars_matches: list[list[Match]]) -> dict[str, list[dict]]:
+    return {
+        calendar.id: generate_event_items(matches) for calendar, matches in zip(season.calendars, calendars_matches)
+    }
+
+
+@pytest.fixture(scope='session')
+def calendars_events(season: Season, calendars_event_items: dict[str, list[dict]]) -> list[list[CalendarEvent]]:
+    return [
+        [GoogleCalendarClient._get_calendar_event(item) for item in calendars_event_items[calendar.id]]
+        for calendar in season.calendars
+    ]
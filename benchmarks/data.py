@@ -0,0 +1,161 @@
+"""
+Deterministic generators of season-sized SnookApp payloads and Calendar event lists.
+"""
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from snookxporter.clients.google.calendar import (CONTENT_HASH_PROPERTY, KEY_PROPERTY, MARKER_PROPERTY, MARKER_VALUE,
+                                                  GoogleCalendarConfig)
+from snookxporter.clients.google.rate_limit import RateLimitConfig
+from snookxporter.entities import Match, Player
+from snookxporter.parsing import ISO_DATETIME_FORMAT
+
+FIRST_NAMES = ["Rafał", "Tomasz", "Marty", "Emmet", "Biff", "George", "Lorraine", "Jennifer", "Dave", "Linda",
+               "Ronnie", "Judd", "Mark", "Neil", "Kyren", "Ding", "Shaun", "Ali", "Jack", "Zhao"]
+PAST_DAYS = 120
+SLOT_STARTS = ["10:00", "13:30", "17:00", "20:30"]
+MATCH_HOURS = 3
+BOOKINGS_ENDPOINT = "/api/decider/bookings/club"
+TOKEN = {
+    'token': "token",
+    'refresh_token': "refresh-token",
+    'token_uri': "https://oauth2.googleapis.com/token",
+    'client_id': "client-id",
+    'client_secret': "client-secret",
+    'scopes': ["https://www.googleapis.com/auth/calendar"],
+    'expiry': "2999-01-01T00:00:00.000000Z",
+}  # never expires, so it is never refreshed against Google
+RATE_LIMIT = RateLimitConfig(requests_per_second=None, backoff_base=0.05, backoff_max=1)  # no quota, quick retries
+
+
+@dataclass(frozen=True)
+class Season:
+    players: list[Player]
+    calendars: list[GoogleCalendarConfig]
+    schedule: list[dict]
+
+    @property
+    def bookings(self) -> int:
+        return sum(len(court['bookingItems']) for day in self.schedule for court in day['matchCourts'])
+
+
+def generate_season(
+        players: int = 300,
+        calendars: int = 30,
+        players_per_calendar: int = 10,
+        days: int = 240,
+        tables: int = 8,
+        seed: int = 1955,
+) -> Season:
+    """
+    A season of bookings on every table and slot, starting PAST_DAYS before today so it falls into the synchronized
+    window. Matches before today have results.
+    """
+    rng = random.Random(seed)
+    season_players = generate_players(players)
+    return Season(
+        players=season_players,
+        calendars=generate_calendars(season_players, calendars, players_per_calendar, rng),
+        schedule=generate_schedule(season_players, days, tables, date.today() - timedelta(days=PAST_DAYS), rng),
+    )
+
+
+def generate_players(count: int) -> list[Player]:
+    return [
+        Player(first_name=FIRST_NAMES[i % len(FIRST_NAMES)], last_name=f"Player{i:04d}", alias=f"P{i}")
+        for i in range(count)
+    ]
+
+
+def generate_calendars(
+        players: list[Player], count: int, players_per_calendar: int, rng: random.Random
+) -> list[GoogleCalendarConfig]:
+    return [
+        GoogleCalendarConfig(id=f"calendar-{i:03d}@group.calendar.google.com",
+                             players=rng.sample(players, players_per_calendar))
+        for i in range(count)
+    ]
+
+
+def generate_schedule(players: list[Player], days: int, tables: int, start: date, rng: random.Random) -> list[dict]:
+    today = date.today()
+    schedule = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        courts = []
+        for table in range(1, tables + 1):
+            items = []
+            for slot in SLOT_STARTS:
+                host, guest = rng.sample(players, 2)
+                time_from = datetime.fromisoformat(f"{day.isoformat()}T{slot}")
+                items.append({
+                    'timeFrom': time_from.strftime(ISO_DATETIME_FORMAT),
+                    'timeTo': (time_from + timedelta(hours=MATCH_HOURS)).strftime(ISO_DATETIME_FORMAT),
+                    'match': {
+                        'host': {'firstName': host.first_name, 'lastName': host.last_name},
+                        'guest': {'firstName': guest.first_name, 'lastName': guest.last_name},
+                        'matchResult': {'gamesHost': rng.randint(0, 4), 'gamesGuest': rng.randint(0, 4)}
+                        if day < today else None,
+                    },
+                })
+            courts.append({'type': "SNOOKER_TABLE", 'number': table, 'bookingItems': items})
+        schedule.append({'date': day.isoformat(), 'matchCourts': courts})
+    return schedule
+
+
+def get_bookings_response(schedule: list[dict]) -> dict:
+    return {'bookings': {'days': {'SNOOKER': schedule}}}
+
+
+def generate_event_items(
+        matches: list[Match], missing: float = 0.05, outdated: float = 0.05, stale: float = 0.05, seed: int = 1985
+) -> list[dict]:
+    """
+    Events as listed by the Calendar API for the matches. A share of matches has no event (to be added),
+    a share of events carries an outdated content hash (to be updated) and a share of extra events
+    has no match anymore (to be removed).
+    """
+    rng = random.Random(seed)
+    items = []
+    for i, match in enumerate(matches):
+        if rng.random() < missing:
+            continue
+        items.append(_get_event_item(
+            item_id=f"event{i:06d}",
+            start=match.start,
+            key=match.get_key(),
+            content_hash="outdated" if rng.random() < outdated else match.get_content_hash(),
+        ))
+    for i in range(int(len(matches) * stale)):
+        match = rng.choice(matches)
+        items.append(_get_event_item(
+            item_id=f"stale{i:06d}", start=match.start + timedelta(minutes=15), key=f"stale{i}", content_hash="stale",
+        ))
+    return items
+
+
+def generate_legacy_event_items(matches: list[Match]) -> list[dict]:
+    """
+    Events of the matches as written by versions before the private extended properties, only with a description.
+    """
+    return [
+        {
+            'id': f"legacy{i:06d}",
+            'status': "confirmed",
+            'start': {'dateTime': f"{match.start.strftime(ISO_DATETIME_FORMAT)}+01:00"},
+            'description': match.get_match_calendar_description(),
+        }
+        for i, match in enumerate(matches)
+    ]
+
+
+def _get_event_item(item_id: str, start: datetime, key: str, content_hash: str) -> dict:
+    return {
+        'id': item_id,
+        'status': "confirmed",
+        'start': {'dateTime': f"{start.strftime(ISO_DATETIME_FORMAT)}+01:00"},
+        'extendedProperties': {'private': {
+            MARKER_PROPERTY: MARKER_VALUE, KEY_PROPERTY: key, CONTENT_HASH_PROPERTY: content_hash,
+        }},
+    }
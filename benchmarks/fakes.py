@@ -0,0 +1,133 @@
+"""
+In-process fake of the parts of the Calendar v3 service used by GoogleCalendarClient.
+"""
+import itertools
+from collections.abc import Callable
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from snookxporter.clients.google.formats import GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE
+from snookxporter.parsing import ISO_DATETIME_FORMAT
+
+
+class FakeRequest:
+    def __init__(self, execute: Callable[[], dict | None]):
+        self._execute = execute
+
+    def execute(self) -> dict | None:
+        return self._execute()
+
+
+class FakeBatch:
+    def __init__(self, callback: Callable[[str, dict | None, Exception | None], None]):
+        self.callback = callback
+        self.requests: list[tuple[str, FakeRequest]] = []
+
+    def add(self, request: FakeRequest, request_id: str) -> None:
+        self.requests.append((request_id, request))
+
+    def execute(self) -> None:
+        for request_id, request in self.requests:
+            self.callback(request_id, request.execute(), None)
+
+
+class FakeEvents:
+    """
+    Events of all calendars by id. Every change bumps the calendar version and sync tokens are versions,
+    so incremental listing returns the events changed (or cancelled) since. Private bookkeeping fields
+    of stored events start with an underscore and are never returned. Like Google, times sent without an offset
+    are taken in their timeZone and returned with its offset.
+    """
+    def __init__(self, items: dict[str, list[dict]]):
+        self.calendars: dict[str, dict[str, dict]] = {}
+        self.versions: dict[str, int] = {}
+        self._ids = itertools.count()
+        for calendar_id, calendar_items in items.items():
+            self.calendars[calendar_id] = {}
+            self.versions[calendar_id] = 0
+            for item in calendar_items:
+                self._store(calendar_id, item, version=0)
+
+    def list(self, calendarId: str, maxResults: int, pageToken: str | None = None, syncToken: str | None = None,
+             timeMin: str | None = None, timeMax: str | None = None, privateExtendedProperty: str | None = None,
+             **_) -> FakeRequest:
+        def execute() -> dict:
+            items = list(self.calendars.get(calendarId, {}).values())
+            if privateExtendedProperty is not None:
+                name, value = privateExtendedProperty.split('=', 1)
+                items = [item for item in items
+                         if item.get('extendedProperties', {}).get('private', {}).get(name) == value]
+            if syncToken is not None:
+                items = [item for item in items if item['_version'] > int(syncToken)]
+            else:
+                _from, _to = _parse_time(timeMin, datetime.min), _parse_time(timeMax, datetime.max)
+                items = [item for item in items if item['status'] != 'cancelled' and _from <= item['_start'] <= _to]
+            offset = int(pageToken or 0)
+            page: dict = {'items': [_get_public(item) for item in items[offset:offset + maxResults]]}
+            if offset + maxResults < len(items):
+                page['nextPageToken'] = str(offset + maxResults)
+            else:
+                page['nextSyncToken'] = str(self.versions.get(calendarId, 0))
+            return page
+        return FakeRequest(execute)
+
+    def insert(self, calendarId: str, body: dict) -> FakeRequest:
+        def execute() -> dict:
+            return _get_public(self._store(
+                calendarId, {**_with_offsets(body), 'id': f"fake{next(self._ids):08d}", 'status': "confirmed"}
+            ))
+        return FakeRequest(execute)
+
+    def patch(self, calendarId: str, eventId: str, body: dict) -> FakeRequest:
+        def execute() -> dict:
+            return _get_public(self._store(calendarId, {**self.calendars[calendarId][eventId], **_with_offsets(body)}))
+        return FakeRequest(execute)
+
+    def delete(self, calendarId: str, eventId: str) -> FakeRequest:
+        def execute() -> None:
+            self._store(calendarId, {**self.calendars[calendarId][eventId], 'status': "cancelled"})
+        return FakeRequest(execute)
+
+    def _store(self, calendar_id: str, item: dict, version: int | None = None) -> dict:
+        if version is None:
+            version = self.versions[calendar_id] = self.versions.get(calendar_id, 0) + 1
+        stored = {
+            **item,
+            '_version': version,
+            '_start': datetime.strptime(item['start']['dateTime'][:19], ISO_DATETIME_FORMAT),
+        }
+        self.calendars.setdefault(calendar_id, {})[item['id']] = stored
+        return stored
+
+
+class FakeCalendarService:
+    def __init__(self, items: dict[str, list[dict]] | None = None):
+        self._events = FakeEvents(items or {})
+
+    def events(self) -> FakeEvents:
+        return self._events
+
+    def new_batch_http_request(self, callback) -> FakeBatch:
+        return FakeBatch(callback)
+
+
+def _parse_time(value: str | None, default: datetime) -> datetime:
+    return datetime.strptime(value, GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE) if value else default
+
+
+def _with_offsets(body: dict) -> dict:
+    """
+    The body with dateTime of its start and end in RFC 3339 with an offset, as Calendar v3 returns them.
+    """
+    times = {}
+    for key in ('start', 'end'):
+        if key in body:
+            value = datetime.fromisoformat(body[key]['dateTime'])
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=ZoneInfo(body[key].get('timeZone', 'UTC')))
+            times[key] = {**body[key], 'dateTime': value.isoformat()}
+    return {**body, **times}
+
+
+def _get_public(item: dict) -> dict:
+    return {key: value for key, value in item.items() if not key.startswith('_')}
@@ -0,0 +1,88 @@
+"""
+Compares parsing of SnookApp bookings and Calendar events with the standard library and with snookxporter.parsing.
+
+    poetry run python -m benchmarks.parsing [--items 5000] [--repeat 5]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from snookxporter.clients.google.formats import GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE
+from snookxporter.parsing import ISO_DATETIME_FORMAT, loads, orjson, parse_datetime
+
+SLOT_MINUTES = 30
+TABLES = 8
+
+
+def get_bookings(items: int) -> list[dict]:
+    start = datetime(2024, 9, 1, 10, 0)
+    bookings = []
+    for i in range(items):
+        time_from = start + timedelta(days=i // (TABLES * 24), minutes=SLOT_MINUTES * (i // TABLES % 24))
+        bookings.append({
+            'timeFrom': time_from.strftime(ISO_DATETIME_FORMAT),
+            'timeTo': (time_from + timedelta(hours=3)).strftime(ISO_DATETIME_FORMAT),
+            'match': {'host': {'firstName': f"Host{i % 40}", 'lastName': "Player"},
+                      'guest': {'firstName': f"Guest{i % 40}", 'lastName': "Player"}},
+        })
+    return bookings
+
+
+def get_event_starts(bookings: list[dict]) -> list[str]:
+    return [f"{booking['timeFrom']}+01:00" for booking in bookings]
+
+
+def parse_with_strptime(bookings: list[dict], event_starts: list[str]) -> list[datetime]:
+    parsed = []
+    for booking in bookings:
+        parsed.append(datetime.strptime(booking['timeFrom'], ISO_DATETIME_FORMAT))
+        parsed.append(datetime.strptime(booking['timeTo'], ISO_DATETIME_FORMAT))
+    for start in event_starts:
+        parsed.append(datetime.strptime(start, GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE).replace(tzinfo=None))
+    return parsed
+
+
+def parse_with_fast_path(bookings: list[dict], event_starts: list[str]) -> list[datetime]:
+    parse_datetime.cache_clear()
+    parsed = []
+    for booking in bookings:
+        parsed.append(parse_datetime(booking['timeFrom'], ISO_DATETIME_FORMAT))
+        parsed.append(parse_datetime(booking['timeTo'], ISO_DATETIME_FORMAT))
+    for start in event_starts:
+        parsed.append(parse_datetime(start, GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE).replace(tzinfo=None))
+    return parsed
+
+
+def measure(function, repeat: int) -> float:
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    bookings = get_bookings(args.items)
+    event_starts = get_event_starts(bookings)
+    document = json.dumps({'bookings': {'days': {'SNOOKER': [{'bookingItems': bookings}]}}}).encode()
+
+    assert parse_with_strptime(bookings, event_starts) == parse_with_fast_path(bookings, event_starts)
+    assert json.loads(document) == loads(document)
+
+    rows = [
+        (f"timestamps ({3 * args.items})",
+         measure(lambda: parse_with_strptime(bookings, event_starts), args.repeat),
+         measure(lambda: parse_with_fast_path(bookings, event_starts), args.repeat)),
+        (f"JSON ({len(document) // 1024} KiB, {'orjson' if orjson else 'json'})",
+         measure(lambda: json.loads(document), args.repeat),
+         measure(lambda: loads(document), args.repeat)),
+    ]
+    print(f"{'':<32}{'stdlib':>12}{'fast path':>12}{'speedup':>10}")
+    for name, baseline, fast in rows:
+        print(f"{name:<32}{baseline * 1000:>10.2f}ms{fast * 1000:>10.2f}ms{baseline / fast:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""
+Local stand-ins for the SnookApp bookings endpoint and the Calendar v3 API, serving a generated season over HTTP
+with injected latency, rate-limit errors (403 and 429 rateLimitExceeded) and server errors (500 and 503).
+
+    poetry run python -m benchmarks.servers [--latency 0.05] [--rate-limit-errors 0.01] [--server-errors 0.01]
+        [--config-file /tmp/snookxporter-fake.yaml]
+
+The configuration pointing SnookXporter at the servers, with the generated calendars, is printed (or written
+to --config-file) at startup. Run SnookXporter with `--config` set to that file, never settings/config.yaml,
+and `--token` set to the printed token, which never expires, so it is never refreshed against Google. Counts
+of responses by status are printed on SIGTERM or Ctrl+C.
+"""
+import argparse
+import email.parser
+import json
+import random
+import re
+import signal
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import yaml
+
+from benchmarks.data import (BOOKINGS_ENDPOINT, PAST_DAYS, TOKEN, Season, generate_event_items, generate_season,
+                             get_bookings_response)
+from benchmarks.fakes import FakeEvents
+from snookxporter.clients.snookapp import SnookAppClient, SnookAppConfig
+from snookxporter.parsing import loads
+
+EVENTS_PATH = re.compile(r'^/calendar/v3/calendars/(?P<calendar_id>[^/]+)/events(?:/(?P<event_id>[^/]+))?$')
+BATCH_PATH = '/batch/calendar/v3'
+DEFAULT_PAGE_SIZE = 250  # Calendar API default of maxResults
+
+Response = tuple[int, dict | None]
+
+
+@dataclass
+class Faults:
+    """
+    Faults injected into every request, and into every call of a batch separately, as Google rejects them one by one.
+    """
+    latency: float = 0.0  # seconds added to every request
+    jitter: float = 0.0  # up to as many seconds more, uniformly distributed
+    rate_limit_errors: float = 0.0  # share of requests rejected with 403 or 429 rateLimitExceeded
+    server_errors: float = 0.0  # share of requests failing with 500 or 503
+    seed: int | None = None
+    _rng: random.Random = field(init=False, repr=False)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def delay(self) -> None:
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+    def get_error(self) -> Response | None:
+        with self._lock:
+            draw, status = self._rng.random(), self._rng.random()
+        if draw < self.rate_limit_errors:
+            return get_error_response(
+                HTTPStatus.TOO_MANY_REQUESTS if status < 0.5 else HTTPStatus.FORBIDDEN, 'rateLimitExceeded'
+            )
+        if draw < self.rate_limit_errors + self.server_errors:
+            return get_error_response(
+                HTTPStatus.INTERNAL_SERVER_ERROR if status < 0.5 else HTTPStatus.SERVICE_UNAVAILABLE, 'backendError'
+            )
+        return None
+
+
+def get_error_response(status: HTTPStatus, reason: str) -> Response:
+    """
+    Error in the shape of Google APIs, also used for SnookApp for simplicity.
+    """
+    return status, {'error': {
+        'code': status.value,
+        'message': status.phrase,
+        'errors': [{'domain': 'global', 'reason': reason, 'message': status.phrase}],
+    }}
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+    server: 'FakeServer'
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        self._handle()
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        self._handle()
+
+    def do_PATCH(self) -> None:  # pylint: disable=invalid-name
+        self._handle()
+
+    def do_DELETE(self) -> None:  # pylint: disable=invalid-name
+        self._handle()
+
+    def _handle(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.faults.delay()
+        url = urlsplit(self.path)
+        if error := self.server.faults.get_error():
+            status, content_type, content = error[0], 'application/json', json.dumps(error[1]).encode()
+        else:
+            status, content_type, content = self.server.respond(
+                method=self.command,
+                path=url.path,
+                query={key: values[0] for key, values in parse_qs(url.query).items()},
+                content_type=self.headers.get('Content-Type', ''),
+                body=body,
+            )
+        self.server.count(status)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+
+class FakeServer(ThreadingHTTPServer):
+    """
+    Serves every connection in its own thread, counting responses by status.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], faults: Faults):
+        super().__init__(address, FakeRequestHandler)
+        self.faults = faults
+        self.statuses: Counter[int] = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            self.statuses[status] += 1
+
+    def respond(self, method: str, path: str, query: dict[str, str], content_type: str, body: bytes) \
+            -> tuple[int, str, bytes]:
+        raise NotImplementedError
+
+
+class FakeSnookAppServer(FakeServer):
+    """
+    Bookings endpoint returning the days of the schedule between the from and to dates, both inclusive.
+    """
+    def __init__(self, address: tuple[str, int], faults: Faults, schedule: list[dict]):
+        super().__init__(address, faults)
+        self.schedule = schedule
+
+    def respond(self, method: str, path: str, query: dict[str, str], content_type: str, body: bytes) \
+            -> tuple[int, str, bytes]:
+        if method != 'GET' or path != BOOKINGS_ENDPOINT:
+            status, response = get_error_response(HTTPStatus.NOT_FOUND, 'notFound')
+        else:
+            _from, _to = query.get('from', ''), query.get('to', '9999-12-31')
+            status, response = HTTPStatus.OK, get_bookings_response(
+                [day for day in self.schedule if _from <= day['date'] <= _to]
+            )
+        return status, 'application/json', json.dumps(response).encode()
+
+
+class FakeCalendarServer(FakeServer):
+    """
+    Calendar v3 events list (with paging and sync tokens), insert, patch and delete, one by one or in batches,
+    backed by FakeEvents.
+    """
+    def __init__(self, address: tuple[str, int], faults: Faults, items: dict[str, list[dict]]):
+        super().__init__(address, faults)
+        self.events = FakeEvents(items)
+        self._events_lock = threading.Lock()
+
+    @property
+    def root_url(self) -> str:
+        return f"{self.url}/"
+
+    def reset(self, items: dict[str, list[dict]]) -> None:
+        with self._events_lock:
+            self.events = FakeEvents(items)
+
+    def respond(self, method: str, path: str, query: dict[str, str], content_type: str, body: bytes) \
+            -> tuple[int, str, bytes]:
+        if method == 'POST' and path == BATCH_PATH:
+            return self._respond_batch(content_type, body)
+        status, response = self._call(method, path, query, body)
+        return status, 'application/json', json.dumps(response).encode() if response is not None else b''
+
+    def _call(self, method: str, path: str, query: dict[str, str], body: bytes) -> Response:
+        match = EVENTS_PATH.match(path)
+        if not match:
+            return get_error_response(HTTPStatus.NOT_FOUND, 'notFound')
+        calendar_id, event_id = unquote(match['calendar_id']), match['event_id'] and unquote(match['event_id'])
+        try:
+            with self._events_lock:
+                if method == 'GET' and not event_id:
+                    page_size = int(query.pop('maxResults', DEFAULT_PAGE_SIZE))
+                    return HTTPStatus.OK, self.events.list(
+                        calendarId=calendar_id, maxResults=page_size, **query
+                    ).execute()
+                if method == 'POST' and not event_id:
+                    return HTTPStatus.OK, self.events.insert(calendarId=calendar_id, body=loads(body)).execute()
+                if method == 'PATCH' and event_id:
+                    return HTTPStatus.OK, self.events.patch(
+                        calendarId=calendar_id, eventId=event_id, body=loads(body)
+                    ).execute()
+                if method == 'DELETE' and event_id:
+                    self.events.delete(calendarId=calendar_id, eventId=event_id).execute()
+                    return HTTPStatus.NO_CONTENT, None
+        except KeyError:
+            return get_error_response(HTTPStatus.NOT_FOUND, 'notFound')
+        return get_error_response(HTTPStatus.METHOD_NOT_ALLOWED, 'methodNotAllowed')
+
+    def _respond_batch(self, content_type: str, body: bytes) -> tuple[int, str, bytes]:
+        """
+        Executes every application/http part of the multipart/mixed request, answering with a part of the same
+        Content-ID prefixed with "response-", as Google does.
+        """
+        message = email.parser.BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.walk():
+            if part.get_content_type() != 'application/http':
+                continue
+            request_line, _, request = str(part.get_payload()).partition('\n')
+            method, target, _ = request_line.split(' ', 2)
+            url = urlsplit(target)
+            status, response = self.faults.get_error() or self._call(
+                method=method,
+                path=url.path,
+                query={key: values[0] for key, values in parse_qs(url.query).items()},
+                body=str(email.parser.Parser().parsestr(request).get_payload()).encode(),
+            )
+            self.count(status)
+            parts.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{str(part['Content-ID'])[1:]}\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(response) if response is not None else ''}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return HTTPStatus.OK, f"multipart/mixed; boundary={boundary}", ''.join(parts).encode()
+
+
+@contextmanager
+def serve(
+        schedule: list[dict],
+        items: dict[str, list[dict]],
+        faults: Faults | None = None,
+        host: str = '127.0.0.1',
+        snook_app_port: int = 0,
+        calendar_port: int = 0,
+) -> Iterator[tuple[FakeSnookAppServer, FakeCalendarServer]]:
+    """
+    Runs both servers in background threads, on free ports unless given.
+    """
+    faults = faults or Faults()
+    snook_app = FakeSnookAppServer((host, snook_app_port), faults, schedule)
+    calendar = FakeCalendarServer((host, calendar_port), faults, items)
+    threads = [threading.Thread(target=server.serve_forever, daemon=True) for server in (snook_app, calendar)]
+    for thread in threads:
+        thread.start()
+    try:
+        yield snook_app, calendar
+    finally:
+        for server in (snook_app, calendar):
+            server.shutdown()
+            server.server_close()
+
+
+def get_season_items(season: Season) -> dict[str, list[dict]]:
+    calendars_matches = SnookAppClient(SnookAppConfig(base_url="", bookings_endpoint="")).route_schedule(
+        schedule=season.schedule, calendars_players=[calendar.players for calendar in season.calendars]
+    )
+    return {
+        calendar.id: generate_event_items(matches) for calendar, matches in zip(season.calendars, calendars_matches)
+    }
+
+
+def get_config(season: Season, snook_app: FakeSnookAppServer, calendar: FakeCalendarServer) -> dict:
+    return {
+        'snook_app': {'base_url': snook_app.url, 'bookings_endpoint': BOOKINGS_ENDPOINT},
+        'google_calendar': {'root_url': calendar.root_url},
+        'calendars': [
+            {
+                'id': calendar_config.id,
+                'players': [
+                    {'first_name': player.first_name, 'last_name': player.last_name, 'alias': player.alias}
+                    for player in calendar_config.players
+                ],
+            }
+            for calendar_config in season.calendars
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--snook-app-port', type=int, default=8080)
+    parser.add_argument('--calendar-port', type=int, default=8081)
+    parser.add_argument('--players', type=int, default=300)
+    parser.add_argument('--calendars', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to as many seconds more")
+    parser.add_argument('--rate-limit-errors', type=float, default=0.0, help="share of 403/429 responses")
+    parser.add_argument('--server-errors', type=float, default=0.0, help="share of 500/503 responses")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--config-file', default=None, help="write the configuration there instead of printing it")
+    args = parser.parse_args()
+
+    season = generate_season(players=args.players, calendars=args.calendars)
+    faults = Faults(latency=args.latency, jitter=args.jitter, rate_limit_errors=args.rate_limit_errors,
+                    server_errors=args.server_errors, seed=args.seed)
+    with serve(season.schedule, get_season_items(season), faults, args.host, args.snook_app_port,
+               args.calendar_port) as (snook_app, calendar):
+        config = yaml.safe_dump(get_config(season, snook_app, calendar), allow_unicode=True, sort_keys=False)
+        if args.config_file:
+            with open(args.config_file, 'w', encoding='utf8') as config_file:
+                config_file.write(config)
+            print(f"Configuration written to {args.config_file}")
+        else:
+            print(config)
+        print(f"SnookApp at {snook_app.url}, Calendar API at {calendar.root_url}, {season.bookings} bookings")
+        config_option = f" --config {args.config_file}" if args.config_file else ""
+        print(f"snookxporter{config_option} --past-days {PAST_DAYS} --token '{json.dumps(TOKEN)}'")
+        stopping = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stopping.set())
+        stopping.wait()
+        print(f"SnookApp responses: {dict(snook_app.statuses)}, Calendar responses: {dict(calendar.statuses)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+from collections.abc import Iterator
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.data import PAST_DAYS, RATE_LIMIT, TOKEN, Season
+from benchmarks.fakes import FakeCalendarService
+from snookxporter.clients.google.calendar import GoogleCalendarClient
+from snookxporter.clients.google.rate_limit import RateLimiter
+from snookxporter.state import StateStore
+
+FUTURE_DAYS = 365
+
+
+@pytest.fixture
+def calendar_service(calendars_event_items: dict[str, list[dict]]) -> Iterator[FakeCalendarService]:
+    service = FakeCalendarService(calendars_event_items)
+    with patch('snookxporter.clients.google.calendar.get_calendar_service', return_value=service):
+        yield service
+
+
+def get_clients(season: Season, state: StateStore | None = None) -> list[GoogleCalendarClient]:
+    rate_limiter = RateLimiter(RATE_LIMIT)
+    return [
+        GoogleCalendarClient(config=calendar, token=TOKEN, state=state, rate_limiter=rate_limiter)
+        for calendar in season.calendars
+    ]
+
+
+def test_get_events_of_all_calendars(benchmark, season: Season, calendar_service: FakeCalendarService):
+    clients = get_clients(season)
+
+    def get_events():
+        return [client.get_events(past_days=PAST_DAYS, future_days=FUTURE_DAYS) for client in clients]
+
+    events = benchmark(get_events)
+
+    assert sum(map(len, events)) == sum(len(items) for items in calendar_service.events().calendars.values())
+
+
+def test_get_unchanged_events_of_all_calendars_incrementally(
+        benchmark, tmp_path, season: Season, calendar_service: FakeCalendarService,
+):
+    state = StateStore(str(tmp_path / "state.sqlite"))
+    clients = get_clients(season, state=state)
+
+    def get_events():
+        return [client.get_events(past_days=PAST_DAYS, future_days=FUTURE_DAYS) for client in clients]
+
+    get_events()
+    events = benchmark(get_events)
+    state.close()
+
+    assert all(client.listed_changes == 0 for client in clients)
+    assert sum(map(len, events)) == sum(len(items) for items in calendar_service.events().calendars.values())
@@ -0,0 +1,33 @@
+import dataclasses
+
+from snookxporter.entities import CalendarEvent, Match
+from snookxporter.sync import get_differences
+
+
+def test_get_differences_of_all_calendars(
+        benchmark, calendars_matches: list[list[Match]], calendars_events: list[list[CalendarEvent]],
+):
+    def diff():
+        return [
+            get_differences(matches=matches, events=events)
+            for matches, events in zip(calendars_matches, calendars_events)
+        ]
+
+    differences = benchmark(diff)
+
+    assert all(to_add and to_update and to_remove for to_add, to_update, to_remove in differences)
+
+
+def test_match_keys_and_content_hashes(benchmark, calendars_matches: list[list[Match]]):
+    """
+    Events carry the match key and content hash in their extended properties, which replaced parsing
+    of event descriptions; this times computing both for fresh matches.
+    """
+    matches = [match for calendar_matches in calendars_matches for match in calendar_matches]
+
+    def get_hashes():
+        return [(copy.get_key(), copy.get_content_hash()) for copy in map(dataclasses.replace, matches)]
+
+    hashes = benchmark(get_hashes)
+
+    assert len(hashes) == len(matches)
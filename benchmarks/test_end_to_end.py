@@ -0,0 +1,48 @@
+import json
+from unittest.mock import patch
+
+import responses
+
+from benchmarks.conftest import SNOOK_APP_CONFIG
+from benchmarks.data import PAST_DAYS, RATE_LIMIT, TOKEN, Season, get_bookings_response
+from benchmarks.fakes import FakeCalendarService
+from snookxporter.clients.snookapp import SnookAppClient
+from snookxporter.clubs import ScheduleSource
+from snookxporter.sync import Synchronizer
+
+FUTURE_DAYS = 180
+
+
+def test_synchronize_season(benchmark, season: Season, calendars_event_items: dict[str, list[dict]]):
+    """
+    A whole run: SnookApp request, routing, listing, diffing and batched writes of all calendars,
+    against the in-process fakes. Every round starts from the same calendars.
+    """
+    services: list[FakeCalendarService] = []
+
+    def setup():
+        services.append(FakeCalendarService(calendars_event_items))
+        synchronizer = Synchronizer(
+            sources=[ScheduleSource(snook_app_client=SnookAppClient(config=SNOOK_APP_CONFIG),
+                                    calendars_config=season.calendars)],
+            token=TOKEN,
+            past_days=PAST_DAYS,
+            future_days=FUTURE_DAYS,
+            workers=4,
+            rate_limit=RATE_LIMIT,
+        )
+        return (synchronizer,), {}
+
+    def synchronize(synchronizer: Synchronizer):
+        try:
+            return synchronizer.synchronize()
+        finally:
+            synchronizer.close()
+
+    with responses.RequestsMock() as mocked_responses, patch(
+        'snookxporter.clients.google.calendar.get_calendar_service', side_effect=lambda *_, **__: services[-1]
+    ):
+        mocked_responses.get(SNOOK_APP_CONFIG.url, body=json.dumps(get_bookings_response(season.schedule)))
+        results = benchmark.pedantic(synchronize, setup=setup, rounds=5)
+
+    assert all(result.succeeded and result.added and result.updated and result.removed for result in results)
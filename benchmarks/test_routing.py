@@ -0,0 +1,24 @@
+from benchmarks.data import Season
+from snookxporter.clients.snookapp import SnookAppClient
+
+
+def test_route_schedule_to_all_calendars(benchmark, season: Season, snook_app_client: SnookAppClient):
+    calendars_players = [calendar.players for calendar in season.calendars]
+
+    routed = benchmark(snook_app_client.route_schedule, schedule=season.schedule, calendars_players=calendars_players)
+
+    assert len(routed) == len(season.calendars)
+
+
+def test_extract_players_matches_from_schedule_per_calendar(
+        benchmark, season: Season, snook_app_client: SnookAppClient,
+):
+    def extract():
+        return [
+            snook_app_client.extract_players_matches_from_schedule(schedule=season.schedule, players=calendar.players)
+            for calendar in season.calendars
+        ]
+
+    extracted = benchmark(extract)
+
+    assert len(extracted) == len(season.calendars)
@@ -0,0 +1,138 @@
+from collections.abc import Iterator
+
+import pytest
+
+from benchmarks.data import BOOKINGS_ENDPOINT, PAST_DAYS, RATE_LIMIT, TOKEN, Season, generate_legacy_event_items
+from benchmarks.servers import FakeCalendarServer, FakeSnookAppServer, Faults, serve
+from snookxporter.async_sync import AsyncSynchronizer
+from snookxporter.clients.async_snookapp import AsyncSnookAppClient
+from snookxporter.clients.snookapp import SnookAppClient, SnookAppConfig
+from snookxporter.clubs import ScheduleSource
+from snookxporter.entities import Match
+from snookxporter.sync import CalendarSyncResult, Synchronizer
+
+FUTURE_DAYS = 180
+LATENCY = 0.005
+
+
+@pytest.fixture(scope='module')
+def servers(
+        season: Season, calendars_event_items: dict[str, list[dict]],
+) -> Iterator[tuple[FakeSnookAppServer, FakeCalendarServer]]:
+    with serve(season.schedule, calendars_event_items, Faults(latency=LATENCY)) as servers:
+        yield servers
+
+
+def get_synchronizer(
+        season: Season, servers: tuple[FakeSnookAppServer, FakeCalendarServer], workers: int | None,
+) -> Synchronizer | AsyncSynchronizer:
+    """
+    Synchronizer of the season with the threads engine and the given workers, or with the async engine for None.
+    """
+    snook_app, calendar = servers
+    snook_app_config = SnookAppConfig(base_url=snook_app.url, bookings_endpoint=BOOKINGS_ENDPOINT)
+    options = {
+        'token': TOKEN,
+        'past_days': PAST_DAYS,
+        'future_days': FUTURE_DAYS,
+        'calendar_root_url': calendar.root_url,
+        'rate_limit': RATE_LIMIT,
+    }
+    if workers is None:
+        return AsyncSynchronizer(
+            sources=[ScheduleSource(AsyncSnookAppClient(snook_app_config), season.calendars)], **options,
+        )
+    return Synchronizer(
+        sources=[ScheduleSource(SnookAppClient(snook_app_config), season.calendars)], workers=workers, **options,
+    )
+
+
+def synchronize(synchronizer: Synchronizer | AsyncSynchronizer) -> list[CalendarSyncResult]:
+    try:
+        return synchronizer.synchronize()
+    finally:
+        synchronizer.close()
+
+
+def synchronize_over_http(
+        benchmark, season: Season, calendars_event_items: dict[str, list[dict]],
+        servers: tuple[FakeSnookAppServer, FakeCalendarServer], workers: int | None,
+) -> list[CalendarSyncResult]:
+    """
+    Synchronizes the season, see get_synchronizer, starting every round from the same calendars.
+    """
+    def setup():
+        servers[1].reset(calendars_event_items)
+        return (get_synchronizer(season, servers, workers),), {}
+
+    return benchmark.pedantic(synchronize, setup=setup, rounds=3)
+
+
+@pytest.mark.parametrize('workers', [1, 4, None], ids=['threads-1', 'threads-4', 'async'])
+def test_synchronize_season_over_http(
+        benchmark, season: Season, calendars_event_items: dict[str, list[dict]],
+        servers: tuple[FakeSnookAppServer, FakeCalendarServer], workers: int | None,
+):
+    """
+    Every request takes at least LATENCY, so concurrent calendars and batched or concurrent writes pay off
+    as against Google.
+    """
+    results = synchronize_over_http(benchmark, season, calendars_event_items, servers, workers)
+
+    assert all(result.succeeded and result.added and result.updated and result.removed for result in results)
+
+
+def test_synchronize_season_over_http_retrying_rate_limit_and_server_errors(
+        benchmark, season: Season, calendars_event_items: dict[str, list[dict]],
+        servers: tuple[FakeSnookAppServer, FakeCalendarServer],
+):
+    _, calendar = servers
+    faults = calendar.faults
+    calendar.faults = Faults(latency=LATENCY, rate_limit_errors=0.05, server_errors=0.02, seed=2024)
+    calendar.statuses.clear()
+    try:
+        results = synchronize_over_http(benchmark, season, calendars_event_items, servers, workers=4)
+    finally:
+        calendar.faults = faults
+
+    assert all(result.succeeded for result in results)
+    assert calendar.statuses[429] and calendar.statuses[403] and calendar.statuses[500] and calendar.statuses[503]
+
+
+@pytest.mark.parametrize('workers', [4, None], ids=['threads-4', 'async'])
+def test_synchronize_season_over_http_again_finds_nothing_to_do(
+        season: Season, calendars_event_items: dict[str, list[dict]],
+        servers: tuple[FakeSnookAppServer, FakeCalendarServer], workers: int | None,
+):
+    """
+    Events written by the first run are listed back as Google returns them, so the second run only compares them.
+    """
+    servers[1].reset(calendars_event_items)
+
+    first = synchronize(get_synchronizer(season, servers, workers))
+    second = synchronize(get_synchronizer(season, servers, workers))
+
+    assert all(result.succeeded and result.added for result in first)
+    assert all(result.succeeded for result in second)
+    assert not any(result.added or result.updated or result.removed for result in second)
+
+
+@pytest.mark.parametrize('workers', [4, None], ids=['threads-4', 'async'])
+def test_synchronize_season_over_http_adopts_events_of_older_versions(
+        season: Season, calendars_matches: list[list[Match]],
+        servers: tuple[FakeSnookAppServer, FakeCalendarServer], workers: int | None,
+):
+    """
+    Calendars filled before the markers are updated in place on the first run, not duplicated.
+    """
+    servers[1].reset({
+        calendar.id: generate_legacy_event_items(matches)
+        for calendar, matches in zip(season.calendars, calendars_matches)
+    })
+
+    first = synchronize(get_synchronizer(season, servers, workers))
+    second = synchronize(get_synchronizer(season, servers, workers))
+
+    assert all(result.succeeded and result.updated and not result.added for result in first)
+    assert all(result.succeeded for result in second)
+    assert not any(result.added or result.updated or result.removed for result in second)
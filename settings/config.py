@@ -2,11 +2,12 @@ import logging
 import os
 from pathlib import Path
 
-import yaml
-
 from snookxporter.clients.google.calendar import GoogleCalendarConfig
+from snookxporter.clients.google.rate_limit import RateLimitConfig
 from snookxporter.clients.snookapp import SnookAppConfig
+from snookxporter.clubs import ClubConfig
 from snookxporter.entities import Player
+from snookxporter.logs import LoggingConfig
 
 ROOT_DIR = "SnookXporter"
 
@@ -14,26 +15,59 @@ logger = logging.getLogger(__name__)
 
 
 class ConfigParser:
-    def __init__(self):
-        root_dir = self.get_root_dir()
-        self.config_path = os.path.join(root_dir, 'settings/config.yaml')
+    """
+    Reads the given configuration file, by default settings/config.yaml of the project.
+    """
+    def __init__(self, config_path: str | None = None):
+        self.config_path = config_path or os.path.join(self.get_root_dir(), 'settings/config.yaml')
         self.config = self._get_config()
         logger.debug(f"Using config: {self.config}")
 
     def get_snook_app_config(self) -> SnookAppConfig:
         return SnookAppConfig(**self.config['snook_app'])
 
+    def get_logging_config(self) -> LoggingConfig:
+        return LoggingConfig(**self.config.get('logging', {}))
+
+    def get_calendar_root_url(self) -> str | None:
+        return self.config.get('google_calendar', {}).get('root_url')
+
+    def get_rate_limit_config(self) -> RateLimitConfig:
+        return RateLimitConfig(**self.config.get('google_calendar', {}).get('rate_limit', {}))
+
     def get_calendars_config(self) -> list[GoogleCalendarConfig]:
+        return self._get_calendars_config(self.config['calendars'])
+
+    def get_players(self):
+        return [Player(**p) for p in self.config['players']]
+
+    def get_clubs_config(self) -> list[ClubConfig]:
+        """
+        Clubs of the clubs section, each with its snook_app and calendars, or a single club of the top-level ones.
+        Clubs are named after their bookings URL unless a name is given.
+        """
+        clubs = self.config.get('clubs') or [
+            {'snook_app': self.config['snook_app'], 'calendars': self.config['calendars']}
+        ]
+        clubs_config = []
+        for club in clubs:
+            snook_app = SnookAppConfig(**club['snook_app'])
+            clubs_config.append(ClubConfig(
+                name=club.get('name') or snook_app.url,
+                snook_app=snook_app,
+                calendars=self._get_calendars_config(club['calendars']),
+            ))
+        return clubs_config
+
+    @staticmethod
+    def _get_calendars_config(calendars: list[dict]) -> list[GoogleCalendarConfig]:
         return [
             GoogleCalendarConfig(
                 id=cal['id'],
                 players=[ Player(**player) for player in cal['players'] ]
-            ) for cal in self.config['calendars']
+            ) for cal in calendars
         ]
 
-    def get_players(self):
-        return [Player(**p) for p in self.config['players']]
-
     @staticmethod
     def get_root_dir():
         path = Path(__file__).resolve()
@@ -44,5 +78,7 @@ class ConfigParser:
         return path
 
     def _get_config(self):
+        import yaml  # pylint: disable=import-outside-toplevel
+
         with open(self.config_path) as config_file:
             return yaml.safe_load(config_file)
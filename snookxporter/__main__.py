@@ -1,50 +1,224 @@
 import json
 import logging
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING
 
 import click
 
-from settings.config import ConfigParser
-from snookxporter.clients.google.calendar import GoogleCalendarClient
-from snookxporter.clients.snookapp import SnookAppClient
+from snookxporter.logs import configure_logging
+from snookxporter.profiling import profiled
+
+if TYPE_CHECKING:
+    from snookxporter.async_sync import AsyncSynchronizer
+    from snookxporter.sync import Synchronizer
 
 logger = logging.getLogger(__name__)
 
 
-@click.command()
-@click.option('--past-days',
-              help="Number of past days to synchronize.",
-              default=1, type=int)
-@click.option('--future-days',
-              help="Number of future days to synchronize.",
-              default=90, type=int)
-@click.option('--token',
-              help="Google Calendar token.",
-              default = '{}')
-def run(past_days, future_days, token) -> None:
+class DefaultCommandGroup(click.Group):
+    """
+    Invokes the run command if no command is given, so `snookxporter [OPTIONS]` keeps working.
+    """
+    default_command = 'run'
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
 
-    config_parser = ConfigParser()
-    snook_app_config = config_parser.get_snook_app_config()
-    calendars_config = config_parser.get_calendars_config()
-    token = json.loads(token)
 
-    snook_app_client = SnookAppClient(config=snook_app_config)
-    decider_schedule = snook_app_client.get_schedule(past_days=past_days, future_days=future_days)
+def sync_options(command):
+    options = [
+        click.option('--config',
+                     help="Configuration file to use instead of settings/config.yaml.",
+                     envvar='SNOOKXPORTER_CONFIG', default=None, type=click.Path(dir_okay=False, exists=True)),
+        click.option('--past-days',
+                     help="Number of past days to synchronize.",
+                     default=1, type=int),
+        click.option('--future-days',
+                     help="Number of future days to synchronize.",
+                     default=90, type=int),
+        click.option('--token',
+                     help="Google Calendar token.",
+                     default = '{}'),
+        click.option('--include-unmarked-events',
+                     help="Also list calendar events not created by SnookXporter, so they are replaced. "
+                          "Events of older versions are adopted without it.",
+                     is_flag=True),
+        click.option('--state-file',
+                     help="SQLite file keeping the state between runs, enables incremental calendar listing.",
+                     default=None, type=click.Path(dir_okay=False)),
+        click.option('--stream-schedule',
+                     help="Parse the SnookApp response while it is downloaded (requires ijson).",
+                     is_flag=True),
+        click.option('--workers',
+                     help="Number of calendars synchronized concurrently by the threads engine.",
+                     default=1, type=click.IntRange(min=1)),
+        click.option('--engine',
+                     help="Synchronize calendars in threads, or all at once as coroutines of a single event loop "
+                          "(requires httpx).",
+                     default='threads', type=click.Choice(['threads', 'async'])),
+        click.option('--metrics-file',
+                     help="Prometheus textfile written with timings and counters of every run, e.g. into the directory "
+                          "of the node exporter's textfile collector.",
+                     default=None, type=click.Path(dir_okay=False)),
+        click.option('--report-file',
+                     help="JSON report written with results, timings and counters of every run.",
+                     default=None, type=click.Path(dir_okay=False)),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
 
-    for calendar in calendars_config:
-        calendar_client = GoogleCalendarClient(config=calendar, token=token)
 
-        calendar_events = calendar_client.get_events(past_days=past_days, future_days=future_days)
-        logger.debug(f"Calendar events: {calendar_events}")
+def get_synchronizer(
+        past_days, future_days, token, include_unmarked_events, state_file, stream_schedule, workers, engine,
+        config=None, record_spans=False,
+) -> 'Synchronizer | AsyncSynchronizer':
+    """
+    Configures logging and builds the synchronizer. Modules are imported here rather than at the top,
+    so `--help` and argument errors do not pay for loading the HTTP and YAML libraries.
+    """
+    # pylint: disable=import-outside-toplevel
+    from settings.config import ConfigParser
+    from snookxporter.clients.snookapp import SnookAppClient
+    from snookxporter.clubs import ScheduleSource, merge_clubs
+    from snookxporter.state import StateStore
+    from snookxporter.sync import Synchronizer
 
-        decider_matches = snook_app_client.extract_players_matches_from_schedule(
-            schedule=decider_schedule, players=calendar.players
+    config_parser = ConfigParser(config)
+    configure_logging(config_parser.get_logging_config())
+    try:
+        clubs = merge_clubs(config_parser.get_clubs_config())
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    if engine == 'async':
+        try:
+            from snookxporter.async_sync import AsyncSynchronizer
+            from snookxporter.clients.async_snookapp import AsyncSnookAppClient
+        except ImportError as e:
+            raise click.ClickException(
+                "The async engine requires httpx, install the optional async extra: poetry install --extras async"
+            ) from e
+        if stream_schedule:
+            logger.warning("The async engine reads the whole schedule at once, ignoring --stream-schedule")
+        return AsyncSynchronizer(
+            sources=[
+                ScheduleSource(snook_app_client=AsyncSnookAppClient(config=club.snook_app),
+                               calendars_config=club.calendars)
+                for club in clubs
+            ],
+            token=json.loads(token),
+            past_days=past_days,
+            future_days=future_days,
+            include_unmarked_events=include_unmarked_events,
+            state=StateStore(state_file) if state_file else None,
+            calendar_root_url=config_parser.get_calendar_root_url(),
+            rate_limit=config_parser.get_rate_limit_config(),
+            record_spans=record_spans,
         )
-        logger.debug(f"Decider matches: {decider_matches}")
+    return Synchronizer(
+        sources=[
+            ScheduleSource(snook_app_client=SnookAppClient(config=club.snook_app), calendars_config=club.calendars)
+            for club in clubs
+        ],
+        token=json.loads(token),
+        past_days=past_days,
+        future_days=future_days,
+        include_unmarked_events=include_unmarked_events,
+        state=StateStore(state_file) if state_file else None,
+        stream_schedule=stream_schedule,
+        workers=workers,
+        calendar_root_url=config_parser.get_calendar_root_url(),
+        rate_limit=config_parser.get_rate_limit_config(),
+        record_spans=record_spans,
+    )
+
+
+def write_metrics(
+        synchronizer: 'Synchronizer | AsyncSynchronizer',
+        metrics_file: str | None,
+        report_file: str | None,
+        trace_file: str | None = None,
+) -> None:
+    """
+    Writes metrics of the last cycle. A failed write is logged only, so it fails neither the run nor the daemon.
+    """
+    if synchronizer.metrics:
+        try:
+            synchronizer.metrics.write(metrics_file=metrics_file, report_file=report_file, trace_file=trace_file)
+        except OSError:
+            logger.exception("Writing metrics failed")
+
+
+@click.group(cls=DefaultCommandGroup)
+def cli() -> None:
+    """
+    Synchronizes SnookApp matches to Google Calendars, once (run, the default) or periodically (daemon).
+    """
+
+
+@cli.command()
+@sync_options
+@click.option('--profile',
+              help="Profiles the run into the given file, see --profile-format.",
+              default=None, type=click.Path(dir_okay=False))
+@click.option('--profile-format',
+              help="A cProfile dump, for pstats or snakeviz, or spans of the SnookApp fetch and extraction and of "
+                   "listing, diffing and writing every calendar as a Chrome trace, for chrome://tracing or Perfetto.",
+              default='pstats', type=click.Choice(['pstats', 'trace']))
+def run(metrics_file, report_file, profile, profile_format, **options) -> None:
+    """
+    Synchronizes all calendars once.
+    """
+    trace_file = profile if profile_format == 'trace' else None
+    synchronizer = get_synchronizer(**options, record_spans=bool(trace_file))
+    if profile and not trace_file and options['engine'] == 'threads' and options['workers'] > 1:
+        logger.warning("cProfile mixes up calls of concurrent worker threads, profile with --workers 1 "
+                       "or --profile-format trace")
+    try:
+        with profiled(None if trace_file else profile):
+            results = synchronizer.synchronize()
+    finally:
+        write_metrics(synchronizer, metrics_file, report_file, trace_file)
+        synchronizer.close()
+    if not all(result.succeeded for result in results):
+        raise click.ClickException("Synchronization of some calendars failed")
+
+
+@cli.command()
+@sync_options
+@click.option('--interval',
+              help="Seconds between starts of synchronization cycles.",
+              default=900, type=click.FloatRange(min=0))
+def daemon(interval, metrics_file, report_file, **options) -> None:
+    """
+    Stays resident and synchronizes all calendars every interval, until SIGTERM or SIGINT.
+
+    Clients, credentials, connections and caches are kept between cycles. A signal received during a cycle
+    lets it finish before stopping.
+    """
+    synchronizer = get_synchronizer(**options)
+    stopping = threading.Event()
 
-        to_add = set(decider_matches) - set(calendar_events)
-        logger.info(f"Events to add to calendar ({calendar_client.calendar_id}): {to_add}")
-        calendar_client.add_events(to_add)
+    def stop(signum, _frame):
+        logger.info(f"Received {signal.Signals(signum).name}, stopping")
+        stopping.set()
 
-        to_remove = set(calendar_events) - set(decider_matches)
-        logger.info(f"Events to remove from calendar ({calendar_client.calendar_id}): {to_remove}")
-        calendar_client.delete_events(to_remove)
+    previous_handlers = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        while not stopping.is_set():
+            started = time.monotonic()
+            try:
+                synchronizer.synchronize()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Synchronization cycle failed")
+            write_metrics(synchronizer, metrics_file, report_file)
+            stopping.wait(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        synchronizer.close()
+    logger.info("Daemon stopped")
@@ -0,0 +1,196 @@
+import asyncio
+
+import httpx
+
+from snookxporter.clients.async_snookapp import AsyncSnookAppClient
+from snookxporter.clients.google.async_calendar import REQUEST_TIMEOUT, AsyncGoogleCalendarClient
+from snookxporter.clients.google.calendar import GoogleCalendarConfig
+from snookxporter.clients.google.rate_limit import AsyncRateLimiter, RateLimitConfig
+from snookxporter.clubs import ScheduleSource
+from snookxporter.entities import CalendarEvent, Match
+from snookxporter.metrics import RunMetrics
+from snookxporter.state import StateStore
+from snookxporter.sync import BaseSynchronizer, CalendarSync, CalendarSyncResult, ScheduleDigest
+
+
+async def sync_calendar(
+        calendar_client: AsyncGoogleCalendarClient,
+        listing: 'asyncio.Task[list[CalendarEvent]]',
+        matches: list[Match],
+        schedule_hash: str | None = None,
+        metrics: RunMetrics | None = None,
+) -> CalendarSyncResult:
+    """
+    Counterpart of snookxporter.sync.sync_calendar for calendar events already being listed by the given task,
+    which measures the listing phase itself.
+    """
+    with CalendarSync(calendar_client, matches, schedule_hash, metrics) as calendar_sync:
+        if calendar_sync.diff(await listing):
+            with calendar_sync.write('add', calendar_sync.to_add):
+                added = await calendar_client.add_events(calendar_sync.to_add)
+            with calendar_sync.write('update', calendar_sync.to_update):
+                updated = await calendar_client.update_events(calendar_sync.to_update)
+            with calendar_sync.write('remove', calendar_sync.to_remove):
+                removed = await calendar_client.delete_events(calendar_sync.to_remove)
+            calendar_sync.count(added, updated, removed)
+    return calendar_sync.result
+
+
+class AsyncSynchronizer(BaseSynchronizer[AsyncSnookAppClient, AsyncGoogleCalendarClient]):
+    """
+    Runs synchronization cycles of all calendars of all schedule sources as coroutines of a single event loop,
+    kept open between cycles together with the connection pools, instead of threads.
+
+    Schedules of all sources are downloaded at once while all calendars are being listed, and all calendars
+    are synchronized at once; requests in flight are bounded by the shared rate limiter. Phases of calendars
+    overlap, so their durations add up to more than the duration of the cycle.
+    """
+    def __init__(
+            self,
+            sources: list[ScheduleSource[AsyncSnookAppClient]],
+            token: dict,
+            past_days: int,
+            future_days: int,
+            include_unmarked_events: bool = False,
+            state: StateStore | None = None,
+            calendar_root_url: str | None = None,
+            rate_limit: RateLimitConfig | None = None,
+            record_spans: bool = False,
+    ):
+        super().__init__(
+            sources=sources, token=token, past_days=past_days, future_days=future_days,
+            include_unmarked_events=include_unmarked_events, state=state, calendar_root_url=calendar_root_url,
+            record_spans=record_spans,
+        )
+        self.rate_limiter = AsyncRateLimiter(rate_limit)
+        self.http = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=self.rate_limiter.config.max_concurrency,
+                max_keepalive_connections=self.rate_limiter.config.max_concurrency,
+            ),
+        )
+        self._loop = asyncio.new_event_loop()
+
+    def synchronize(self) -> list[CalendarSyncResult]:
+        """
+        See Synchronizer.synchronize.
+        """
+        return self._loop.run_until_complete(self.synchronize_async())
+
+    async def synchronize_async(self) -> list[CalendarSyncResult]:
+        metrics = self.metrics = RunMetrics(self.rate_limiter, record_spans=self.record_spans)
+        results: list[CalendarSyncResult] | None = None
+        try:
+            results = await self._synchronize(metrics)
+            return results
+        finally:
+            metrics.finish(results, [source.snook_app_client for source in self.sources])
+
+    def _create_calendar_client(self, calendar: GoogleCalendarConfig) -> AsyncGoogleCalendarClient:
+        return AsyncGoogleCalendarClient(
+            config=calendar, http=self.http, credential_manager=self.credential_manager,
+            include_unmarked_events=self.include_unmarked_events, state=self.state,
+            root_url=self.calendar_root_url, rate_limiter=self.rate_limiter,
+        )
+
+    async def _synchronize(self, metrics: RunMetrics) -> list[CalendarSyncResult]:
+        listings = [
+            [asyncio.create_task(self._list_events(client, metrics)) for client in calendar_clients]
+            for calendar_clients in self.calendar_clients
+        ]
+        outcomes = await asyncio.gather(*(
+            self._route_schedule(index, source, listings[index], metrics) for index, source in enumerate(self.sources)
+        ), return_exceptions=True)
+
+        results: list[CalendarSyncResult] = []
+        schedules: list[tuple[int, list[list[Match]], str]] = []
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                results += self._fail_source(index, outcome)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            elif outcome:
+                schedules.append((index, *outcome))
+        if not results and not schedules:
+            return []
+
+        synchronized = list(await asyncio.gather(*(
+            sync_calendar(
+                calendar_client=client,
+                listing=listing,
+                matches=matches,
+                schedule_hash=schedule_hash,
+                metrics=metrics,
+            )
+            for index, calendars_matches, schedule_hash in schedules
+            for client, listing, matches in zip(self.calendar_clients[index], listings[index], calendars_matches)
+        )))
+        return self._finish_cycle(results, schedules, synchronized)
+
+    async def _route_schedule(
+            self,
+            index: int,
+            source: ScheduleSource[AsyncSnookAppClient],
+            listings: list['asyncio.Task[list[CalendarEvent]]'],
+            metrics: RunMetrics,
+    ) -> tuple[list[list[Match]], str] | None:
+        """
+        See Synchronizer._route_schedule. Listings of calendars of the source are cancelled unless it is routed.
+        """
+        snook_app_client = source.snook_app_client
+        url = snook_app_client.config.url
+        try:
+            with metrics.measure('fetch', source=url):
+                schedule = await snook_app_client.get_schedule(
+                    past_days=self.past_days, future_days=self.future_days, fingerprint=source.calendars_hash
+                )
+            if self._is_schedule_unchanged(snook_app_client):
+                await self._cancel_listings(self.calendar_clients[index], listings)
+                return None
+
+            schedule_digest = ScheduleDigest()
+            with metrics.measure('extract', source=url):
+                calendars_matches = snook_app_client.route_schedule(
+                    schedule=schedule_digest.track(schedule),
+                    calendars_players=[client.players for client in self.calendar_clients[index]],
+                )
+            metrics.add('processed_bookings', snook_app_client.processed_bookings, source=url)
+            schedule_hash = schedule_digest.hexdigest()
+            if self._is_schedule_synchronized(index, schedule_hash):
+                await self._cancel_listings(self.calendar_clients[index], listings)
+                return None
+        except BaseException:
+            await self._cancel_listings(self.calendar_clients[index], listings)
+            raise
+        return calendars_matches, schedule_hash
+
+    async def _list_events(self, client: AsyncGoogleCalendarClient, metrics: RunMetrics) -> list[CalendarEvent]:
+        with metrics.measure('list', calendar=client.calendar_id):
+            return await client.get_events(past_days=self.past_days, future_days=self.future_days)
+
+    async def _cancel_listings(
+            self,
+            calendar_clients: list[AsyncGoogleCalendarClient],
+            listings: list['asyncio.Task[list[CalendarEvent]]'],
+    ) -> None:
+        """
+        Stops listings which are no longer needed. Changes already listed into the state store were not synchronized,
+        so the schedule hash of their calendars is forgotten, for the next cycle not to skip them as unchanged.
+        """
+        for listing in listings:
+            listing.cancel()
+        outcomes = await asyncio.gather(*listings, return_exceptions=True)
+        for client, outcome in zip(calendar_clients, outcomes):
+            if self.state and isinstance(outcome, list) and client.listed_changes:
+                self.state.set_schedule_hash(client.calendar_id, '')
+
+    def close(self) -> None:
+        self._loop.run_until_complete(self._close_clients())
+        self._loop.close()
+        super().close()
+
+    async def _close_clients(self) -> None:
+        for source in self.sources:
+            await source.snook_app_client.aclose()
+        await self.http.aclose()
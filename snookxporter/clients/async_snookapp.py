@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from datetime import date
+
+import httpx
+
+from snookxporter.clients.snookapp import BaseSnookAppClient, SnookAppConfig
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_FACTOR = 0.5
+
+
+class AsyncSnookAppClient(BaseSnookAppClient):
+    """
+    SnookApp client of the asyncio engine. Chunks of the window are downloaded concurrently over a pool
+    of keep-alive connections sized to the workers, retried like requests of the blocking session.
+    """
+    def __init__(self, config: SnookAppConfig, http: httpx.AsyncClient | None = None):
+        super().__init__(config)
+        self.http = http or httpx.AsyncClient(
+            timeout=config.timeout,
+            limits=httpx.Limits(max_connections=config.workers, max_keepalive_connections=config.workers),
+        )
+
+    async def get_schedule(self, past_days: int, future_days: int, fingerprint: str | None = None) -> list[dict]:
+        """
+        See SnookAppClient.get_schedule.
+        """
+        windows = self._get_windows(past_days=past_days, future_days=future_days)
+        self._pending_cache_entries = {}
+        self._received_bytes = {}
+        responses = await asyncio.gather(*(self._fetch_schedule(_from, _to, fingerprint) for _from, _to in windows))
+        self.schedule_unchanged = all(unchanged for _, unchanged in responses)
+        return list(self._iter_unique_days(chunk for chunk, _ in responses))
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def _fetch_schedule(self, _from: date, _to: date, fingerprint: str | None) -> tuple[list[dict], bool]:
+        url = self._get_schedule_url(_from, _to)
+        cached = self.cache.get(url) if self.cache else None
+        response = await self._get(url, headers=cached.get_conditional_headers() if cached else None)
+        self._received_bytes[url] = response.num_bytes_downloaded
+        if not (cached and response.status_code == 304):
+            response.raise_for_status()
+        return self._read_schedule(url, cached, response.status_code, response.content, response.headers, fingerprint)
+
+    async def _get(self, url: str, headers: dict[str, str] | None) -> httpx.Response:
+        """
+        Retries connection errors and rate-limit or server errors up to retries times, with exponential backoff.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.get(url, headers=headers)
+            except httpx.TransportError as e:
+                if attempt >= self.config.retries:
+                    raise
+                logger.warning(f"SnookApp request failed: {e!r}, retrying")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.config.retries:
+                    return response
+                logger.warning(f"SnookApp responded {response.status_code}, retrying")
+            await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+            attempt += 1
@@ -0,0 +1,190 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from functools import partial
+from typing import TYPE_CHECKING
+from urllib.parse import quote
+
+import httplib2
+import httpx
+from googleapiclient.errors import HttpError
+
+from snookxporter.clients.google.calendar import (PAGE_SIZE, UNFILTERED_LIST_FIELDS, BaseGoogleCalendarClient,
+                                                  GoogleCalendarConfig, OperationResult)
+from snookxporter.clients.google.rate_limit import AsyncRateLimiter
+from snookxporter.clients.google.service import get_discovery_document
+from snookxporter.entities import CalendarEvent, Match
+from snookxporter.parsing import loads
+from snookxporter.state import StateStore
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+    from snookxporter.clients.google.credentials import CredentialManager
+
+WRITE_CONCURRENCY = 16  # writes of a single calendar in flight or waiting for the shared rate limiter
+REQUEST_TIMEOUT = 30  # seconds, as SnookAppConfig.timeout
+
+
+class AsyncGoogleCalendarClient(BaseGoogleCalendarClient):
+    """
+    Calendar client of the asyncio engine, sending requests to the Calendar v3 REST API over a pool of connections
+    shared by all calendars.
+
+    Writes are sent as single requests, up to WRITE_CONCURRENCY of them at once, rather than in batches:
+    concurrent requests on keep-alive connections save the round trips batches would, and a failed call
+    is retried alone. Errors are raised as the HttpError of googleapiclient, so they are told apart and
+    retried the same way as those of GoogleCalendarClient.
+    """
+    def __init__(
+            self,
+            config: GoogleCalendarConfig,
+            http: httpx.AsyncClient,
+            token: dict | None = None,
+            credentials: 'Credentials | None' = None,
+            include_unmarked_events: bool = False,
+            state: StateStore | None = None,
+            root_url: str | None = None,
+            rate_limiter: AsyncRateLimiter | None = None,
+            credential_manager: 'CredentialManager | None' = None,
+    ):
+        super().__init__(
+            config=config, token=token, credentials=credentials, include_unmarked_events=include_unmarked_events,
+            state=state, root_url=root_url, credential_manager=credential_manager,
+        )
+        self.http = http
+        self.rate_limiter = rate_limiter or AsyncRateLimiter()
+        document = get_discovery_document()
+        self.events_url = (f"{root_url or document['rootUrl']}{document['servicePath']}"
+                           f"calendars/{quote(self.calendar_id, safe='')}/events")
+
+    async def get_events(self, past_days: int, future_days: int) -> list[CalendarEvent]:
+        """
+        See GoogleCalendarClient.iter_events.
+        """
+        _from, _to = self._get_window(past_days=past_days, future_days=future_days)
+        if self.state:
+            return [
+                event for event in await self._get_events_incrementally(self.state)
+                if event.start is None or _from <= event.start <= _to
+            ]
+        marked_only = not self.include_unmarked_events
+        pages = await self._list_pages(**self._get_window_params(_from, _to, marked_only=marked_only))
+        events = [event for page in pages for event in self._get_own_events(page.get('items', []))]
+        if not events and marked_only:
+            pages = await self._list_pages(**self._get_window_params(_from, _to, marked_only=False))
+            events = [event for page in pages for event in self._get_own_events(page.get('items', []))]
+            self._log_adopted_events(events)
+        return events
+
+    async def _get_events_incrementally(self, state: StateStore) -> list[CalendarEvent]:
+        sync_token = state.get_sync_token(self.calendar_id)
+        try:
+            items, next_sync_token = await self._list_changes(sync_token)
+        except HttpError as e:
+            self._raise_unless_sync_token_expired(e)
+            sync_token = None
+            items, next_sync_token = await self._list_changes(sync_token)
+        return self._store_changes(state, items, next_sync_token, replace=sync_token is None)
+
+    async def _list_changes(self, sync_token: str | None) -> tuple[list[dict], str]:
+        pages = await self._list_pages(syncToken=sync_token, fields=UNFILTERED_LIST_FIELDS)
+        return [item for page in pages for item in page.get('items', [])], pages[-1]['nextSyncToken']
+
+    async def _list_pages(self, **params) -> list[dict]:
+        pages: list[dict] = []
+        page_token = None
+        while True:
+            query = {
+                'maxResults': PAGE_SIZE,
+                'singleEvents': 'true',
+                'pageToken': page_token,
+                **params,
+            }
+            pages.append(await self._request(
+                'GET', self.events_url, params={key: value for key, value in query.items() if value is not None},
+            ))
+            page_token = pages[-1].get('nextPageToken')
+            if not page_token:
+                return pages
+
+    async def add_events(self, schedule: Iterable[Match]) -> list[OperationResult]:
+        results = await self._execute_concurrently([
+            (match, partial(self._request, 'POST', self.events_url, json=self._get_event_body(match)))
+            for match in schedule
+        ])
+        self._record_added_events(results)
+        return results
+
+    async def update_events(self, updates: Iterable[tuple[CalendarEvent, Match]]) -> list[OperationResult]:
+        results = await self._execute_concurrently([
+            ((event, match), partial(
+                self._request, 'PATCH', self._get_event_url(event), json=self._get_event_patch_body(match)
+            )) for event, match in updates
+        ])
+        self._record_updated_events(results)
+        return results
+
+    async def delete_events(self, events: Iterable[CalendarEvent]) -> list[OperationResult]:
+        results = await self._execute_concurrently([
+            (event, partial(self._request, 'DELETE', self._get_event_url(event))) for event in events
+        ])
+        self._record_deleted_events(results)
+        return results
+
+    async def _execute_concurrently(
+            self, operations: list[tuple[Match | CalendarEvent | tuple[CalendarEvent, Match], Callable[[], Awaitable]]]
+    ) -> list[OperationResult]:
+        """
+        Every operation gets its own result, so a single rejected event does not fail the others. The number
+        of requests started at once is bounded, so a large calendar does not take up the whole rate limit
+        before the other calendars get their turn.
+        """
+        semaphore = asyncio.Semaphore(WRITE_CONCURRENCY)
+
+        async def execute(result: OperationResult, request: Callable[[], Awaitable]) -> OperationResult:
+            async with semaphore:
+                try:
+                    result.response = await request()
+                except (HttpError, httpx.HTTPError) as e:
+                    result.error = e
+            return result
+
+        results = list(await asyncio.gather(*(
+            execute(OperationResult(item=item), request) for item, request in operations
+        )))
+        self._log_failed_operations(results)
+        return results
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        """
+        Sends the request through the rate limiter and returns the decoded response, empty for no content.
+        Connection errors and timeouts are retried like server errors.
+        """
+        async def send() -> dict:
+            response = await self.http.request(method, url, headers=await self._get_headers(), **kwargs)
+            if response.is_error:
+                raise HttpError(
+                    resp=httplib2.Response({'status': response.status_code, **response.headers}),
+                    content=response.content,
+                    uri=str(response.url),
+                )
+            return loads(response.content) if response.content else {}
+        return await self.rate_limiter.execute(send, transport_errors=(httpx.TransportError,))
+
+    async def _get_headers(self) -> dict[str, str]:
+        """
+        Authorization header of the credentials, refreshed in a thread if the credential manager has not refreshed
+        them ahead of expiry.
+        """
+        if not self.credentials.valid:
+            await asyncio.to_thread(self._refresh_credentials)
+        headers: dict[str, str] = {}
+        self.credentials.apply(headers)
+        return headers
+
+    def _refresh_credentials(self) -> None:
+        from google.auth.transport.requests import Request  # pylint: disable=import-outside-toplevel
+        self.credentials.refresh(Request())
+
+    def _get_event_url(self, event: CalendarEvent) -> str:
+        return f"{self.events_url}/{quote(event.item_id, safe='')}"
@@ -1,23 +1,40 @@
 import logging
-import os
+import re
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 from snookxporter.clients.google.formats import (GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE,
-                                                 GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE,
-                                                 GOOGLE_CALENDAR_DATETIME_TOKEN_JSON_FORMAT)
-from snookxporter.entities import Match, Player
+                                                 GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE)
+from snookxporter.clients.google.rate_limit import RateLimiter, is_retryable
+from snookxporter.clients.google.service import get_calendar_service
+from snookxporter.entities import CalendarEvent, Match, Player
+from snookxporter.parsing import parse_datetime
+from snookxporter.state import StateStore
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.http import BatchHttpRequest, HttpRequest
+
+    from snookxporter.clients.google.credentials import CredentialManager
 
 logger = logging.getLogger(__name__)
 
 
-TOKEN_PATH = 'secrets/token.json'
-CREDENTIALS_PATH = 'secrets/credentials.json'
+BATCH_SIZE = 50  # Calendar API limit of calls in a single batch request
+PAGE_SIZE = 2500  # Calendar API limit of events on a single page
+LIST_FIELDS = 'items(id,status,start,extendedProperties),nextPageToken,nextSyncToken'
+UNFILTERED_LIST_FIELDS = 'items(id,status,start,description,extendedProperties),nextPageToken,nextSyncToken'
+
+MARKER_PROPERTY = 'snookxporter'
+MARKER_VALUE = '1'
+KEY_PROPERTY = 'matchKey'
+CONTENT_HASH_PROPERTY = 'contentHash'
+# description of events written before the markers: players with the result (or "v") and the table
+LEGACY_DESCRIPTION = re.compile(r"(\S+) (\S+) (?:v|\d+:\d+) (\S+) (\S+)\nTable number \S+\n?")
 
 
 @dataclass
@@ -26,124 +43,411 @@ class GoogleCalendarConfig:
     players: list[Player]
 
 
-class GoogleCalendarClient:
-    def __init__(self, config=GoogleCalendarConfig, token: dict | None = None):
+@dataclass
+class OperationResult:
+    item: Match | CalendarEvent | tuple[CalendarEvent, Match]
+    error: Exception | None = None
+    response: dict | None = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+class BaseGoogleCalendarClient:
+    """
+    Configuration, credentials, the event format and bookkeeping of the state store, shared by the blocking
+    GoogleCalendarClient and the asyncio client, which differ only in how requests are sent.
+
+    Credentials are taken from the credential manager shared by all clients of the process, unless given explicitly.
+    Without either, the client gets a manager of its own.
+    """
+    def __init__(
+            self,
+            config=GoogleCalendarConfig,
+            token: dict | None = None,
+            credentials: 'Credentials | None' = None,
+            include_unmarked_events: bool = False,
+            state: StateStore | None = None,
+            root_url: str | None = None,
+            credential_manager: 'CredentialManager | None' = None,
+    ):
         self.token = token
         self.calendar_id = config.id
         self.players = config.players
-        self.scopes = ["https://www.googleapis.com/auth/calendar.events"]
-        self.credentials = self._get_credentials_from_token_json()
+        self.include_unmarked_events = include_unmarked_events
+        self.state = state
+        self.root_url = root_url
+        self.listed_changes: int | None = None
+        if credentials is None:
+            if credential_manager is None:
+                # pylint: disable=import-outside-toplevel
+                from snookxporter.clients.google.credentials import CredentialManager
+                credential_manager = CredentialManager(token)
+            credentials = credential_manager.credentials
+        self.credentials = credentials
 
-    def get_events(self, past_days: int, future_days: int) -> list[Match]:
-        service = build('calendar', 'v3', credentials=self.credentials)
+    def _get_window(self, past_days: int, future_days: int) -> tuple[datetime, datetime]:
         _from = (datetime.today() - timedelta(days=past_days)).replace(
             hour=0, minute=0, second=0, microsecond=0
         )
-        _to = (_from + timedelta(days=future_days)).replace(
+        _to = (datetime.today() + timedelta(days=future_days)).replace(
             hour=23, minute=59, second=59, microsecond=999999
         )
         logger.info(f'Getting calendar {self.calendar_id} events from {_from} to {_to}')
-        events_result = service.events().list(  # pylint: disable=maybe-no-member
-            calendarId=self.calendar_id,
-            timeMin=_from.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE),
-            timeMax=_to.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE),
-            maxResults=99_999,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        matches = []
-        for item in events_result['items']:
-            try:
-                matches.append(Match(
-                    host=Player(**self._parse_description(item['description'])['host']),
-                    guest=Player(**self._parse_description(item['description'])['guest']),
-                    start=datetime.strptime(item['start']['dateTime'], GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                    end=datetime.strptime(item['end']['dateTime'], GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                    item_id=item['id'],
-                    host_score=self._parse_description(item['description'])['host_score'],
-                    guest_score=self._parse_description(item['description'])['guest_score'],
-                    table=self._parse_description(item['description'])['table']
-                ))
-            except (IndexError, ValueError, KeyError) as e:
-                logger.warning(f"Problem with parsing calendar item: {item}: Error: {e}")
-                matches.append(Match.get_match_to_delete_from_calendar(item['id']))
-        return matches
-
-    def add_events(self, schedule: set[Match]) -> None:
-        service = build('calendar', 'v3', credentials=self.credentials)
-        for match in schedule:
-            event = {
-                'summary': match.get_match_calendar_summary(),
-                'description': match.get_match_calendar_description(),
-                'start': {
-                    'dateTime': match.start.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                    'timeZone': 'Europe/Warsaw'
-                },
-                'end': {
-                    'dateTime': match.end.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                    'timeZone': 'Europe/Warsaw'
-                }
-            }
-            service.events().insert(calendarId=self.calendar_id, body=event).execute()  # pylint: disable=maybe-no-member
+        return _from, _to
+
+    def _get_window_params(self, _from: datetime, _to: datetime, marked_only: bool) -> dict:
+        """
+        Parameters listing events of the window, only those created by SnookXporter if marked only.
+        Other listings also request descriptions, to recognize events of older versions.
+        """
+        filters = {
+            'privateExtendedProperty': f"{MARKER_PROPERTY}={MARKER_VALUE}", 'fields': LIST_FIELDS
+        } if marked_only else {'fields': UNFILTERED_LIST_FIELDS}
+        return {
+            'timeMin': _from.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE),
+            'timeMax': _to.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITHOUT_TIMEZONE),
+            'orderBy': 'startTime',
+            **filters
+        }
+
+    def _get_own_events(self, items: list[dict]) -> list[CalendarEvent]:
+        """
+        Events of the listed items created by SnookXporter, marked or adopted from an older version,
+        or all of them if unmarked events were requested.
+        """
+        events = (self._get_calendar_event(item) for item in items if item.get('status') != 'cancelled')
+        return [event for event in events if self.include_unmarked_events or event.key is not None]
 
-    def delete_events(self, schedule: set[Match]) -> None:
-        service = build('calendar', 'v3', credentials=self.credentials)
-        for match in schedule:
-            service.events().delete(  # pylint: disable=maybe-no-member
-                calendarId=self.calendar_id, eventId=match.item_id
-            ).execute()
+    def _log_adopted_events(self, events: list[CalendarEvent]) -> None:
+        if events:
+            logger.info(
+                f"Calendar ({self.calendar_id}) has no marked events, adopting {len(events)} events "
+                f"written by an older version"
+            )
+
+    def _raise_unless_sync_token_expired(self, error: HttpError) -> None:
+        """
+        Raises the error of a listing with a sync token, unless it is 410 Gone for an expired one,
+        after which all events are to be listed again.
+        """
+        if error.resp.status != 410:
+            raise error
+        logger.info(f"Sync token of calendar ({self.calendar_id}) is no longer valid, listing all events")
+
+    def _store_changes(
+            self, state: StateStore, items: list[dict], next_sync_token: str, replace: bool
+    ) -> list[CalendarEvent]:
+        """
+        Applies changes listed with a sync token, or all events listed without one, to the stored events
+        and returns all of them.
+        """
+        changed = self._get_own_events(items)
+        changed_ids = {event.item_id for event in changed}
+        logger.info(f"Calendar ({self.calendar_id}) changes since last run: {len(items)}")
+        self.listed_changes = len(items)
+        state.update_events(
+            calendar_id=self.calendar_id,
+            sync_token=next_sync_token,
+            changed=changed,
+            deleted_ids=[item['id'] for item in items if item['id'] not in changed_ids],
+            replace=replace,
+        )
+        return state.get_events(self.calendar_id)
+
+    def _record_added_events(self, results: list[OperationResult]) -> None:
+        if self.state:
+            self.state.record_written_events(
+                calendar_id=self.calendar_id,
+                written=[
+                    CalendarEvent(
+                        item_id=result.response['id'],
+                        key=result.item.get_key(),
+                        content_hash=result.item.get_content_hash(),
+                        start=result.item.start,
+                    )
+                    for result in results
+                    if result.succeeded and result.response and isinstance(result.item, Match)
+                ],
+                deleted_ids=[],
+            )
+
+    def _record_updated_events(self, results: list[OperationResult]) -> None:
+        if self.state:
+            self.state.record_written_events(
+                calendar_id=self.calendar_id,
+                written=[
+                    CalendarEvent(
+                        item_id=event.item_id,
+                        key=match.get_key(),
+                        content_hash=match.get_content_hash(),
+                        start=match.start,
+                    )
+                    for result in results if result.succeeded and isinstance(result.item, tuple)
+                    for event, match in [result.item]
+                ],
+                deleted_ids=[],
+            )
+
+    def _record_deleted_events(self, results: list[OperationResult]) -> None:
+        if self.state:
+            self.state.record_written_events(
+                calendar_id=self.calendar_id,
+                written=[],
+                deleted_ids=[
+                    result.item.item_id for result in results
+                    if result.succeeded and isinstance(result.item, CalendarEvent)
+                ],
+            )
+
+    def _log_failed_operations(self, results: list[OperationResult]) -> None:
+        for result in results:
+            if not result.succeeded:
+                logger.warning(f"Calendar ({self.calendar_id}) operation for {result.item} failed: {result.error}")
 
     @staticmethod
-    def _parse_description(description: str) -> dict:
-        lines = description.split("\n")
+    def _get_event_body(match: Match) -> dict:
         return {
-            'host': {
-                'first_name': lines[0].split(" ")[0],
-                'last_name': lines[0].split(" ")[1],
+            'summary': match.get_match_calendar_summary(),
+            'description': match.get_match_calendar_description(),
+            'start': {
+                'dateTime': match.start.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
+                'timeZone': 'Europe/Warsaw'
             },
-            'guest': {
-                'first_name': lines[0].split(" ")[-2],
-                'last_name': lines[0].split(" ")[-1],
+            'end': {
+                'dateTime': match.end.strftime(GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
+                'timeZone': 'Europe/Warsaw'
             },
-            'host_score': int(lines[0].split(" ")[2].split(":")[0]) if ":" in lines[0] else None,
-            'guest_score': int(lines[0].split(" ")[2].split(":")[1]) if ":" in lines[0] else None,
-            'table': int(lines[1].split(" ")[2]),
+            'extendedProperties': {
+                'private': {
+                    MARKER_PROPERTY: MARKER_VALUE,
+                    KEY_PROPERTY: match.get_key(),
+                    CONTENT_HASH_PROPERTY: match.get_content_hash(),
+                }
+            }
         }
 
-    def _get_credentials_from_token_json(self) -> Credentials:
-        if not self.token:
-            return self._get_credentials()
-        else:
-            return Credentials(
-                token=self.token['token'],
-                refresh_token=self.token['refresh_token'],
-                token_uri=self.token['token_uri'],
-                client_id=self.token['client_id'],
-                client_secret=self.token['client_secret'],
-                scopes=self.token['scopes'],
-                expiry=datetime.strptime(self.token['expiry'], GOOGLE_CALENDAR_DATETIME_TOKEN_JSON_FORMAT)
+    @classmethod
+    def _get_event_patch_body(cls, match: Match) -> dict:
+        """
+        Only the parts which can change for the same fixture, start time is part of the match key.
+        """
+        body = cls._get_event_body(match)
+        return {
+            'summary': body['summary'],
+            'description': body['description'],
+            'end': body['end'],
+            'extendedProperties': body['extendedProperties'],
+        }
+
+    @classmethod
+    def _get_calendar_event(cls, item: dict) -> CalendarEvent:
+        """
+        Unmarked events get the key of the match in their description if an older version wrote them,
+        so they are adopted by an update instead of duplicated.
+        """
+        properties = item.get('extendedProperties', {}).get('private', {})
+        start = item.get('start', {}).get('dateTime')
+        start_time = parse_datetime(start, GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE).replace(tzinfo=None) \
+            if start else None
+        return CalendarEvent(
+            item_id=item['id'],
+            key=properties.get(KEY_PROPERTY) if cls._is_marked(item) else cls._get_legacy_key(item, start_time),
+            content_hash=properties.get(CONTENT_HASH_PROPERTY),
+            start=start_time,
+        )
+
+    @staticmethod
+    def _is_marked(item: dict) -> bool:
+        return item.get('extendedProperties', {}).get('private', {}).get(MARKER_PROPERTY) == MARKER_VALUE
+
+    @staticmethod
+    def _get_legacy_key(item: dict, start: datetime | None) -> str | None:
+        """
+        Match key of an event written before the markers, parsed from its description, or None for any other event.
+        """
+        found = LEGACY_DESCRIPTION.fullmatch(item.get('description', ''))
+        if not found or start is None:
+            return None
+        host_first_name, host_last_name, guest_first_name, guest_last_name = found.groups()
+        return Match(
+            host=Player(first_name=host_first_name, last_name=host_last_name),
+            guest=Player(first_name=guest_first_name, last_name=guest_last_name),
+            start=start,
+            end=start,
+        ).get_key()
+
+
+class GoogleCalendarClient(BaseGoogleCalendarClient):
+    def __init__(
+            self,
+            config=GoogleCalendarConfig,
+            token: dict | None = None,
+            credentials: 'Credentials | None' = None,
+            include_unmarked_events: bool = False,
+            state: StateStore | None = None,
+            root_url: str | None = None,
+            rate_limiter: RateLimiter | None = None,
+            credential_manager: 'CredentialManager | None' = None,
+    ):
+        super().__init__(
+            config=config, token=token, credentials=credentials, include_unmarked_events=include_unmarked_events,
+            state=state, root_url=root_url, credential_manager=credential_manager,
+        )
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+    @property
+    def service(self):
+        """
+        Every service.events() builds all methods of the resource anew, so it is called once per listing
+        or list of writes.
+        """
+        return get_calendar_service(self.credentials, root_url=self.root_url)
+
+    def get_events(self, past_days: int, future_days: int) -> list[CalendarEvent]:
+        return list(self.iter_events(past_days=past_days, future_days=future_days))
+
+    def iter_events(self, past_days: int, future_days: int) -> Iterator[CalendarEvent]:
+        """
+        Yields only events created by SnookXporter, filtered server-side by the private extended property,
+        unless unmarked events were requested, which then come back without hash.
+        Follows every page and requests only the fields needed for CalendarEvent.
+
+        A calendar without marked events in the window is listed once more unfiltered, to adopt events
+        written by older versions, so its first run does not duplicate them.
+        With a state store the events are listed incrementally and filtered to the window locally.
+        """
+        _from, _to = self._get_window(past_days=past_days, future_days=future_days)
+        if self.state:
+            yield from (
+                event for event in self._get_events_incrementally(self.state)
+                if event.start is None or _from <= event.start <= _to
             )
+            return
+        marked_only = not self.include_unmarked_events
+        listed = False
+        for events_result in self._iter_pages(**self._get_window_params(_from, _to, marked_only=marked_only)):
+            for event in self._get_own_events(events_result.get('items', [])):
+                listed = True
+                yield event
+        if not listed and marked_only:
+            adopted = [
+                event for events_result in self._iter_pages(**self._get_window_params(_from, _to, marked_only=False))
+                for event in self._get_own_events(events_result.get('items', []))
+            ]
+            self._log_adopted_events(adopted)
+            yield from adopted
+
+    def _get_events_incrementally(self, state: StateStore) -> list[CalendarEvent]:
+        """
+        Fetches only changes since the sync token kept in the state store. Without a token, or when Google
+        answers 410 Gone for an expired one, all events are listed again and replace the stored ones.
+        """
+        sync_token = state.get_sync_token(self.calendar_id)
+        try:
+            items, next_sync_token = self._list_changes(sync_token)
+        except HttpError as e:
+            self._raise_unless_sync_token_expired(e)
+            sync_token = None
+            items, next_sync_token = self._list_changes(sync_token)
+        return self._store_changes(state, items, next_sync_token, replace=sync_token is None)
+
+    def _list_changes(self, sync_token: str | None) -> tuple[list[dict], str]:
+        pages = list(self._iter_pages(syncToken=sync_token, fields=UNFILTERED_LIST_FIELDS))
+        return [item for page in pages for item in page.get('items', [])], pages[-1]['nextSyncToken']
+
+    def _iter_pages(self, **params) -> Iterator[dict]:
+        page_token = None
+        resource = self.service.events()  # pylint: disable=maybe-no-member
+        while True:
+            events_result = self.rate_limiter.execute(resource.list(
+                calendarId=self.calendar_id,
+                maxResults=PAGE_SIZE,
+                singleEvents=True,
+                pageToken=page_token,
+                **params
+            ).execute)
+            yield events_result
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return
 
+    def add_events(self, schedule: Iterable[Match]) -> list[OperationResult]:
+        resource = self.service.events()  # pylint: disable=maybe-no-member
+        results = self._execute_in_batches([
+            (match, resource.insert(
+                calendarId=self.calendar_id, body=self._get_event_body(match)
+            )) for match in schedule
+        ])
+        self._record_added_events(results)
+        return results
 
-    def _get_credentials(self) -> Credentials:
+    def update_events(self, updates: Iterable[tuple[CalendarEvent, Match]]) -> list[OperationResult]:
         """
-        The file token.json stores the user's access and refresh tokens, and is
-        created automatically when the authorization flow completes for the first
-        time.
+        Patches existing events of the same fixture in place, so their ids stay the same.
+        """
+        resource = self.service.events()  # pylint: disable=maybe-no-member
+        results = self._execute_in_batches([
+            ((event, match), resource.patch(
+                calendarId=self.calendar_id, eventId=event.item_id, body=self._get_event_patch_body(match)
+            )) for event, match in updates
+        ])
+        self._record_updated_events(results)
+        return results
+
+    def delete_events(self, events: Iterable[CalendarEvent]) -> list[OperationResult]:
+        resource = self.service.events()  # pylint: disable=maybe-no-member
+        results = self._execute_in_batches([
+            (event, resource.delete(calendarId=self.calendar_id, eventId=event.item_id)) for event in events
+        ])
+        self._record_deleted_events(results)
+        return results
 
-        If there are no (valid) credentials available, let the user log in.
+    def _execute_in_batches(
+            self, operations: list[tuple[Match | CalendarEvent | tuple[CalendarEvent, Match], 'HttpRequest']]
+    ) -> list[OperationResult]:
+        """
+        Sends the requests through the batch endpoint, up to BATCH_SIZE calls per HTTP round trip.
 
-        At the end save the credentials for the next run and return user credentials
+        Every operation gets its own result, so a single rejected event does not fail the others. Batches go through
+        the rate limiter, which retries a failed batch, or a batch of only its throttled calls.
         """
-        credentials = None
-        if os.path.exists(TOKEN_PATH):
-            credentials = Credentials.from_authorized_user_file(TOKEN_PATH, self.scopes)
-        if not credentials or not credentials.valid:
-            if credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, self.scopes)
-                credentials = flow.run_local_server(port=0)
-            with open(TOKEN_PATH, 'w', encoding='utf8') as token:
-                token.write(credentials.to_json())
-        return credentials
+        results = [OperationResult(item=item) for item, _ in operations]
+        for offset in range(0, len(operations), BATCH_SIZE):
+            pending = list(range(offset, min(offset + BATCH_SIZE, len(operations))))
+            try:
+                self.rate_limiter.execute(
+                    lambda: self._execute_batch(operations, results, pending),  # pylint: disable=cell-var-from-loop
+                    cost=lambda: len(pending),  # pylint: disable=cell-var-from-loop
+                )
+            except HttpError as e:
+                for index in pending:
+                    results[index].error = results[index].error or e
+        self._log_failed_operations(results)
+        return results
+
+    def _execute_batch(
+            self,
+            operations: list[tuple[Match | CalendarEvent | tuple[CalendarEvent, Match], 'HttpRequest']],
+            results: list[OperationResult],
+            pending: list[int],
+    ) -> None:
+        """
+        Executes operations of the pending indexes in a single batch. Afterward only the throttled ones are left
+        pending and the error of the first is raised, for the rate limiter to back off and retry them.
+        """
+        batch: BatchHttpRequest = self.service.new_batch_http_request(callback=self._get_batch_callback(results))
+        for index in pending:
+            batch.add(operations[index][1], request_id=str(index))
+        batch.execute()
+        pending[:] = [index for index in pending if is_retryable(results[index].error)]
+        if error := next((results[index].error for index in pending), None):
+            raise error
+
+    @staticmethod
+    def _get_batch_callback(results: list[OperationResult]):
+        def callback(request_id: str, response: dict | None, exception: Exception | None) -> None:
+            results[int(request_id)].error = exception
+            results[int(request_id)].response = response
+        return callback
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.oauth2.credentials import Credentials
+
+from snookxporter.clients.google.formats import GOOGLE_CALENDAR_DATETIME_TOKEN_JSON_FORMAT
+from snookxporter.files import write_atomically
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATH = 'secrets/token.json'
+CREDENTIALS_PATH = 'secrets/credentials.json'
+SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
+REFRESH_MARGIN = timedelta(minutes=5)  # before expiry, earlier than google-auth refreshes on a request by itself
+RETRY_INTERVAL = 30  # seconds between attempts of a failed background refresh
+
+
+class SharedCredentials(Credentials):
+    """
+    Credentials refreshed by a single thread at a time. Threads which wanted to refresh them meanwhile use
+    the new token instead of refreshing it again. With token_path, refreshed credentials are written back
+    to that file.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.token_path: str | None = None
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, request) -> None:
+        token = self.token
+        with self._refresh_lock:
+            if self.token != token and self.valid:
+                return
+            super().refresh(request)
+            logger.info(f"Refreshed Google credentials, valid until {self.expiry}")
+            if self.token_path:
+                write_atomically(self.token_path, self.to_json())
+
+
+class CredentialManager:
+    """
+    Credentials of the process, loaded once and shared by all calendar clients and threads.
+
+    They come from the token given on the command line or from the token file, which is created by the authorization
+    flow and rewritten after every refresh. With background_refresh, a daemon thread refreshes them REFRESH_MARGIN
+    before they expire, so no request waits for a refresh.
+    """
+    def __init__(self, token: dict | None = None, background_refresh: bool = False):
+        self.token = token
+        self.background_refresh = background_refresh
+        self._credentials: SharedCredentials | None = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._refresher: threading.Thread | None = None
+
+    @property
+    def credentials(self) -> SharedCredentials:
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = (
+                    self._get_credentials_from_token_json(self.token) if self.token else self._get_credentials()
+                )
+                if self.background_refresh:
+                    self._refresher = threading.Thread(
+                        target=self._refresh_ahead, name="credentials-refresher", daemon=True,
+                    )
+                    self._refresher.start()
+            return self._credentials
+
+    def refresh(self) -> None:
+        from google.auth.transport.requests import Request  # pylint: disable=import-outside-toplevel
+        self.credentials.refresh(Request())
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._refresher:
+            self._refresher.join()
+
+    def _refresh_ahead(self) -> None:
+        while not self._stopping.wait(self._get_refresh_delay()):
+            try:
+                self.refresh()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception(f"Refreshing Google credentials failed, retrying in {RETRY_INTERVAL} s")
+                if self._stopping.wait(RETRY_INTERVAL):
+                    return
+
+    def _get_refresh_delay(self) -> float | None:
+        """
+        Seconds until the credentials should be refreshed, None if they never expire. Delays of far expiries are
+        capped to the longest wait the platform supports.
+        """
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return None
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return min(max(0.0, (expiry - REFRESH_MARGIN - now).total_seconds()), threading.TIMEOUT_MAX)
+
+    @staticmethod
+    def _get_credentials_from_token_json(token: dict) -> SharedCredentials:
+        return SharedCredentials(
+            token=token['token'],
+            refresh_token=token['refresh_token'],
+            token_uri=token['token_uri'],
+            client_id=token['client_id'],
+            client_secret=token['client_secret'],
+            scopes=token['scopes'],
+            expiry=datetime.strptime(token['expiry'], GOOGLE_CALENDAR_DATETIME_TOKEN_JSON_FORMAT)
+        )
+
+    @staticmethod
+    def _get_credentials() -> SharedCredentials:
+        """
+        The file token.json stores the user's access and refresh tokens, and is
+        created automatically when the authorization flow completes for the first
+        time.
+
+        If there are no (valid) credentials available, let the user log in.
+
+        At the end save the credentials for the next run and return user credentials
+        """
+        # pylint: disable=import-outside-toplevel
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        credentials = None
+        if os.path.exists(TOKEN_PATH):
+            credentials = SharedCredentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+            credentials.token_path = TOKEN_PATH
+        if not credentials or not credentials.valid:
+            if credentials and credentials.expired and credentials.refresh_token:
+                credentials.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+                credentials = SharedCredentials.from_authorized_user_info(
+                    json.loads(flow.run_local_server(port=0).to_json()), SCOPES,
+                )
+                credentials.token_path = TOKEN_PATH
+                write_atomically(TOKEN_PATH, credentials.to_json())
+        return credentials
@@ -0,0 +1,19 @@
+import json
+
+from googleapiclient.model import JsonModel
+
+from snookxporter.parsing import loads
+
+
+class FastJsonModel(JsonModel):
+    """
+    JsonModel decoding responses, including every response of a batch, with the fastest available JSON decoder.
+    """
+    def deserialize(self, content):
+        try:
+            body = loads(content)
+        except json.JSONDecodeError:
+            return content.decode('utf-8') if isinstance(content, bytes) else content
+        if self._data_wrapper and 'data' in body:
+            body = body['data']
+        return body
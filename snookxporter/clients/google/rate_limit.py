@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from googleapiclient.errors import HttpError
+
+from snookxporter.parsing import loads
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+@dataclass
+class RateLimitConfig:
+    requests_per_second: float | None = 10  # Calendar API default quota of 600 queries per minute per user
+    burst: int = 50  # a single full batch, whose calls count separately against the quota
+    max_retries: int = 6
+    backoff_base: float = 1
+    backoff_max: float = 32
+    concurrency: int = 4  # initial number of requests in flight
+    max_concurrency: int = 16
+
+
+class TokenBucket:
+    """
+    Refills at rate tokens per second up to capacity. A caller taking more tokens than available goes into debt
+    and waits until it is paid off, so requests larger than the capacity, like whole batches, are admitted too
+    and the average rate is kept.
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> None:
+        if wait := self.reserve(tokens):
+            time.sleep(wait)
+
+    def reserve(self, tokens: int = 1) -> float:
+        """
+        Takes the tokens and returns seconds to wait before using them, for callers which cannot block.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate) - tokens
+            self._updated = now
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+
+class BaseAdaptiveConcurrency:
+    """
+    Limit of requests in flight, adjusted by AIMD: every success raises it by 1/limit, so by one per limit
+    of successes, and throttling halves it. Throttled responses of requests sent together are a single signal,
+    so the limit is halved at most once per cooldown.
+    """
+    def __init__(self, initial: int, maximum: int, cooldown: float):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self._in_flight = 0
+        self._decreased: float | None = None
+
+    def _has_free_slot(self) -> bool:
+        return self._in_flight < int(self.limit)
+
+    def _adjust(self, throttled: bool) -> None:
+        self._in_flight -= 1
+        if not throttled:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif self._decreased is None or time.monotonic() - self._decreased >= self.cooldown:
+            self.limit = max(1.0, self.limit / 2)
+            self._decreased = time.monotonic()
+            logger.info(f"Calendar API throttled, lowering concurrency to {int(self.limit)}")
+
+
+class AdaptiveConcurrency(BaseAdaptiveConcurrency):
+    def __init__(self, initial: int, maximum: int, cooldown: float):
+        super().__init__(initial=initial, maximum=maximum, cooldown=cooldown)
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            self._condition.wait_for(self._has_free_slot)
+            self._in_flight += 1
+
+    def release(self, throttled: bool = False) -> None:
+        with self._condition:
+            self._adjust(throttled)
+            self._condition.notify_all()
+
+
+class AsyncAdaptiveConcurrency(BaseAdaptiveConcurrency):
+    """
+    Counterpart of AdaptiveConcurrency for coroutines of a single event loop, which need no lock. Waiting coroutines
+    are queued and handed free slots in turn, so a release wakes only those which can proceed. Releasing does not
+    block, so cancelled requests release their slots too.
+    """
+    def __init__(self, initial: int, maximum: int, cooldown: float):
+        super().__init__(initial=initial, maximum=maximum, cooldown=cooldown)
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if not self._waiters and self._has_free_slot():
+            self._in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._in_flight -= 1
+                self._wake_waiters()
+            raise
+
+    def release(self, throttled: bool = False) -> None:
+        self._adjust(throttled)
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._has_free_slot():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+
+class BaseRateLimiter:
+    """
+    Every Calendar API request goes through a single rate limiter shared by all calendars, as quotas are per user
+    and project. Requests wait for tokens of the bucket and a free slot of the adaptive concurrency, and rate-limit
+    and server errors are retried after an exponential backoff with full jitter.
+
+    API calls, counting every request of a batch and every attempt, and retries are counted since the creation,
+    under a lock as requests of all worker threads count into them.
+    """
+    def __init__(self, config: RateLimitConfig | None = None):
+        self.config = config or RateLimitConfig()
+        self.bucket = TokenBucket(self.config.requests_per_second, self.config.burst) \
+            if self.config.requests_per_second else None
+        self.calls = 0
+        self.retries = 0
+        self._random = random.Random()
+        self._counters_lock = threading.Lock()
+
+    def count(self, calls: int = 0, retries: int = 0) -> None:
+        with self._counters_lock:
+            self.calls += calls
+            self.retries += retries
+
+    def get_backoff(self, attempt: int, error: HttpError | None = None) -> float:
+        """
+        Random delay up to the exponential backoff, or the delay the server asked for in Retry-After if longer.
+        """
+        delay = self._random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * 2 ** attempt))
+        if error is None:
+            return delay
+        try:
+            return max(delay, float(error.resp.get('retry-after', 0)))
+        except (TypeError, ValueError):
+            return delay
+
+    def _get_retry_delay(self, attempt: int, error: HttpError) -> float | None:
+        """
+        Seconds to wait before the next attempt, or None if the error is not worth it or retries are exhausted.
+        """
+        if not is_retryable(error) or attempt >= self.config.max_retries:
+            return None
+        delay = self.get_backoff(attempt, error)
+        logger.warning(f"Calendar API responded {error.resp.status}, retrying in {delay:.1f} s")
+        self.count(retries=1)
+        return delay
+
+
+class RateLimiter(BaseRateLimiter):
+    def __init__(self, config: RateLimitConfig | None = None):
+        super().__init__(config)
+        self.concurrency = AdaptiveConcurrency(
+            initial=self.config.concurrency, maximum=self.config.max_concurrency, cooldown=self.config.backoff_base,
+        )
+
+    def execute(self, request: Callable[[], T], cost: int | Callable[[], int] = 1) -> T:
+        """
+        Returns the result of the request, retried while it raises a retryable HttpError, at most max_retries times.
+        The cost is the number of API calls of the request, evaluated before every attempt.
+        """
+        attempt = 0
+        while True:
+            calls = cost() if callable(cost) else cost
+            self.count(calls=calls)
+            if self.bucket:
+                self.bucket.acquire(calls)
+            self.concurrency.acquire()
+            try:
+                result = request()
+            except HttpError as e:
+                self.concurrency.release(throttled=is_retryable(e))
+                delay = self._get_retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+            except BaseException:
+                self.concurrency.release()
+                raise
+            else:
+                self.concurrency.release()
+                return result
+
+
+class AsyncRateLimiter(BaseRateLimiter):
+    """
+    Counterpart of RateLimiter for coroutines, which wait for tokens, slots and backoffs without blocking
+    the event loop.
+    """
+    def __init__(self, config: RateLimitConfig | None = None):
+        super().__init__(config)
+        self.concurrency = AsyncAdaptiveConcurrency(
+            initial=self.config.concurrency, maximum=self.config.max_concurrency, cooldown=self.config.backoff_base,
+        )
+
+    async def execute(
+            self,
+            request: Callable[[], Awaitable[T]],
+            cost: int = 1,
+            transport_errors: tuple[type[Exception], ...] = (),
+    ) -> T:
+        """
+        Returns the result of the awaited request, sent again while it raises a retryable HttpError,
+        or one of the transport errors of the HTTP client, at most max_retries times.
+        """
+        attempt = 0
+        while True:
+            self.count(calls=cost)
+            if self.bucket and (wait := self.bucket.reserve(cost)):
+                await asyncio.sleep(wait)
+            await self.concurrency.acquire()
+            try:
+                result = await request()
+            except HttpError as e:
+                self.concurrency.release(throttled=is_retryable(e))
+                delay = self._get_retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+            except transport_errors as e:
+                self.concurrency.release(throttled=True)
+                if attempt >= self.config.max_retries:
+                    raise
+                delay = self.get_backoff(attempt)
+                logger.warning(f"Calendar API request failed: {e!r}, retrying in {delay:.1f} s")
+                self.count(retries=1)
+                attempt += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.concurrency.release()
+                raise
+            else:
+                self.concurrency.release()
+                return result
+
+
+def is_retryable(error: Exception | None) -> bool:
+    """
+    Rate-limit errors (429, or 403 with a rate-limit reason) and server errors are worth retrying,
+    other client errors, like 403 forbidden or 410 gone, are not.
+    """
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in RETRYABLE_STATUSES:
+        return True
+    return error.resp.status == 403 and bool(RATE_LIMIT_REASONS & set(get_error_reasons(error)))
+
+
+def get_error_reasons(error: HttpError) -> list[str]:
+    try:
+        return [detail.get('reason') for detail in loads(error.content)['error']['errors']]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return []
@@ -0,0 +1,60 @@
+import logging
+import threading
+from functools import cache
+from typing import TYPE_CHECKING
+
+from snookxporter.parsing import loads
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'calendar'
+SERVICE_VERSION = 'v3'
+
+_services = threading.local()
+
+
+@cache
+def get_discovery_document() -> dict:
+    """
+    Discovery document bundled with google-api-python-client, parsed once per process.
+    """
+    from googleapiclient.discovery_cache import get_static_doc  # pylint: disable=import-outside-toplevel
+    return loads(get_static_doc(SERVICE_NAME, SERVICE_VERSION))
+
+
+def get_calendar_service(credentials: 'Credentials', root_url: str | None = None):
+    """
+    Returns the Calendar API service for the given credentials, built once per thread and reused afterward.
+
+    The underlying httplib2 connection is not thread-safe, so every thread gets its own service.
+    googleapiclient.discovery is slow to import, so it is loaded only once a service is needed.
+
+    With root_url, regular and batch requests go to another server implementing the API instead of Google,
+    like the local fake in benchmarks/servers.py.
+    """
+    # pylint: disable=import-outside-toplevel
+    from googleapiclient.discovery import build_from_document
+
+    from snookxporter.clients.google.model import FastJsonModel
+
+    services: dict[tuple[int, str | None], tuple['Credentials', object]] = _services.__dict__.setdefault(
+        'services', {}
+    )
+    cached = services.get((id(credentials), root_url))
+    if cached is None or cached[0] is not credentials:
+        logger.debug(f"Building {SERVICE_NAME} {SERVICE_VERSION} service in thread {threading.get_ident()}")
+        document = get_discovery_document()
+        if root_url:
+            document = {**document, 'rootUrl': root_url}
+        cached = services[(id(credentials), root_url)] = (
+            credentials,
+            build_from_document(
+                document,
+                credentials=credentials,
+                model=FastJsonModel('dataWrapper' in document.get('features', [])),
+            ),
+        )
+    return cached[1]
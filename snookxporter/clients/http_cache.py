@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+from contextlib import suppress
+from dataclasses import dataclass
+
+from snookxporter.files import write_atomically
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    content: bytes
+    content_hash: str
+    etag: str | None = None
+    last_modified: str | None = None
+    fingerprint: str | None = None  # of the configuration the response was synchronized with
+
+    def get_conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    On-disk cache of response bodies with their validators, one file per URL.
+
+    Files are touched on every read and the least recently used ones are evicted once the cache
+    grows over max_bytes. Files are replaced atomically, so several threads or processes can share the cache,
+    and a file that cannot be read is removed and taken as a miss.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, url: str) -> CacheEntry | None:
+        path = self._get_path(url)
+        try:
+            with open(path, 'rb') as cache_file:
+                header, content = cache_file.read().split(b'\n', 1)
+            metadata = json.loads(header)
+            entry = CacheEntry(
+                content=content,
+                content_hash=metadata['content_hash'],
+                etag=metadata['etag'],
+                last_modified=metadata['last_modified'],
+                fingerprint=metadata.get('fingerprint'),
+            )
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Removing unreadable HTTP cache file {path}: {e!r}")
+            self._remove(path)
+            return None
+        with suppress(FileNotFoundError):  # evicted by another writer since, the entry read is still valid
+            os.utime(path)
+        return entry
+
+    def put(self, url: str, entry: CacheEntry) -> None:
+        header = json.dumps({
+            'url': url,
+            'content_hash': entry.content_hash,
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'fingerprint': entry.fingerprint,
+        }).encode()
+        write_atomically(self._get_path(url), header + b'\n' + entry.content)
+        self._evict()
+
+    def _evict(self) -> None:
+        stats = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.cache'):
+                with suppress(FileNotFoundError):  # removed by another writer
+                    stats[entry.path] = entry.stat().st_mtime, entry.stat().st_size
+        paths = sorted(stats, key=lambda path: stats[path][0])
+        total = sum(size for _, size in stats.values())
+        while total > self.max_bytes and len(paths) > 1:
+            oldest = paths.pop(0)
+            total -= stats[oldest][1]
+            logger.debug(f"Evicting {oldest} from HTTP cache")
+            self._remove(oldest)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        with suppress(FileNotFoundError):
+            os.remove(path)
+
+    def _get_path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{get_content_hash(url.encode())}.cache")
+
+
+def get_content_hash(content: bytes) -> str:
+    return hashlib.sha1(content, usedforsecurity=False).hexdigest()
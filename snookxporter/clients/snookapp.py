@@ -1,80 +1,269 @@
 import logging
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from snookxporter.entities import Match, Player
+try:
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None
+
+from snookxporter.clients.http_cache import CacheEntry, HttpCache, get_content_hash
+from snookxporter.entities import Match, Player, get_player
+from snookxporter.parsing import loads, parse_datetime
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
 class SnookAppConfig:
     base_url: str
     bookings_endpoint: str
+    chunk_days: int | None = None
+    workers: int = 4
+    retries: int = 3
+    timeout: float = 30
+    cache_dir: str | None = None
+    cache_max_bytes: int = 50 * 1024 * 1024
 
     def __post_init__(self):
         self.url = f"{self.base_url}{self.bookings_endpoint}"
 
 
-class SnookAppClient:
+class BaseSnookAppClient:
+    """
+    Windows, caching and routing of the schedule, shared by the blocking SnookAppClient and the asyncio client,
+    which differ only in how the schedule is downloaded.
+    """
     def __init__(self, config: SnookAppConfig):
         self.config = config
         self.date_format = "%Y-%m-%d"
         self.datetime_format = "%Y-%m-%dT%H:%M:%S"
+        self.cache = HttpCache(config.cache_dir, config.cache_max_bytes) if config.cache_dir else None
+        self.schedule_unchanged = False
+        self.processed_bookings = 0
+        self._pending_cache_entries: dict[str, CacheEntry] = {}
+        self._received_bytes: dict[str, int] = {}
+
+    @property
+    def received_bytes(self) -> int:
+        """
+        Bytes of responses to the last get_schedule or iter_schedule as received, before they were decompressed.
+        """
+        return sum(self._received_bytes.values())
 
     def extract_players_matches_from_schedule(self, schedule: list[dict], players: list[Player]) -> list[Match]:
-        return [
-            Match(
-                host=Player(
-                    first_name=item['match']['host']['firstName'],
-                    last_name=item['match']['host']['lastName'],
-                    alias=self._get_alias_for_player(item['match']['host'], players=players),
-                ),
-                guest=Player(
-                    first_name=item['match']['guest']['firstName'],
-                    last_name=item['match']['guest']['lastName'],
-                    alias=self._get_alias_for_player(item['match']['guest'], players=players),
-                ),
-                start=datetime.strptime(f"{item['timeFrom']}", self.datetime_format),
-                end=datetime.strptime(f"{item['timeTo']}", self.datetime_format),
-                host_score=item['match']['matchResult']['gamesHost'] if item['match'].get('matchResult') else None,
-                guest_score=item['match']['matchResult']['gamesGuest'] if item['match'].get('matchResult') else None,
-                table=court['number']
-            )
-            for match in schedule
-            for court in match['matchCourts']
-            for item in court['bookingItems']
-            if item.get('match')
-            and item.get('match').get('host')
-            and item.get('match').get('guest')
-            and self._is_host_or_guest_in_players(
-                host=item['match']['host'],
-                guest=item['match']['guest'],
-                players=players
-            )
-        ]
-
-    def get_schedule(self, past_days: int, future_days: int) -> list[dict]:
-        _from = (datetime.today() - timedelta(days=past_days)).strftime(self.date_format)
-        _to = (datetime.today() + timedelta(days=future_days)).strftime(self.date_format)
-        url = f"{self.config.url}?from={_from}&to={_to}"
-        response = requests.get(url=url)
-        response.raise_for_status()
-        return response.json()['bookings']['days']['SNOOKER']
+        return self.route_schedule(schedule=schedule, calendars_players=[players])[0]
+
+    def route_schedule(self, schedule: Iterable[dict], calendars_players: list[list[Player]]) -> list[list[Match]]:
+        """
+        Extracts matches of every calendar in a single pass over the schedule.
+
+        Players of all calendars are indexed by name, so finding calendars and aliases of a booking's players
+        is a dictionary lookup. Players are shared by all matches instead of being created per booking.
+        Returns matches in the order of given calendars, and counts the match bookings in processed_bookings.
+        """
+        index: dict[tuple[str, str], dict[int, Player]] = {}
+        for calendar, players in enumerate(calendars_players):
+            for player in players:
+                index.setdefault((player.first_name, player.last_name), {}).setdefault(
+                    calendar, get_player(first_name=player.first_name, last_name=player.last_name, alias=player.alias)
+                )
+
+        routed: list[list[Match]] = [[] for _ in calendars_players]
+        bookings = 0
+        for table, item in self._iter_match_bookings(schedule):
+            bookings += 1
+            host, guest = item['match']['host'], item['match']['guest']
+            host_players = index.get((host['firstName'], host['lastName']), {})
+            guest_players = index.get((guest['firstName'], guest['lastName']), {})
+            if not host_players and not guest_players:
+                continue
+            start = parse_datetime(f"{item['timeFrom']}", self.datetime_format)
+            end = parse_datetime(f"{item['timeTo']}", self.datetime_format)
+            result = item['match'].get('matchResult')
+            for calendar in sorted(host_players.keys() | guest_players.keys()):
+                routed[calendar].append(Match(
+                    host=host_players.get(calendar) or get_player(
+                        first_name=host['firstName'], last_name=host['lastName']
+                    ),
+                    guest=guest_players.get(calendar) or get_player(
+                        first_name=guest['firstName'], last_name=guest['lastName']
+                    ),
+                    start=start,
+                    end=end,
+                    host_score=result['gamesHost'] if result else None,
+                    guest_score=result['gamesGuest'] if result else None,
+                    table=table,
+                ))
+        self.processed_bookings = bookings
+        return routed
+
+    def commit_cache(self) -> None:
+        """
+        Stores responses of the last get_schedule, to be called once they were successfully synchronized.
+        """
+        if self.cache:
+            for url, entry in self._pending_cache_entries.items():
+                self.cache.put(url, entry)
+        self._pending_cache_entries = {}
+
+    def _read_schedule(
+            self,
+            url: str,
+            cached: CacheEntry | None,
+            status_code: int,
+            content: bytes,
+            headers: Mapping[str, str],
+            fingerprint: str | None,
+    ) -> tuple[list[dict], bool]:
+        """
+        Parses a successful or 304 Not Modified response, keeps it to be cached by commit_cache and tells
+        whether it is the same as the cached one, cached with the same fingerprint.
+        """
+        if cached and status_code == 304:
+            logger.debug(f"Schedule not modified: {url}")
+            content = cached.content
+        entry = CacheEntry(
+            content=content,
+            content_hash=get_content_hash(content),
+            etag=headers.get('ETag', cached.etag if cached else None),
+            last_modified=headers.get('Last-Modified', cached.last_modified if cached else None),
+            fingerprint=fingerprint,
+        )
+        self._pending_cache_entries[url] = entry
+        unchanged = (cached is not None and cached.content_hash == entry.content_hash
+                     and cached.fingerprint == fingerprint)
+        return loads(content)['bookings']['days']['SNOOKER'], unchanged
+
+    def _get_windows(self, past_days: int, future_days: int) -> list[tuple[date, date]]:
+        """
+        Splits the window into chunks of chunk_days. Neighbouring chunks share their boundary day, so no day
+        is lost whether the API treats the end date as inclusive or not; duplicated days are merged later.
+        """
+        _from = (datetime.today() - timedelta(days=past_days)).date()
+        _to = (datetime.today() + timedelta(days=future_days)).date()
+        if not self.config.chunk_days:
+            return [(_from, _to)]
+        windows = []
+        while True:
+            chunk_to = min(_from + timedelta(days=self.config.chunk_days), _to)
+            windows.append((_from, chunk_to))
+            if chunk_to >= _to:
+                return windows
+            _from = chunk_to
+
+    def _get_schedule_url(self, _from: date, _to: date) -> str:
+        return f"{self.config.url}?from={_from.strftime(self.date_format)}&to={_to.strftime(self.date_format)}"
 
     @staticmethod
-    def _is_host_or_guest_in_players(host: dict, guest: dict, players: list[Player]):
-        return Player(
-            first_name=host['firstName'],
-            last_name=host['lastName'],
-        ) in players or Player(
-            first_name=guest['firstName'],
-            last_name=guest['lastName'],
-        ) in players
+    def _iter_unique_days(chunks: Iterable[Iterable[dict]]) -> Iterator[dict]:
+        seen_dates = set()
+        for chunk in chunks:
+            for day in chunk:
+                if day.get('date'):
+                    if day['date'] in seen_dates:
+                        continue
+                    seen_dates.add(day['date'])
+                yield day
 
     @staticmethod
-    def _get_alias_for_player(player: dict, players: list[Player]):
-        alias = [p.alias for p in players
-                 if p.first_name == player['firstName']
-                 and p.last_name == player['lastName']]
-        return alias[0] if alias else None
+    def _iter_match_bookings(schedule: Iterable[dict]) -> Iterator[tuple[int, dict]]:
+        for day in schedule:
+            for court in day['matchCourts']:
+                for item in court['bookingItems']:
+                    if item.get('match') and item['match'].get('host') and item['match'].get('guest'):
+                        yield court['number'], item
+
+
+class SnookAppClient(BaseSnookAppClient):
+    def __init__(self, config: SnookAppConfig):
+        super().__init__(config)
+        self.session = self._get_session()
+
+    def get_schedule(self, past_days: int, future_days: int, fingerprint: str | None = None) -> list[dict]:
+        """
+        With chunk_days configured, the window is fetched in chunks concurrently and merged in date order.
+
+        With a cache configured, requests are conditional and schedule_unchanged tells whether every response
+        was identical to the one cached by the last commit_cache. The fingerprint, e.g. of the calendars the schedule
+        is routed to, is cached with the responses; a response cached with another one does not count as unchanged.
+        """
+        windows = self._get_windows(past_days=past_days, future_days=future_days)
+        self._pending_cache_entries = {}
+        self._received_bytes = {}
+        with ThreadPoolExecutor(max_workers=self.config.workers) as executor:
+            responses = list(executor.map(
+                lambda window: self._fetch_schedule(window[0], window[1], fingerprint), windows
+            ))
+        self.schedule_unchanged = all(unchanged for _, unchanged in responses)
+        return list(self._iter_unique_days(chunk for chunk, _ in responses))
+
+    def iter_schedule(self, past_days: int, future_days: int, fingerprint: str | None = None) -> Iterator[dict]:
+        """
+        Yields snooker days of the schedule one by one while the response is still being read, so only a single
+        day is held in memory. Chunks, if configured, are streamed one after another. Streamed responses
+        are not cached. Without the optional ijson package falls back to get_schedule.
+
+        Nothing is fetched before the first day is taken, so schedule_unchanged is reset right away and tells
+        whether the schedule is unchanged only once it has been consumed.
+        """
+        self.schedule_unchanged = False
+        return self._iter_schedule(past_days=past_days, future_days=future_days, fingerprint=fingerprint)
+
+    def _iter_schedule(self, past_days: int, future_days: int, fingerprint: str | None) -> Iterator[dict]:
+        if ijson is None:
+            logger.warning("ijson is not installed, reading the whole schedule at once")
+            yield from self.get_schedule(past_days=past_days, future_days=future_days, fingerprint=fingerprint)
+            return
+        windows = self._get_windows(past_days=past_days, future_days=future_days)
+        self._received_bytes = {}
+        yield from self._iter_unique_days(self._stream_schedule(*window) for window in windows)
+
+    def _fetch_schedule(self, _from: date, _to: date, fingerprint: str | None) -> tuple[list[dict], bool]:
+        """
+        Returns the schedule and whether it is the same as the cached one.
+        """
+        url = self._get_schedule_url(_from, _to)
+        cached = self.cache.get(url) if self.cache else None
+        response = self.session.get(
+            url=url,
+            timeout=self.config.timeout,
+            headers=cached.get_conditional_headers() if cached else None,
+        )
+        self._received_bytes[url] = response.raw.tell()
+        if not (cached and response.status_code == 304):
+            response.raise_for_status()
+        return self._read_schedule(url, cached, response.status_code, response.content, response.headers, fingerprint)
+
+    def _stream_schedule(self, _from: date, _to: date) -> Iterator[dict]:
+        url = self._get_schedule_url(_from, _to)
+        with self.session.get(url=url, timeout=self.config.timeout, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            yield from ijson.items(response.raw, 'bookings.days.SNOOKER.item', use_float=True)
+            self._received_bytes[url] = response.raw.tell()
+
+    def _get_session(self) -> requests.Session:
+        """
+        Pooled keep-alive session sized to the workers, with gzip and retries of every single request.
+        """
+        session = requests.Session()
+        session.headers['Accept-Encoding'] = 'gzip, deflate'
+        adapter = HTTPAdapter(
+            pool_maxsize=self.config.workers,
+            max_retries=Retry(
+                total=self.config.retries,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['GET'],
+            ),
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from snookxporter.clients.google.calendar import GoogleCalendarConfig
+from snookxporter.clients.snookapp import BaseSnookAppClient, SnookAppConfig
+
+logger = logging.getLogger(__name__)
+
+SnookAppClientT = TypeVar('SnookAppClientT', bound=BaseSnookAppClient)
+
+
+@dataclass
+class ClubConfig:
+    name: str
+    snook_app: SnookAppConfig
+    calendars: list[GoogleCalendarConfig]
+
+
+@dataclass
+class ScheduleSource(Generic[SnookAppClientT]):
+    """
+    SnookApp client of a single bookings URL and calendars of all clubs its schedule is routed to.
+    """
+    snook_app_client: SnookAppClientT
+    calendars_config: list[GoogleCalendarConfig]
+
+    @property
+    def calendars_hash(self) -> str:
+        """
+        Hash of the calendars with their players and aliases, which decide the events the schedule is turned into.
+        """
+        return hashlib.sha1(
+            json.dumps([
+                [calendar.id, [[p.first_name, p.last_name, p.alias] for p in calendar.players]]
+                for calendar in self.calendars_config
+            ]).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+
+
+def merge_clubs(clubs: list[ClubConfig]) -> list[ClubConfig]:
+    """
+    Merges clubs reading the same bookings URL, so their schedule is fetched once per cycle and routed to calendars
+    of all of them. The SnookApp settings, and so the fetched windows, of the first of them are used. Players
+    of a calendar configured by several of them are merged too.
+
+    A calendar cannot be synchronized with two different schedules, as each of them would remove events of the other.
+    """
+    merged: dict[str, ClubConfig] = {}
+    calendar_urls: dict[str, str] = {}
+    for club in clubs:
+        url = club.snook_app.url
+        source = merged.get(url)
+        if source is None:
+            source = merged[url] = ClubConfig(name=club.name, snook_app=club.snook_app, calendars=[])
+        else:
+            logger.info(f"Clubs {source.name} and {club.name} read the same schedule ({url}), fetching it once")
+            if club.snook_app != source.snook_app:
+                logger.warning(f"SnookApp settings of club {club.name} differ from those of club {source.name}, "
+                               f"which are used")
+            source.name = f"{source.name}, {club.name}"
+        calendars = {calendar.id: calendar for calendar in source.calendars}
+        for calendar in club.calendars:
+            if calendar_urls.setdefault(calendar.id, url) != url:
+                raise ValueError(f"Calendar ({calendar.id}) is configured with schedules of both "
+                                 f"{calendar_urls[calendar.id]} and {url}")
+            if calendar.id in calendars:
+                calendars[calendar.id].players += [
+                    player for player in calendar.players if player not in calendars[calendar.id].players
+                ]
+            else:
+                calendars[calendar.id] = GoogleCalendarConfig(id=calendar.id, players=list(calendar.players))
+                source.calendars.append(calendars[calendar.id])
+    return list(merged.values())
@@ -1,24 +1,51 @@
-from dataclasses import dataclass
+import hashlib
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import cache
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class Player:
+    """
+    Players are equal by name, the alias only changes how they are shown in a calendar.
+    """
     first_name: str
     last_name: str
     alias: str | None = None
+    _hash: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, '_hash', hash(self._get_identity()))
 
     def __repr__(self):
         return f"{self.first_name} {self.last_name}"
 
     def __eq__(self, other):
-        return self.first_name == other.first_name and self.last_name == other.last_name
+        if not isinstance(other, Player):
+            return NotImplemented
+        return self is other or (self._hash == other._hash and self._get_identity() == other._get_identity())
 
     def __hash__(self):
-        return hash((self.first_name, self.last_name))
+        return self._hash
+
+    def _get_identity(self) -> tuple:
+        return self.first_name, self.last_name
+
+
+@cache
+def get_player(first_name: str, last_name: str, alias: str | None = None) -> Player:
+    """
+    Returns the single shared instance of the player with the alias, so recurring players are not duplicated.
+    """
+    return Player(first_name=first_name, last_name=last_name, alias=alias)
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class Match:
+    """
+    Matches are equal if they would be written as the same calendar event, the item id is not compared.
+    The hash is computed once, the key and the content hash on first use.
+    """
     host: Player
     guest: Player
     start: datetime
@@ -27,17 +54,20 @@ class Match:
     guest_score: int | None = None
     item_id: str | None = None
     table: int | None = None
+    _hash: int = field(init=False, repr=False)
+    _key: str | None = field(init=False, repr=False, default=None)
+    _content_hash: str | None = field(init=False, repr=False, default=None)
 
     def __eq__(self, other):
-        return (self.host == other.host and self.guest == other.guest
-                and self.start == other.start and self.end == other.end
-                and self.host_score == other.host_score and self.guest_score == other.guest_score)
+        if not isinstance(other, Match):
+            return NotImplemented
+        return self is other or (self._hash == other._hash and self._get_identity() == other._get_identity())
 
     def __hash__(self):
-        return hash(
-            (self.host, self.guest, self.start, self.end,
-             self.host_score, self.guest_score, self.table)
-        )
+        return self._hash
+
+    def _get_identity(self) -> tuple:
+        return self.host, self.guest, self.start, self.end, self.host_score, self.guest_score, self.table
 
     def get_match_calendar_summary(self):
         host = self.host.alias if self.host.alias else self.host
@@ -51,12 +81,40 @@ class Match:
         return (f"{self.host} {self._get_vs_or_score()} {self.guest}\n"
                 f"Table number {self.table}\n")
 
+    def get_key(self) -> str:
+        """
+        Stable identity of the fixture: the same players at the same time, regardless of the result or table.
+        """
+        key = self._key
+        if key is None:
+            key = self._get_digest(
+                self.host.first_name, self.host.last_name,
+                self.guest.first_name, self.guest.last_name,
+                self.start.isoformat(),
+            )
+            object.__setattr__(self, '_key', key)
+        return key
+
+    def get_content_hash(self) -> str:
+        """
+        Hash of everything written to the calendar event, changes whenever the event has to be rewritten.
+        """
+        content_hash = self._content_hash
+        if content_hash is None:
+            content_hash = self._get_digest(
+                self.get_match_calendar_summary(), self.get_match_calendar_description(),
+                self.start.isoformat(), self.end.isoformat(),
+            )
+            object.__setattr__(self, '_content_hash', content_hash)
+        return content_hash
+
 
     def __post_init__(self):
         if self.start.tzinfo:
             object.__setattr__(self, 'start', self.start.replace(tzinfo=None))
         if self.end.tzinfo:
             object.__setattr__(self, 'end', self.end.replace(tzinfo=None))
+        object.__setattr__(self, '_hash', hash(self._get_identity()))
 
     def _is_finished(self):
         return self.host_score is not None and self.guest_score is not None
@@ -64,16 +122,17 @@ class Match:
     def _get_vs_or_score(self):
         return f"{self.host_score}:{self.guest_score}" if self._is_finished() else "v"
 
-    @classmethod
-    def get_match_to_delete_from_calendar(cls, item_id: str) -> 'Match':
-        dummy_player = Player(
-            first_name="Dummy",
-            last_name="Player",
-        )
-        return Match(
-            host=dummy_player,
-            guest=dummy_player,
-            start=datetime.fromtimestamp(0),
-            end=datetime.fromtimestamp(0),
-            item_id=item_id,
-        )
+    @staticmethod
+    def _get_digest(*values: str) -> str:
+        return hashlib.sha1("\x1f".join(values).encode(), usedforsecurity=False).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class CalendarEvent:
+    """
+    Event found in the calendar. Key and content hash are None for events not created by SnookXporter.
+    """
+    item_id: str
+    key: str | None = None
+    content_hash: str | None = None
+    start: datetime | None = None
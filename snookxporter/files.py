@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+
+def write_atomically(path: str, content: str | bytes) -> None:
+    """
+    Writes a temporary file next to the path and renames it over the path, so other threads and processes
+    reading or writing the file at the same time only ever see a complete one. Text is written in UTF-8.
+    """
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or '.', prefix=f".{os.path.basename(path)}.",
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content.encode('utf8') if isinstance(content, str) else content)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
@@ -0,0 +1,84 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from dataclasses import dataclass
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '[%(asctime)s (%(filename)s:%(lineno)d) %(levelname)s] - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Attributes of every LogRecord, anything else on a record was passed in `extra`
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+@dataclass
+class LoggingConfig:
+    level: str = 'DEBUG'
+    file: str = 'logs/debug.log'
+    max_bytes: int = 10 * 1024 * 1024
+    backup_count: int = 5
+    format: str = 'text'
+
+    def __post_init__(self):
+        if self.format not in ('text', 'json'):
+            raise ValueError(f"Unknown logging format: {self.format}")
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Enqueues records as they are, so even the messages are formatted by the listener thread.
+
+    The standard QueueHandler formats the message in the logging thread to make the record picklable,
+    which is not needed for an in-process queue.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as JSON lines, with fields passed in `extra` (e.g. calendar_id, phase, count) at the top level.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(config: LoggingConfig | None = None) -> QueueListener:
+    """
+    Logs to the console and to a rotated file (relative to the project unless absolute). Callers only put records
+    on a queue; a listener thread formats and writes them, and is stopped, flushing the queue, at exit.
+    Called by commands, so importing the package has no side effects.
+    """
+    from settings.config import ConfigParser  # pylint: disable=import-outside-toplevel
+
+    config = config or LoggingConfig()
+    formatter = JsonFormatter() if config.format == 'json' else logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+    path = os.path.join(ConfigParser.get_root_dir(), config.file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handlers: list[logging.Handler] = [
+        RotatingFileHandler(path, maxBytes=config.max_bytes, backupCount=config.backup_count, encoding='utf8'),
+        logging.StreamHandler(),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    root = logging.getLogger()
+    root.setLevel(config.level)
+    root.addHandler(BackgroundQueueHandler(records))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
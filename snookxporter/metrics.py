@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from snookxporter.files import write_atomically
+
+if TYPE_CHECKING:
+    from snookxporter.clients.google.rate_limit import BaseRateLimiter
+    from snookxporter.clients.snookapp import BaseSnookAppClient
+    from snookxporter.sync import CalendarSyncResult
+
+PREFIX = 'snookxporter'
+DESCRIPTIONS = {
+    'run_succeeded': "Whether every calendar of the last run was synchronized",
+    'run_timestamp_seconds': "Unix time the last run ended at",
+    'run_duration_seconds': "Duration of the last run",
+    'phase_duration_seconds': "Seconds spent in a phase of the last run, per source or calendar",
+    'calendars': "Calendars of the last run by status",
+    'events': "Calendar events of the last run by operation",
+    'calendar_api_calls': "Calendar API calls of the last run, counting every request of a batch and every attempt",
+    'calendar_api_retries': "Calendar API requests of the last run retried after rate-limit or server errors",
+    'snookapp_received_bytes': "Bytes of SnookApp responses of the last run as received, before decompression",
+    'processed_bookings': "Match bookings of the schedule processed by the last run",
+}
+CALENDAR_STATUSES = ('synchronized', 'unchanged', 'failed')
+EVENT_OPERATIONS = ('added', 'updated', 'removed', 'failed')
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass
+class Span:
+    phase: str
+    labels: dict[str, str]
+    start: float  # seconds since the start of the run
+    duration: float
+    thread: str
+
+
+class RunMetrics:
+    """
+    Timings of phases and counters of a single synchronization cycle, collected from all its threads or coroutines
+    and written as a Prometheus textfile (for the node exporter's textfile collector) and as a JSON run report.
+
+    Counts of the rate limiter, which keeps counting across cycles, are taken relative to those at the start.
+    With record_spans, every measured phase is kept as a span too, to be written as a Chrome trace.
+    """
+    def __init__(self, rate_limiter: 'BaseRateLimiter | None' = None, record_spans: bool = False):
+        self.rate_limiter = rate_limiter
+        self.started = time.time()
+        self.duration: float | None = None
+        self.results: list['CalendarSyncResult'] | None = None
+        self.spans: list[Span] | None = [] if record_spans else None
+        self._values: dict[tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+        self._perf_started = time.perf_counter()
+        self._calls, self._retries = (rate_limiter.calls, rate_limiter.retries) if rate_limiter else (0, 0)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.results is not None and all(result.succeeded for result in self.results)
+
+    @contextmanager
+    def measure(self, phase: str, **labels: str) -> Iterator[None]:
+        """
+        Adds the duration of the block, even if it raised, to the phase.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            self.add('phase_duration_seconds', duration, phase=phase, **labels)
+            if self.spans is not None:
+                self.spans.append(Span(
+                    phase=phase, labels=labels, start=started - self._perf_started, duration=duration,
+                    thread=threading.current_thread().name,
+                ))
+
+    def add(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def finish(self, results: list['CalendarSyncResult'] | None, snook_app_clients: list['BaseSnookAppClient']) -> None:
+        """
+        Ends the run with results of its calendars, or None if it failed before synchronizing them.
+        """
+        self.duration = time.perf_counter() - self._perf_started
+        self.results = results
+        if self.rate_limiter:
+            self.add('calendar_api_calls', self.rate_limiter.calls - self._calls)
+            self.add('calendar_api_retries', self.rate_limiter.retries - self._retries)
+        for client in snook_app_clients:
+            self.add('snookapp_received_bytes', client.received_bytes, source=client.config.url)
+        for status in CALENDAR_STATUSES:
+            self.add('calendars', sum(get_status(result) == status for result in results or []), status=status)
+        for operation in EVENT_OPERATIONS:
+            self.add('events', sum(getattr(result, operation) for result in results or []), operation=operation)
+
+    def get_samples(self) -> list[tuple[str, dict[str, str], float]]:
+        """
+        Name, labels and value of every metric, including those of the run, in the order of DESCRIPTIONS.
+        """
+        with self._lock:
+            values = dict(self._values)
+        values[('run_succeeded', ())] = int(self.succeeded)
+        values[('run_timestamp_seconds', ())] = self.started + (self.duration or 0)
+        if self.duration is not None:
+            values[('run_duration_seconds', ())] = self.duration
+        order = list(DESCRIPTIONS)
+        return [
+            (name, dict(labels), value)
+            for (name, labels), value in sorted(values.items(), key=lambda item: (order.index(item[0][0]), item[0][1]))
+        ]
+
+    def to_prometheus(self) -> str:
+        lines = []
+        previous_name = None
+        for name, labels, value in self.get_samples():
+            metric = f"{PREFIX}_{name}"
+            if name != previous_name:
+                lines += [f"# HELP {metric} {DESCRIPTIONS[name]}.", f"# TYPE {metric} gauge"]
+                previous_name = name
+            if labels:
+                metric += "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_report(self) -> dict:
+        return {
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='milliseconds'),
+            'duration_seconds': self.duration,
+            'succeeded': self.succeeded,
+            'calendars': [
+                {
+                    'calendar_id': result.calendar_id,
+                    'status': get_status(result),
+                    'added': result.added,
+                    'updated': result.updated,
+                    'removed': result.removed,
+                    'failed': result.failed,
+                    'error': repr(result.error) if result.error else None,
+                }
+                for result in self.results or []
+            ],
+            'metrics': [
+                {'name': name, 'labels': labels, 'value': value} for name, labels, value in self.get_samples()
+            ],
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """
+        The run and its spans in the Trace Event Format of chrome://tracing and Perfetto. Every source and calendar
+        gets its own track, as phases of different calendars overlap in a single thread of the async engine.
+        """
+        pid = os.getpid()
+        tracks = {'run': 0}
+        events: list[dict] = [{
+            'name': 'run', 'ph': 'X', 'ts': 0, 'dur': to_microseconds(self.duration or 0), 'pid': pid, 'tid': 0,
+            'args': {'succeeded': self.succeeded},
+        }]
+        for span in self.spans or []:
+            track = ", ".join(span.labels.values()) or span.phase
+            events.append({
+                'name': span.phase, 'cat': ",".join(span.labels), 'ph': 'X', 'ts': to_microseconds(span.start),
+                'dur': to_microseconds(span.duration), 'pid': pid, 'tid': tracks.setdefault(track, len(tracks)),
+                'args': {**span.labels, 'thread': span.thread},
+            })
+        events += [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': track}}
+            for track, tid in tracks.items()
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(
+            self, metrics_file: str | None = None, report_file: str | None = None, trace_file: str | None = None
+    ) -> None:
+        """
+        Writes the Prometheus textfile, the JSON report and the Chrome trace, each only if its path is given.
+        Files are replaced atomically, so the collector never reads a partially written one.
+        """
+        if metrics_file:
+            write_atomically(metrics_file, self.to_prometheus())
+        if report_file:
+            write_atomically(report_file, json.dumps(self.to_report(), indent=2))
+        if trace_file:
+            write_atomically(trace_file, json.dumps(self.to_chrome_trace()))
+
+
+def get_status(result: 'CalendarSyncResult') -> str:
+    if not result.succeeded:
+        return 'failed'
+    return 'unchanged' if result.unchanged else 'synchronized'
+
+
+def to_microseconds(seconds: float) -> float:
+    return round(seconds * 1_000_000, 3)
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
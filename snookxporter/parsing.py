@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+from functools import lru_cache
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+ISO_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+ISO_DATETIME_FORMAT_WITH_TIMEZONE = '%Y-%m-%dT%H:%M:%S%z'
+TIMESTAMPS_CACHE_SIZE = 8192
+
+
+def loads(content: bytes | str) -> Any:
+    """
+    Decodes JSON with orjson if the optional package is installed, otherwise with the standard library.
+    Both raise json.JSONDecodeError on invalid documents.
+    """
+    if orjson is not None:
+        return orjson.loads(content)  # pylint: disable=no-member  # compiled extension pylint cannot inspect
+    return json.loads(content)
+
+
+@lru_cache(maxsize=TIMESTAMPS_CACHE_SIZE)
+def parse_datetime(value: str, date_format: str) -> datetime:
+    """
+    Returns the same as datetime.strptime(value, date_format), faster.
+
+    Timestamps in the exact ISO-8601 shape of the format are parsed by datetime.fromisoformat, anything else
+    by strptime. Results are cached, as bookings and events share a limited number of start and end times.
+    """
+    if _is_iso_shaped(value, date_format):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, date_format)
+
+
+def _is_iso_shaped(value: str, date_format: str) -> bool:
+    if (len(value) < 19 or value[4] != '-' or value[7] != '-' or value[10] != 'T'
+            or value[13] != ':' or value[16] != ':'):
+        return False
+    if date_format == ISO_DATETIME_FORMAT:
+        return len(value) == 19
+    if date_format == ISO_DATETIME_FORMAT_WITH_TIMEZONE:
+        return value[19:] == 'Z' or (len(value) == 25 and value[19] in '+-' and value[22] == ':')
+    return False
@@ -0,0 +1,129 @@
+import logging
+import sqlite3
+import threading
+from collections.abc import Iterable
+from datetime import datetime
+
+from snookxporter.entities import CalendarEvent
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendar_sync (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calendar_events (
+    calendar_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    match_key TEXT,
+    content_hash TEXT,
+    start TEXT,
+    PRIMARY KEY (calendar_id, item_id)
+);
+CREATE TABLE IF NOT EXISTS calendar_schedule (
+    calendar_id TEXT PRIMARY KEY,
+    schedule_hash TEXT NOT NULL
+);
+"""
+
+
+class StateStore:
+    """
+    Local SQLite state kept between runs. The connection is shared by all worker threads, guarded by a lock.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        logger.debug(f"Using state store: {path}")
+
+    def get_sync_token(self, calendar_id: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sync_token FROM calendar_sync WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_events(self, calendar_id: str) -> list[CalendarEvent]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT item_id, match_key, content_hash, start FROM calendar_events "
+                "WHERE calendar_id = ? ORDER BY start, item_id",
+                (calendar_id,)
+            ).fetchall()
+        return [
+            CalendarEvent(
+                item_id=item_id,
+                key=key,
+                content_hash=content_hash,
+                start=datetime.fromisoformat(start) if start else None,
+            ) for item_id, key, content_hash, start in rows
+        ]
+
+    def update_events(
+            self,
+            calendar_id: str,
+            sync_token: str,
+            changed: Iterable[CalendarEvent],
+            deleted_ids: Iterable[str],
+            replace: bool = False,
+    ) -> None:
+        """
+        Applies listed changes of the calendar and stores the token for the next incremental listing.
+        With replace all previously known events of the calendar are dropped first (after a full listing).
+        """
+        with self._lock, self._connection:
+            if replace:
+                self._connection.execute("DELETE FROM calendar_events WHERE calendar_id = ?", (calendar_id,))
+            self._apply_events(calendar_id, changed=changed, deleted_ids=deleted_ids)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO calendar_sync (calendar_id, sync_token) VALUES (?, ?)",
+                (calendar_id, sync_token)
+            )
+
+    def record_written_events(
+            self, calendar_id: str, written: Iterable[CalendarEvent], deleted_ids: Iterable[str]
+    ) -> None:
+        """
+        Records events inserted or deleted by this run, with the ids returned by the API.
+        """
+        with self._lock, self._connection:
+            self._apply_events(calendar_id, changed=written, deleted_ids=deleted_ids)
+
+    def get_schedule_hash(self, calendar_id: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT schedule_hash FROM calendar_schedule WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_schedule_hash(self, calendar_id: str, schedule_hash: str) -> None:
+        """
+        Stores the hash of the schedule the calendar was fully synchronized with.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO calendar_schedule (calendar_id, schedule_hash) VALUES (?, ?)",
+                (calendar_id, schedule_hash)
+            )
+
+    def _apply_events(self, calendar_id: str, changed: Iterable[CalendarEvent], deleted_ids: Iterable[str]) -> None:
+        self._connection.executemany(
+            "DELETE FROM calendar_events WHERE calendar_id = ? AND item_id = ?",
+            [(calendar_id, item_id) for item_id in deleted_ids]
+        )
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO calendar_events (calendar_id, item_id, match_key, content_hash, start) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (calendar_id, event.item_id, event.key, event.content_hash,
+                 event.start.isoformat() if event.start else None)
+                for event in changed
+            ]
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,514 @@
+import hashlib
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from snookxporter.clients.google.calendar import (BaseGoogleCalendarClient, GoogleCalendarClient, GoogleCalendarConfig,
+                                                  OperationResult)
+from snookxporter.clients.google.credentials import CredentialManager
+from snookxporter.clients.google.rate_limit import RateLimitConfig, RateLimiter
+from snookxporter.clients.snookapp import SnookAppClient
+from snookxporter.clubs import ScheduleSource, SnookAppClientT
+from snookxporter.entities import CalendarEvent, Match, Player
+from snookxporter.metrics import RunMetrics
+from snookxporter.state import StateStore
+
+logger = logging.getLogger(__name__)
+
+CalendarClientT = TypeVar('CalendarClientT', bound=BaseGoogleCalendarClient)
+
+
+@dataclass
+class CalendarSyncResult:
+    calendar_id: str
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    failed: int = 0
+    unchanged: bool = False
+    error: Exception | None = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None and not self.failed
+
+    def __str__(self):
+        if self.error:
+            return f"{self.calendar_id}: error: {self.error!r}"
+        if self.unchanged:
+            return f"{self.calendar_id}: unchanged"
+        return (f"{self.calendar_id}: added {self.added}, updated {self.updated}, removed {self.removed}, "
+                f"failed {self.failed}")
+
+
+class CalendarSync:
+    """
+    Steps of synchronizing a single calendar with its matches from the schedule, shared by the threads and the asyncio
+    engines, which only make the client calls in between. Used as a context manager around them, it catches any error
+    and reports it in the result, so one failing calendar does not stop the others.
+
+    With a state store, a calendar without changes since the last run synchronized with the same schedule
+    is skipped without diffing and writes. Durations of the phases are added to the metrics.
+    """
+    def __init__(
+            self,
+            calendar_client: BaseGoogleCalendarClient,
+            matches: list[Match],
+            schedule_hash: str | None = None,
+            metrics: RunMetrics | None = None,
+    ):
+        self.calendar_client = calendar_client
+        self.calendar_id = calendar_client.calendar_id
+        self.matches = matches
+        self.calendar_hash = get_calendar_schedule_hash(schedule_hash, calendar_client.players) \
+            if schedule_hash else None
+        self.metrics = metrics or RunMetrics()
+        self.result = CalendarSyncResult(calendar_id=self.calendar_id)
+        self.to_add: list[Match] = []
+        self.to_update: list[tuple[CalendarEvent, Match]] = []
+        self.to_remove: list[CalendarEvent] = []
+
+    def __enter__(self) -> 'CalendarSync':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        if not isinstance(exc, Exception):
+            return False
+        logger.error(f"Synchronization of calendar ({self.calendar_id}) failed", exc_info=exc)
+        self.result.error = exc
+        return True
+
+    def diff(self, calendar_events: list[CalendarEvent]) -> bool:
+        """
+        Finds the events to add, update and remove. Returns False for a calendar skipped as unchanged.
+        """
+        if is_calendar_unchanged(self.calendar_client, calendar_events, self.calendar_hash):
+            self.result.unchanged = True
+            return False
+        logger.debug("Decider matches: %s", self.matches,
+                     extra={'calendar_id': self.calendar_id, 'phase': 'route', 'count': len(self.matches)})
+        with self.metrics.measure('diff', calendar=self.calendar_id):
+            self.to_add, self.to_update, self.to_remove = get_differences(matches=self.matches, events=calendar_events)
+        return True
+
+    @contextmanager
+    def write(self, phase: str, items: list) -> Iterator[None]:
+        """
+        Logs and measures the block writing the items.
+        """
+        _log_operations(phase, self.calendar_id, items)
+        with self.metrics.measure(phase, calendar=self.calendar_id):
+            yield
+
+    def count(
+            self, added: list[OperationResult], updated: list[OperationResult], removed: list[OperationResult]
+    ) -> None:
+        count_operations(self.result, self.calendar_client, self.calendar_hash, added, updated, removed)
+
+
+def sync_calendar(
+        calendar_client: GoogleCalendarClient,
+        matches: list[Match],
+        past_days: int,
+        future_days: int,
+        schedule_hash: str | None = None,
+        metrics: RunMetrics | None = None,
+) -> CalendarSyncResult:
+    """
+    Lists the calendar events and synchronizes them with the matches, see CalendarSync.
+    """
+    with CalendarSync(calendar_client, matches, schedule_hash, metrics) as calendar_sync:
+        with calendar_sync.metrics.measure('list', calendar=calendar_sync.calendar_id):
+            calendar_events = calendar_client.get_events(past_days=past_days, future_days=future_days)
+        if calendar_sync.diff(calendar_events):
+            with calendar_sync.write('add', calendar_sync.to_add):
+                added = calendar_client.add_events(calendar_sync.to_add)
+            with calendar_sync.write('update', calendar_sync.to_update):
+                updated = calendar_client.update_events(calendar_sync.to_update)
+            with calendar_sync.write('remove', calendar_sync.to_remove):
+                removed = calendar_client.delete_events(calendar_sync.to_remove)
+            calendar_sync.count(added, updated, removed)
+    return calendar_sync.result
+
+
+def is_calendar_unchanged(
+        calendar_client: BaseGoogleCalendarClient, calendar_events: list[CalendarEvent], calendar_hash: str | None
+) -> bool:
+    """
+    Whether no events changed since the calendar was last synchronized with the same schedule.
+    """
+    logger.debug("Calendar events: %s", calendar_events,
+                 extra={'calendar_id': calendar_client.calendar_id, 'phase': 'list', 'count': len(calendar_events)})
+    state = calendar_client.state
+    if (state and calendar_hash and calendar_client.listed_changes == 0
+            and state.get_schedule_hash(calendar_client.calendar_id) == calendar_hash):
+        logger.info(f"Calendar ({calendar_client.calendar_id}) and schedule unchanged since last run")
+        return True
+    return False
+
+
+def count_operations(
+        result: CalendarSyncResult,
+        calendar_client: BaseGoogleCalendarClient,
+        calendar_hash: str | None,
+        added: list[OperationResult],
+        updated: list[OperationResult],
+        removed: list[OperationResult],
+) -> CalendarSyncResult:
+    """
+    Counts results of the operations. The schedule hash is stored only once all of them succeeded.
+    """
+    result.added = sum(1 for r in added if r.succeeded)
+    result.updated = sum(1 for r in updated if r.succeeded)
+    result.removed = sum(1 for r in removed if r.succeeded)
+    result.failed = sum(1 for r in added + updated + removed if not r.succeeded)
+    if result.failed:
+        logger.warning(f"{result.failed} operations failed on calendar ({calendar_client.calendar_id})")
+    elif calendar_client.state and calendar_hash:
+        calendar_client.state.set_schedule_hash(calendar_client.calendar_id, calendar_hash)
+    return result
+
+
+def _log_operations(phase: str, calendar_id: str, items: list) -> None:
+    """
+    Logs the number of events at INFO and the events themselves at DEBUG. Arguments are formatted lazily,
+    by the logging thread and only if the level is enabled.
+    """
+    extra = {'calendar_id': calendar_id, 'phase': phase, 'count': len(items)}
+    logger.info("Events to %s in calendar (%s): %d", phase, calendar_id, len(items), extra=extra)
+    logger.debug("Events to %s in calendar (%s): %s", phase, calendar_id, items, extra=extra)
+
+
+class BaseSynchronizer(ABC, Generic[SnookAppClientT, CalendarClientT]):
+    """
+    Sources, calendar clients with their shared credentials, and the bookkeeping of cycles, shared by Synchronizer
+    and AsyncSynchronizer. Subclasses create the calendar clients with their own rate limiter.
+    """
+    def __init__(
+            self,
+            sources: list[ScheduleSource[SnookAppClientT]],
+            token: dict,
+            past_days: int,
+            future_days: int,
+            include_unmarked_events: bool = False,
+            state: StateStore | None = None,
+            calendar_root_url: str | None = None,
+            record_spans: bool = False,
+    ):
+        self.sources = sources
+        self.credential_manager = CredentialManager(token, background_refresh=True)
+        self.past_days = past_days
+        self.future_days = future_days
+        self.include_unmarked_events = include_unmarked_events
+        self.state = state
+        self.calendar_root_url = calendar_root_url
+        self._calendar_clients: list[list[CalendarClientT]] | None = None
+        self._synchronized_schedule_hashes: dict[int, str] = {}
+        self.record_spans = record_spans
+        self.metrics: RunMetrics | None = None
+
+    @property
+    def calendar_clients(self) -> list[list[CalendarClientT]]:
+        """
+        Clients of calendars of every source, in the order of sources.
+        """
+        if self._calendar_clients is None:
+            self._calendar_clients = [
+                [self._create_calendar_client(calendar) for calendar in source.calendars_config]
+                for source in self.sources
+            ]
+        return self._calendar_clients
+
+    @property
+    def skips_unchanged_schedules(self) -> bool:
+        """
+        Whether calendars of a source whose schedule is unchanged are skipped without being listed. With a state store,
+        they are listed incrementally instead, so events changed in them since are synchronized again, and only those
+        without any changes are skipped.
+        """
+        return self.state is None and not self.include_unmarked_events
+
+    def close(self) -> None:
+        self.credential_manager.close()
+        if self.state:
+            self.state.close()
+
+    @abstractmethod
+    def _create_calendar_client(self, calendar: GoogleCalendarConfig) -> CalendarClientT:
+        """
+        Client of the calendar, sharing the credentials and the rate limiter of the synchronizer.
+        """
+
+    def _is_schedule_unchanged(self, snook_app_client: SnookAppClientT) -> bool:
+        """
+        Whether the fetched schedule, together with the calendars it is routed to, is the same as the one cached
+        by the last synchronization.
+        """
+        if snook_app_client.schedule_unchanged and self.skips_unchanged_schedules:
+            logger.info(f"Schedule ({snook_app_client.config.url}) and its calendars unchanged since the last "
+                        f"synchronization, nothing to do")
+            return True
+        return False
+
+    def _is_schedule_synchronized(self, index: int, schedule_hash: str) -> bool:
+        """
+        Whether the routed schedule of the source is the one synchronized by the last successful cycle.
+        """
+        if schedule_hash == self._synchronized_schedule_hashes.get(index) and self.skips_unchanged_schedules:
+            logger.info(f"Schedule ({self.sources[index].snook_app_client.config.url}) unchanged since the last cycle, "
+                        f"nothing to do")
+            return True
+        return False
+
+    def _fail_source(self, index: int, error: Exception) -> list[CalendarSyncResult]:
+        source = self.sources[index]
+        logger.error(f"Fetching the schedule ({source.snook_app_client.config.url}) failed", exc_info=error)
+        return get_failed_results(source, error)
+
+    def _finish_cycle(
+            self,
+            results: list[CalendarSyncResult],
+            schedules: list[tuple[int, list[list[Match]], str]],
+            synchronized: list[CalendarSyncResult],
+    ) -> list[CalendarSyncResult]:
+        """
+        Logs the summary of the failed sources and synchronized calendars, and commits the SnookApp cache
+        and the schedule hash of every source whose calendars all succeeded.
+        """
+        results = results + synchronized
+        log_summary(results)
+        for index, schedule_results, schedule_hash in split_results(schedules, synchronized):
+            if all(result.succeeded for result in schedule_results):
+                self.sources[index].snook_app_client.commit_cache()
+                self._synchronized_schedule_hashes[index] = schedule_hash
+        return results
+
+
+class Synchronizer(BaseSynchronizer[SnookAppClient, GoogleCalendarClient]):
+    """
+    Runs synchronization cycles of all calendars of all schedule sources.
+
+    Calendar clients, with their shared credentials and rate limiter, are created by the first cycle which needs them.
+    They are kept for the next cycles together with the SnookApp sessions, the state store and the worker threads,
+    whose calendar services and connections stay open in between. The credentials are refreshed in the background
+    before they expire. Metrics of the last cycle are kept in metrics.
+    """
+    def __init__(
+            self,
+            sources: list[ScheduleSource[SnookAppClient]],
+            token: dict,
+            past_days: int,
+            future_days: int,
+            include_unmarked_events: bool = False,
+            state: StateStore | None = None,
+            stream_schedule: bool = False,
+            workers: int = 1,
+            calendar_root_url: str | None = None,
+            rate_limit: RateLimitConfig | None = None,
+            record_spans: bool = False,
+    ):
+        super().__init__(
+            sources=sources, token=token, past_days=past_days, future_days=future_days,
+            include_unmarked_events=include_unmarked_events, state=state, calendar_root_url=calendar_root_url,
+            record_spans=record_spans,
+        )
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.stream_schedule = stream_schedule
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def synchronize(self) -> list[CalendarSyncResult]:
+        """
+        Runs a single cycle and returns results of calendars of all sources, except those whose schedule is unchanged
+        since the last successful cycle, see skips_unchanged_schedules. Calendars of all sources share the worker
+        threads. A source whose schedule cannot be fetched fails its calendars only. The SnookApp cache of a source
+        is committed only once every of its calendars succeeded.
+        """
+        metrics = self.metrics = RunMetrics(self.rate_limiter, record_spans=self.record_spans)
+        results: list[CalendarSyncResult] | None = None
+        try:
+            results = self._synchronize(metrics)
+            return results
+        finally:
+            metrics.finish(results, [source.snook_app_client for source in self.sources])
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        super().close()
+
+    def _create_calendar_client(self, calendar: GoogleCalendarConfig) -> GoogleCalendarClient:
+        return GoogleCalendarClient(
+            config=calendar, credential_manager=self.credential_manager,
+            include_unmarked_events=self.include_unmarked_events, state=self.state,
+            root_url=self.calendar_root_url, rate_limiter=self.rate_limiter,
+        )
+
+    def _synchronize(self, metrics: RunMetrics) -> list[CalendarSyncResult]:
+        results: list[CalendarSyncResult] = []
+        schedules: list[tuple[int, list[list[Match]], str]] = []
+        for index, source in enumerate(self.sources):
+            try:
+                schedule = self._route_schedule(index, source, metrics)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                results += self._fail_source(index, e)
+                continue
+            if schedule:
+                schedules.append((index, *schedule))
+        if not results and not schedules:
+            return []
+
+        jobs = [
+            (client, matches, schedule_hash)
+            for index, calendars_matches, schedule_hash in schedules
+            for client, matches in zip(self.calendar_clients[index], calendars_matches)
+        ]
+        synchronized = list(self._executor.map(
+            lambda job: sync_calendar(
+                calendar_client=job[0],
+                matches=job[1],
+                past_days=self.past_days,
+                future_days=self.future_days,
+                schedule_hash=job[2],
+                metrics=metrics,
+            ),
+            jobs,
+        ))
+        return self._finish_cycle(results, schedules, synchronized)
+
+    def _route_schedule(
+            self, index: int, source: ScheduleSource[SnookAppClient], metrics: RunMetrics
+    ) -> tuple[list[list[Match]], str] | None:
+        """
+        Fetches the schedule of the source and routes it to its calendars. Returns matches of every calendar
+        and the schedule hash, or None if the schedule is unchanged. A streamed schedule is downloaded while
+        it is extracted, so its download counts in the extraction phase, and it is known to be unchanged
+        only afterward.
+        """
+        snook_app_client = source.snook_app_client
+        url = snook_app_client.config.url
+        with metrics.measure('fetch', source=url):
+            decider_schedule: Iterable[dict] = (
+                snook_app_client.iter_schedule(
+                    past_days=self.past_days, future_days=self.future_days, fingerprint=source.calendars_hash
+                )
+                if self.stream_schedule
+                else snook_app_client.get_schedule(
+                    past_days=self.past_days, future_days=self.future_days, fingerprint=source.calendars_hash
+                )
+            )
+        if not self.stream_schedule and self._is_schedule_unchanged(snook_app_client):
+            return None
+
+        schedule_digest = ScheduleDigest()
+        with metrics.measure('extract', source=url):
+            calendars_matches = snook_app_client.route_schedule(
+                schedule=schedule_digest.track(decider_schedule),
+                calendars_players=[client.players for client in self.calendar_clients[index]],
+            )
+        metrics.add('processed_bookings', snook_app_client.processed_bookings, source=url)
+        if self.stream_schedule and self._is_schedule_unchanged(snook_app_client):
+            return None
+        schedule_hash = schedule_digest.hexdigest()
+        if self._is_schedule_synchronized(index, schedule_hash):
+            return None
+        return calendars_matches, schedule_hash
+
+
+def get_failed_results(source: ScheduleSource, error: Exception) -> list[CalendarSyncResult]:
+    """
+    Results of calendars of a source whose schedule could not be fetched.
+    """
+    return [CalendarSyncResult(calendar_id=calendar.id, error=error) for calendar in source.calendars_config]
+
+
+def split_results(
+        schedules: list[tuple[int, list[list[Match]], str]], results: list[CalendarSyncResult]
+) -> Iterator[tuple[int, list[CalendarSyncResult], str]]:
+    """
+    Splits results of calendars of all routed schedules, in their order, into those of every source.
+    """
+    offset = 0
+    for index, calendars_matches, schedule_hash in schedules:
+        yield index, results[offset:offset + len(calendars_matches)], schedule_hash
+        offset += len(calendars_matches)
+
+
+class ScheduleDigest:
+    """
+    Hashes the schedule day by day while it is being consumed, so a streamed schedule is never materialized.
+    """
+    def __init__(self):
+        self._digest = hashlib.sha1(usedforsecurity=False)
+
+    def track(self, schedule: Iterable[dict]) -> Iterator[dict]:
+        for day in schedule:
+            self._digest.update(json.dumps(day, sort_keys=True).encode())
+            yield day
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def get_schedule_hash(schedule: Iterable[dict]) -> str:
+    digest = ScheduleDigest()
+    for _ in digest.track(schedule):
+        pass
+    return digest.hexdigest()
+
+
+def get_calendar_schedule_hash(schedule_hash: str, players: list[Player]) -> str:
+    """
+    Hash of the schedule together with players of the calendar and their aliases, which shape the events too.
+    """
+    return hashlib.sha1(
+        json.dumps([schedule_hash, [[p.first_name, p.last_name, p.alias] for p in players]]).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+
+
+def get_differences(
+        matches: list[Match], events: list[CalendarEvent]
+) -> tuple[list[Match], list[tuple[CalendarEvent, Match]], list[CalendarEvent]]:
+    """
+    Compares content hashes: matches without an identical event are added, events without an identical match
+    (including duplicates and events without hash) are removed. An outdated event of the same fixture
+    (same match key) is paired with its match and updated in place instead.
+    """
+    matches_by_hash = {match.get_content_hash(): match for match in matches}
+    existing_hashes = set()
+    outdated = []
+    for event in events:
+        if event.content_hash in matches_by_hash and event.content_hash not in existing_hashes:
+            existing_hashes.add(event.content_hash)
+        else:
+            outdated.append(event)
+    missing = [match for content_hash, match in matches_by_hash.items() if content_hash not in existing_hashes]
+
+    missing_by_key = {match.get_key(): match for match in missing}
+    to_update = []
+    to_remove = []
+    for event in outdated:
+        match = missing_by_key.pop(event.key, None) if event.key else None
+        if match:
+            to_update.append((event, match))
+        else:
+            to_remove.append(event)
+    updated_hashes = {match.get_content_hash() for _, match in to_update}
+    to_add = [match for match in missing if match.get_content_hash() not in updated_hashes]
+    return to_add, to_update, to_remove
+
+
+def log_summary(results: list[CalendarSyncResult]) -> None:
+    for result in results:
+        logger.log(logging.INFO if result.succeeded else logging.ERROR, f"Synchronized calendar {result}")
+    logger.info(
+        f"Synchronized {sum(r.succeeded for r in results)}/{len(results)} calendars "
+        f"({sum(r.unchanged for r in results)} unchanged): "
+        f"added {sum(r.added for r in results)}, updated {sum(r.updated for r in results)}, "
+        f"removed {sum(r.removed for r in results)}, "
+        f"failed {sum(r.failed for r in results)}"
+    )
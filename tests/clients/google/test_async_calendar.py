@@ -0,0 +1,227 @@
+import json
+from datetime import datetime
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock, call, patch
+
+import httpx
+from freezegun import freeze_time
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+
+from snookxporter.clients.google.async_calendar import AsyncGoogleCalendarClient
+from snookxporter.clients.google.calendar import GoogleCalendarConfig
+from snookxporter.clients.google.rate_limit import AsyncRateLimiter, RateLimitConfig
+from snookxporter.entities import CalendarEvent, Match, Player
+
+EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/id%40google.com/events"
+MARKED_ITEM = {
+    'id': 'item_id_1',
+    'start': {'dateTime': '2024-11-05T21:00:00+01:00'},
+    'extendedProperties': {'private': {'snookxporter': '1', 'matchKey': 'key_1', 'contentHash': 'hash_1'}},
+}
+UNMARKED_ITEM = {'id': 'item_id_2', 'start': {'dateTime': '2024-11-06T21:00:00+01:00'}}
+
+
+class AsyncGoogleCalendarClientTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.config = GoogleCalendarConfig(id="id@google.com", players=[])
+        self.credentials = Credentials(token="token", expiry=datetime(2999, 1, 1))
+        self.requests = []
+        self.responses = []
+        self.http = httpx.AsyncClient(transport=httpx.MockTransport(self.respond))
+        self.addAsyncCleanup(self.http.aclose)
+        self.match = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Emmet", last_name="Brown"),
+            start=datetime(2024, 11, 5, 21, 30),
+            end=datetime(2024, 11, 5, 23, 00),
+        )
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.responses.pop(0)
+
+    def get_client(self, **kwargs) -> AsyncGoogleCalendarClient:
+        return AsyncGoogleCalendarClient(
+            config=self.config, http=self.http, credentials=self.credentials,
+            rate_limiter=AsyncRateLimiter(RateLimitConfig(requests_per_second=None, backoff_base=0)), **kwargs,
+        )
+
+    @freeze_time("2024-11-05")
+    async def test_get_events_lists_marked_events_of_window_on_every_page(self):
+        self.responses = [
+            httpx.Response(200, json={'items': [MARKED_ITEM], 'nextPageToken': 'page_2'}),
+            httpx.Response(200, json={'items': [MARKED_ITEM | {'id': 'item_id_3'}]}),
+        ]
+
+        events = await self.get_client().get_events(past_days=1, future_days=2)
+
+        self.assertEqual(["item_id_1", "item_id_3"], [event.item_id for event in events])
+        self.assertEqual(CalendarEvent(item_id="item_id_1", key="key_1", content_hash="hash_1",
+                                       start=datetime(2024, 11, 5, 21)), events[0])
+        first, second = self.requests
+        self.assertEqual(EVENTS_URL, str(first.url.copy_with(query=None)))
+        self.assertEqual("Bearer token", first.headers["Authorization"])
+        self.assertEqual({
+            'maxResults': '2500',
+            'singleEvents': 'true',
+            'fields': 'items(id,status,start,extendedProperties),nextPageToken,nextSyncToken',
+            'timeMin': '2024-11-04T00:00:00Z',
+            'timeMax': '2024-11-07T23:59:59Z',
+            'orderBy': 'startTime',
+            'privateExtendedProperty': 'snookxporter=1',
+        }, dict(first.url.params))
+        self.assertEqual('page_2', second.url.params['pageToken'])
+
+    @freeze_time("2024-11-05")
+    async def test_get_events_adopts_events_of_older_versions_if_none_is_marked(self):
+        legacy_item = {
+            'id': 'legacy_item_id',
+            'description': self.match.get_match_calendar_description(),
+            'start': {'dateTime': '2024-11-05T21:30:00+01:00'},
+        }
+        self.responses = [
+            httpx.Response(200, json={'items': []}),
+            httpx.Response(200, json={'items': [legacy_item, UNMARKED_ITEM]}),
+        ]
+
+        events = await self.get_client().get_events(past_days=1, future_days=2)
+
+        self.assertEqual([CalendarEvent(item_id="legacy_item_id", key=self.match.get_key(),
+                                        start=datetime(2024, 11, 5, 21, 30))], events)
+        self.assertIn('privateExtendedProperty', self.requests[0].url.params)
+        self.assertNotIn('privateExtendedProperty', self.requests[1].url.params)
+        self.assertEqual('items(id,status,start,description,extendedProperties),nextPageToken,nextSyncToken',
+                         self.requests[1].url.params['fields'])
+
+    @freeze_time("2024-11-05")
+    async def test_get_events_lists_changes_incrementally_and_again_all_events_after_expired_sync_token(self):
+        state = MagicMock()
+        state.get_sync_token.return_value = "expired_token"
+        state.get_events.return_value = [
+            CalendarEvent(item_id="item_id_1", start=datetime(2024, 11, 5, 21)),
+            CalendarEvent(item_id="past_item_id", start=datetime(2024, 10, 1, 21)),
+        ]
+        self.responses = [
+            httpx.Response(410, json={'error': {'code': 410, 'errors': [{'reason': 'fullSyncRequired'}]}}),
+            httpx.Response(200, json={'items': [MARKED_ITEM, UNMARKED_ITEM], 'nextSyncToken': 'next_token'}),
+        ]
+        client = self.get_client(state=state)
+
+        events = await client.get_events(past_days=1, future_days=2)
+
+        self.assertEqual(["item_id_1"], [event.item_id for event in events])
+        self.assertEqual("expired_token", self.requests[0].url.params['syncToken'])
+        self.assertNotIn('syncToken', self.requests[1].url.params)
+        self.assertEqual(2, client.listed_changes)
+        state.update_events.assert_called_once_with(
+            calendar_id="id@google.com",
+            sync_token="next_token",
+            changed=[CalendarEvent(item_id="item_id_1", key="key_1", content_hash="hash_1",
+                                   start=datetime(2024, 11, 5, 21))],
+            deleted_ids=["item_id_2"],
+            replace=True,
+        )
+
+    async def test_get_events_raises_other_errors_of_incremental_listing(self):
+        state = MagicMock()
+        self.responses = [httpx.Response(403, json={'error': {'errors': [{'reason': 'forbidden'}]}})]
+
+        with self.assertRaises(HttpError) as context:
+            await self.get_client(state=state).get_events(past_days=1, future_days=2)
+
+        self.assertEqual(403, context.exception.resp.status)
+        state.update_events.assert_not_called()
+
+    async def test_add_update_and_delete_events_send_single_requests_and_record_them_in_state(self):
+        state = MagicMock()
+        event = CalendarEvent(item_id="item/1", key=self.match.get_key())
+        self.responses = [
+            httpx.Response(200, json={'id': 'new_item_id'}),
+            httpx.Response(200, json={'id': 'item/1'}),
+            httpx.Response(204),
+        ]
+        client = self.get_client(state=state)
+
+        added = await client.add_events([self.match])
+        updated = await client.update_events([(event, self.match)])
+        removed = await client.delete_events([CalendarEvent(item_id="old_item_id")])
+
+        self.assertTrue(all(result.succeeded for result in added + updated + removed))
+        self.assertEqual([
+            ("POST", EVENTS_URL), ("PATCH", f"{EVENTS_URL}/item%2F1"), ("DELETE", f"{EVENTS_URL}/old_item_id"),
+        ], [(request.method, str(request.url)) for request in self.requests])
+        self.assertEqual(client._get_event_body(self.match),  # pylint: disable=protected-access
+                         json.loads(self.requests[0].content))
+        self.assertEqual(client._get_event_patch_body(self.match),  # pylint: disable=protected-access
+                         json.loads(self.requests[1].content))
+        self.assertEqual({}, removed[0].response)
+        state.record_written_events.assert_has_calls([
+            call(calendar_id="id@google.com", written=[CalendarEvent(
+                item_id="new_item_id", key=self.match.get_key(), content_hash=self.match.get_content_hash(),
+                start=self.match.start,
+            )], deleted_ids=[]),
+            call(calendar_id="id@google.com", written=[CalendarEvent(
+                item_id="item/1", key=self.match.get_key(), content_hash=self.match.get_content_hash(),
+                start=self.match.start,
+            )], deleted_ids=[]),
+            call(calendar_id="id@google.com", written=[], deleted_ids=["old_item_id"]),
+        ])
+
+    @patch("snookxporter.clients.google.rate_limit.asyncio.sleep")
+    async def test_delete_events_retries_throttled_requests_and_reports_failed_ones(self, _):
+        self.responses = [
+            httpx.Response(429, headers={'Retry-After': '3'}),
+            httpx.Response(204),
+            httpx.Response(404, json={'error': {'code': 404}}),
+        ]
+        events = [CalendarEvent(item_id="item_id_1"), CalendarEvent(item_id="item_id_2")]
+
+        with patch("snookxporter.clients.google.async_calendar.WRITE_CONCURRENCY", 1):
+            results = await self.get_client().delete_events(events)
+
+        self.assertTrue(results[0].succeeded)
+        self.assertIsInstance(results[1].error, HttpError)
+        self.assertEqual(404, results[1].error.resp.status)
+
+    async def test_write_reports_connection_errors_of_single_operations(self):
+        def refuse(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused", request=request)
+        client = self.get_client()
+        client.http = httpx.AsyncClient(transport=httpx.MockTransport(refuse))
+        self.addAsyncCleanup(client.http.aclose)
+
+        results = await client.add_events([self.match])
+
+        self.assertIsInstance(results[0].error, httpx.ConnectError)
+
+    async def test_requests_retry_connection_errors(self):
+        def respond(request: httpx.Request) -> httpx.Response:
+            if not self.requests:
+                self.requests.append(request)
+                raise httpx.ConnectTimeout("timed out", request=request)
+            self.requests.append(request)
+            return httpx.Response(204)
+        client = self.get_client()
+        client.http = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        self.addAsyncCleanup(client.http.aclose)
+
+        results = await client.delete_events([CalendarEvent(item_id="item_id")])
+
+        self.assertTrue(results[0].succeeded)
+        self.assertEqual(2, len(self.requests))
+        self.assertEqual(1, client.rate_limiter.retries)
+
+    async def test_requests_refresh_expired_credentials_and_go_to_root_url(self):
+        self.credentials = MagicMock(valid=False)
+        self.credentials.apply.side_effect = lambda headers: headers.update(Authorization="Bearer refreshed")
+        self.responses = [httpx.Response(204)]
+
+        await self.get_client(root_url="http://localhost:8000/").delete_events([CalendarEvent(item_id="item_id")])
+
+        self.credentials.refresh.assert_called_once()
+        self.assertIsInstance(self.credentials.refresh.call_args.args[0], Request)
+        self.assertEqual("http://localhost:8000/calendar/v3/calendars/id%40google.com/events/item_id",
+                         str(self.requests[0].url))
+        self.assertEqual("Bearer refreshed", self.requests[0].headers["Authorization"])
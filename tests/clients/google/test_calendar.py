@@ -1,12 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest import TestCase
-from unittest.mock import MagicMock, mock_open, patch
+from unittest.mock import ANY, MagicMock, call, patch
 
+import httplib2
+from freezegun import freeze_time
 from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
 
-from snookxporter.clients.google.calendar import GoogleCalendarClient, GoogleCalendarConfig
-from snookxporter.clients.google.formats import GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE
-from snookxporter.entities import Match, Player
+from snookxporter.clients.google.calendar import BATCH_SIZE, GoogleCalendarClient, GoogleCalendarConfig
+from snookxporter.clients.google.rate_limit import RateLimitConfig, RateLimiter
+from snookxporter.entities import CalendarEvent, Match, Player
 
 
 class GoogleCalendarTest(TestCase):
@@ -36,18 +39,15 @@ class GoogleCalendarTest(TestCase):
                     'description': 'Marty McFly 2:3 Emmet Brown\nTable number 1',
                     'start': {'dateTime': '2024-11-05T21:00:00+01:00', 'timeZone': 'Europe/Warsaw'},
                     'end': {'dateTime': '2024-11-05T23:00:00+01:00', 'timeZone': 'Europe/Warsaw'},
+                    'extendedProperties': {
+                        'private': {'snookxporter': '1', 'matchKey': 'key_1', 'contentHash': 'hash_1'}
+                    },
                 }, {
-                    'id': 'item_id_2',
+                    'id': 'unmarked_item_id_2',
                     'summary': 'Emmet Brown v Marty McFly',
                     'description': 'Emmet Brown v Marty McFly\nTable number 5',
                     'start': {'dateTime': '2024-11-06T21:00:00+01:00', 'timeZone': 'Europe/Warsaw'},
                     'end': {'dateTime': '2024-11-06T23:00:00+01:00', 'timeZone': 'Europe/Warsaw'},
-                }, {
-                    'id': 'invalid_item_id_3',
-                    'summary': 'Invalid Summary',
-                    'description': 'Invalid Description',
-                    'start': {'dateTime': '2024-11-07T21:00:00+01:00', 'timeZone': 'Europe/Warsaw'},
-                    'end': {'dateTime': '2024-11-07T23:00:00+01:00', 'timeZone': 'Europe/Warsaw'},
                 }
             ]
         }
@@ -60,110 +60,204 @@ class GoogleCalendarTest(TestCase):
 
         self.assertIsInstance(client.credentials, Credentials)
 
-    @patch("snookxporter.clients.google.calendar.os")
-    @patch("snookxporter.clients.google.calendar.Credentials")
-    def test_get_credentials_returns_credentials_instance_if_token_exists(self, m_credentials, m_os):
-        credentials = MagicMock()
-        credentials.valid = True
-        m_os.path.exists.return_value = True
-        m_credentials.from_authorized_user_file.return_value = expected_credentials = credentials
-
-        client = GoogleCalendarClient(config=self.config)
-
-        self.assertEqual(expected_credentials, client.credentials)
-
-    @patch("builtins.open", new_callable=mock_open, read_data="{}")
-    @patch("snookxporter.clients.google.calendar.os")
-    @patch("snookxporter.clients.google.calendar.Credentials")
-    def test_get_credentials_returns_credentials_instance_if_invalid_expired_credentials(
-            self, m_credentials, m_os, m_open
-    ):
-        credentials = MagicMock()
-        credentials.valid = False
-        credentials.expired = True
-        credentials.refresh_token = True
-        m_os.path.exists.return_value = True
-        m_credentials.from_authorized_user_file.return_value = expected_credentials = credentials
-        expected_credentials.to_json.return_value = credentials_json = "json"
-
-        client = GoogleCalendarClient(config=self.config)
-
-        credentials.refresh.assert_called_once()
-        m_open.return_value.write.assert_called_once_with(credentials_json)
-        self.assertEqual(expected_credentials, client.credentials)
-
-    @patch("builtins.open", new_callable=mock_open, read_data="{}")
-    @patch("snookxporter.clients.google.calendar.InstalledAppFlow")
-    @patch("snookxporter.clients.google.calendar.os")
-    @patch("snookxporter.clients.google.calendar.Credentials")
-    def test_get_credentials_returns_credentials_instance_if_invalid_credentials(
-            self, m_credentials, m_os, m_installed_app_flow, m_open
-    ):
-        credentials = MagicMock()
-        credentials.valid = False
-        credentials.expired = False
-        credentials.refresh_token = False
-        m_os.path.exists.return_value = True
-        m_credentials.from_authorized_user_file.return_value = expected_credentials = credentials
-        expected_credentials.to_json.return_value = credentials_json = "json"
-        m_installed_app_flow.from_client_secrets_file.return_value = m_flow = MagicMock()
-        m_flow.run_local_server.return_value = expected_credentials
-
-
-        client = GoogleCalendarClient(config=self.config)
-
-        m_installed_app_flow.from_client_secrets_file.assert_called_once()
-        m_open.return_value.write.assert_called_once_with(credentials_json)
-        self.assertEqual(expected_credentials, client.credentials)
-
-    @patch("snookxporter.clients.google.calendar.build")
-    def test_get_events_returns_list_of_valid_match_objects(self, m_build):
-        past_days = 3
-        future_days = 26
-        m_build.return_value.events.return_value.list.return_value.execute.return_value = self.calendar_items
-        item1, item2 = self.calendar_items["items"][0], self.calendar_items["items"][1]
-        expected_matches = [
-            Match(
-                item_id=item1["id"],
-                host=Player(first_name="Marty", last_name="McFly"),
-                guest=Player(first_name="Emmet", last_name="Brown"),
-                start=datetime.strptime(item1["start"]["dateTime"], GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                end=datetime.strptime(item1["end"]["dateTime"], GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                host_score=2,
-                guest_score=3,
-                table=1,
-            ),
-            Match(
-                item_id=item2["id"],
-                host=Player(first_name="Emmet", last_name="Brown"),
-                guest=Player(first_name="Marty", last_name="McFly"),
-                start=datetime.strptime(item2["start"]["dateTime"], GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                end=datetime.strptime(item2["end"]["dateTime"], GOOGLE_CALENDAR_DATETIME_FORMAT_WITH_TIMEZONE),
-                table=5,
-            ),
-            Match.get_match_to_delete_from_calendar(item_id='invalid_item_id_3'),
+    def test_client_takes_credentials_of_given_credential_manager(self):
+        credential_manager = MagicMock()
+
+        client = GoogleCalendarClient(config=self.config, credential_manager=credential_manager)
+
+        self.assertIs(credential_manager.credentials, client.credentials)
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_service_is_built_for_configured_root_url(self, m_service):
+        client = GoogleCalendarClient(config=self.config, token=self.token, root_url="http://127.0.0.1:8081/")
+
+        self.assertIs(m_service.return_value, client.service)
+        m_service.assert_called_once_with(client.credentials, root_url="http://127.0.0.1:8081/")
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_get_events_lists_only_own_events_and_returns_calendar_events(self, m_service):
+        m_list = m_service.return_value.events.return_value.list
+        m_list.return_value.execute.return_value = {"items": [self.calendar_items["items"][0]]}
+        expected_events = [
+            CalendarEvent(item_id='item_id_1', key='key_1', content_hash='hash_1', start=datetime(2024, 11, 5, 21)),
         ]
 
-        matches = self.client.get_events(past_days=past_days, future_days=future_days)
+        events = self.client.get_events(past_days=3, future_days=26)
 
-        self.assertListEqual(expected_matches, matches)
+        self.assertListEqual(expected_events, events)
+        m_list.assert_called_once()
+        self.assertEqual('snookxporter=1', m_list.call_args.kwargs['privateExtendedProperty'])
 
-    @patch("snookxporter.clients.google.calendar.build")
-    def test_add_events_executes_insert_to_calendar(self, m_build):
-        matches = {
-            Match(
-                host=Player(first_name="Marty", last_name="McFly"),
-                guest=Player(first_name="Emmet", last_name="Brown"),
-                start=datetime(2024, 11, 5, 21, 30),
-                end=datetime(2024, 11, 5, 23, 00),
-                host_score=2,
-                guest_score=3,
-                table=1,
-            )
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_get_events_adopts_events_of_older_versions_if_none_is_marked(self, m_service):
+        m_list = m_service.return_value.events.return_value.list
+        m_list.return_value.execute.side_effect = [
+            {"items": []},
+            {"items": [
+                self.calendar_items["items"][1],
+                {'id': 'other_item_id', 'description': 'Dinner', 'start': {'dateTime': '2024-11-06T19:00:00+01:00'}},
+            ]},
+        ]
+        legacy_match = Match(
+            host=Player(first_name='Emmet', last_name='Brown'),
+            guest=Player(first_name='Marty', last_name='McFly'),
+            start=datetime(2024, 11, 6, 21),
+            end=datetime(2024, 11, 6, 23),
+            table=5,
+        )
+
+        events = self.client.get_events(past_days=3, future_days=26)
+
+        self.assertListEqual([CalendarEvent(
+            item_id='unmarked_item_id_2', key=legacy_match.get_key(), start=datetime(2024, 11, 6, 21)
+        )], events)
+        self.assertEqual('snookxporter=1', m_list.call_args_list[0].kwargs['privateExtendedProperty'])
+        self.assertNotIn('privateExtendedProperty', m_list.call_args_list[1].kwargs)
+        self.assertEqual(
+            "items(id,status,start,description,extendedProperties),nextPageToken,nextSyncToken",
+            m_list.call_args_list[1].kwargs['fields']
+        )
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_iter_events_follows_every_page_with_projected_fields(self, m_service):
+        m_list = m_service.return_value.events.return_value.list
+        m_list.return_value.execute.side_effect = [
+            {"items": [self.calendar_items["items"][0]], "nextPageToken": "page_2"},
+            {"items": [self.calendar_items["items"][1]]},
+        ]
+
+        events = self.client.iter_events(past_days=3, future_days=26)
+
+        self.assertEqual('item_id_1', next(events).item_id)
+        m_list.assert_called_once()
+        self.assertEqual(['unmarked_item_id_2'], [event.item_id for event in events])
+        self.assertListEqual([None, 'page_2'], [c.kwargs['pageToken'] for c in m_list.call_args_list])
+        self.assertEqual(
+            "items(id,status,start,extendedProperties),nextPageToken,nextSyncToken",
+            m_list.call_args.kwargs['fields']
+        )
+        self.assertEqual(2500, m_list.call_args.kwargs['maxResults'])
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_get_events_lists_all_events_if_unmarked_events_included(self, m_service):
+        m_list = m_service.return_value.events.return_value.list
+        m_list.return_value.execute.return_value = {"items": []}
+        client = GoogleCalendarClient(config=self.config, token=self.token, include_unmarked_events=True)
+
+        client.get_events(past_days=3, future_days=26)
+
+        self.assertNotIn('privateExtendedProperty', m_list.call_args.kwargs)
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    @freeze_time("2024-11-04")
+    def test_get_events_with_state_lists_all_pages_and_stores_sync_token(self, m_service):
+        state = MagicMock()
+        state.get_sync_token.return_value = None
+        state.get_events.return_value = [
+            CalendarEvent(item_id='in_window', start=datetime(2024, 11, 5, 21)),
+            CalendarEvent(item_id='after_window', start=datetime(2024, 12, 5, 21)),
+            CalendarEvent(item_id='without_start'),
+        ]
+        m_list = m_service.return_value.events.return_value.list
+        m_list.return_value.execute.side_effect = [
+            {"items": [self.calendar_items["items"][0]], "nextPageToken": "page_2"},
+            {"items": [
+                self.calendar_items["items"][1],
+                {'id': 'other_item_id', 'description': 'Dinner', 'start': {'dateTime': '2024-11-06T19:00:00+01:00'}},
+            ], "nextSyncToken": "sync_token"},
+        ]
+        client = GoogleCalendarClient(config=self.config, token=self.token, state=state)
+
+        events = client.get_events(past_days=3, future_days=26)
+
+        self.assertListEqual([CalendarEvent(item_id='in_window', start=datetime(2024, 11, 5, 21)),
+                              CalendarEvent(item_id='without_start')], events)
+        self.assertIsNone(m_list.call_args_list[0].kwargs['syncToken'])
+        self.assertEqual('page_2', m_list.call_args_list[1].kwargs['pageToken'])
+        state.update_events.assert_called_once_with(
+            calendar_id="id@google.com",
+            sync_token="sync_token",
+            changed=[
+                CalendarEvent(
+                    item_id='item_id_1', key='key_1', content_hash='hash_1', start=datetime(2024, 11, 5, 21)
+                ),
+                CalendarEvent(item_id='unmarked_item_id_2', key=ANY, start=datetime(2024, 11, 6, 21)),
+            ],
+            deleted_ids=['other_item_id'],
+            replace=True,
+        )
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_get_events_with_state_applies_changes_since_stored_sync_token(self, m_service):
+        state = MagicMock()
+        state.get_sync_token.return_value = "sync_token"
+        state.get_events.return_value = []
+        m_list = m_service.return_value.events.return_value.list
+        m_list.return_value.execute.return_value = {
+            "items": [{'id': 'item_id_1', 'status': 'cancelled'}], "nextSyncToken": "next_sync_token"
         }
-        m_insert = m_build.return_value.events.return_value.insert
+        client = GoogleCalendarClient(config=self.config, token=self.token, state=state)
 
-        self.client.add_events(schedule=matches)
+        client.get_events(past_days=3, future_days=26)
+
+        m_list.assert_called_once_with(
+            calendarId="id@google.com", maxResults=2500, singleEvents=True, syncToken="sync_token", pageToken=None,
+            fields="items(id,status,start,description,extendedProperties),nextPageToken,nextSyncToken",
+        )
+        state.update_events.assert_called_once_with(
+            calendar_id="id@google.com", sync_token="next_sync_token", changed=[], deleted_ids=['item_id_1'],
+            replace=False,
+        )
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_get_events_with_state_lists_all_events_again_if_sync_token_is_gone(self, m_service):
+        state = MagicMock()
+        state.get_sync_token.return_value = "expired_sync_token"
+        state.get_events.return_value = []
+        m_list = m_service.return_value.events.return_value.list
+        m_list.return_value.execute.side_effect = [
+            HttpError(resp=MagicMock(status=410), content=b""),
+            {"items": [], "nextSyncToken": "sync_token"},
+        ]
+        client = GoogleCalendarClient(config=self.config, token=self.token, state=state, include_unmarked_events=True)
+
+        client.get_events(past_days=3, future_days=26)
+
+        self.assertEqual("expired_sync_token", m_list.call_args_list[0].kwargs['syncToken'])
+        self.assertIsNone(m_list.call_args_list[1].kwargs['syncToken'])
+        state.update_events.assert_called_once_with(
+            calendar_id="id@google.com", sync_token="sync_token", changed=[], deleted_ids=[], replace=True,
+        )
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_get_events_with_state_raises_other_http_errors(self, m_service):
+        state = MagicMock()
+        m_service.return_value.events.return_value.list.return_value.execute.side_effect = error = HttpError(
+            resp=MagicMock(status=404), content=b""
+        )
+        client = GoogleCalendarClient(config=self.config, token=self.token, state=state)
+
+        with self.assertRaises(HttpError) as context:
+            client.get_events(past_days=3, future_days=26)
+
+        self.assertIs(error, context.exception)
+        state.update_events.assert_not_called()
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_add_events_executes_insert_to_calendar_in_batch(self, m_service):
+        match = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Emmet", last_name="Brown"),
+            start=datetime(2024, 11, 5, 21, 30),
+            end=datetime(2024, 11, 5, 23, 00),
+            host_score=2,
+            guest_score=3,
+            table=1,
+        )
+        m_insert = m_service.return_value.events.return_value.insert
+        m_batch = m_service.return_value.new_batch_http_request.return_value
+
+        results = self.client.add_events(schedule={match})
 
         m_insert.assert_called_once_with(
             calendarId="id@google.com", body={
@@ -176,29 +270,231 @@ class GoogleCalendarTest(TestCase):
                 "end": {
                     "dateTime": "2024-11-05T23:00:00",
                     "timeZone": "Europe/Warsaw"
+                },
+                "extendedProperties": {
+                    "private": {
+                        "snookxporter": "1",
+                        "matchKey": match.get_key(),
+                        "contentHash": match.get_content_hash(),
+                    }
                 }
             }
         )
-        m_insert.return_value.execute.assert_called_once()
+        m_batch.add.assert_called_once_with(m_insert.return_value, request_id="0")
+        m_batch.execute.assert_called_once()
+        m_insert.return_value.execute.assert_not_called()
+        self.assertEqual(1, len(results))
+        self.assertTrue(results[0].succeeded)
 
-    @patch("snookxporter.clients.google.calendar.build")
-    def test_delete_events_executes_delete_to_calendar(self, m_build):
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_delete_events_executes_delete_to_calendar_in_batch(self, m_service):
         expected_item_id = "item_id_1"
+        events = {CalendarEvent(item_id=expected_item_id)}
+        m_delete = m_service.return_value.events.return_value.delete
+        m_batch = m_service.return_value.new_batch_http_request.return_value
+
+        self.client.delete_events(events=events)
+
+        m_delete.assert_called_once_with(
+            calendarId="id@google.com", eventId=expected_item_id
+        )
+        m_batch.add.assert_called_once_with(m_delete.return_value, request_id="0")
+        m_batch.execute.assert_called_once()
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_delete_events_builds_events_resource_once_for_all_events(self, m_service):
+        events = [CalendarEvent(item_id=f"item_id_{i}") for i in range(3)]
+
+        self.client.delete_events(events=events)
+
+        m_service.return_value.events.assert_called_once_with()
+        self.assertEqual(3, m_service.return_value.events.return_value.delete.call_count)
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_add_and_delete_events_record_written_events_in_state(self, m_service):
+        state = MagicMock()
+        client = GoogleCalendarClient(config=self.config, token=self.token, state=state)
+        match = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Emmet", last_name="Brown"),
+            start=datetime(2024, 11, 5, 21, 30),
+            end=datetime(2024, 11, 5, 23, 00),
+        )
+
+        def new_batch_http_request(callback):
+            m_batch = MagicMock()
+            m_batch.execute.side_effect = lambda: callback("0", {"id": "new_item_id"}, None)
+            return m_batch
+        m_service.return_value.new_batch_http_request.side_effect = new_batch_http_request
+
+        client.add_events(schedule=[match])
+        client.delete_events(events=[CalendarEvent(item_id="old_item_id")])
+
+        state.record_written_events.assert_has_calls([
+            call(
+                calendar_id="id@google.com",
+                written=[CalendarEvent(
+                    item_id="new_item_id", key=match.get_key(), content_hash=match.get_content_hash(), start=match.start
+                )],
+                deleted_ids=[],
+            ),
+            call(calendar_id="id@google.com", written=[], deleted_ids=["old_item_id"]),
+        ])
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_update_events_patches_events_in_place_and_records_them_in_state(self, m_service):
+        state = MagicMock()
+        client = GoogleCalendarClient(config=self.config, token=self.token, state=state)
+        event = CalendarEvent(item_id="item_id_1", key="key", content_hash="old_hash")
+        match = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Emmet", last_name="Brown"),
+            start=datetime(2024, 11, 5, 21, 30),
+            end=datetime(2024, 11, 5, 23, 00),
+            host_score=2,
+            guest_score=3,
+            table=1,
+        )
+        m_patch = m_service.return_value.events.return_value.patch
+        m_batch = m_service.return_value.new_batch_http_request.return_value
+
+        results = client.update_events(updates=[(event, match)])
+
+        m_patch.assert_called_once_with(
+            calendarId="id@google.com", eventId="item_id_1", body={
+                "summary": "Marty McFly 2:3 Emmet Brown",
+                "description": "Marty McFly 2:3 Emmet Brown\nTable number 1\n",
+                "end": {
+                    "dateTime": "2024-11-05T23:00:00",
+                    "timeZone": "Europe/Warsaw"
+                },
+                "extendedProperties": {
+                    "private": {
+                        "snookxporter": "1",
+                        "matchKey": match.get_key(),
+                        "contentHash": match.get_content_hash(),
+                    }
+                }
+            }
+        )
+        m_batch.add.assert_called_once_with(m_patch.return_value, request_id="0")
+        self.assertTrue(results[0].succeeded)
+        state.record_written_events.assert_called_once_with(
+            calendar_id="id@google.com",
+            written=[CalendarEvent(
+                item_id="item_id_1", key=match.get_key(), content_hash=match.get_content_hash(), start=match.start
+            )],
+            deleted_ids=[],
+        )
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_add_events_splits_operations_into_batches_of_api_limit(self, m_service):
         matches = {
             Match(
-                item_id=expected_item_id,
-                host=Player(first_name="Dummy", last_name="Player"),
-                guest=Player(first_name="Dummy", last_name="Player"),
-                start=datetime(2024, 11, 5, 21, 30),
-                end=datetime(2024, 11, 5, 23, 00),
-            )
+                host=Player(first_name="Marty", last_name="McFly"),
+                guest=Player(first_name="Emmet", last_name="Brown"),
+                start=datetime(2024, 11, 5, 21, 30) + timedelta(days=day),
+                end=datetime(2024, 11, 5, 23, 00) + timedelta(days=day),
+            ) for day in range(BATCH_SIZE + 1)
         }
-        m_delete = m_build.return_value.events.return_value.delete
+        m_batch = m_service.return_value.new_batch_http_request.return_value
 
-        self.client.delete_events(schedule=matches)
+        results = self.client.add_events(schedule=matches)
 
+        self.assertEqual(2, m_service.return_value.new_batch_http_request.call_count)
+        self.assertEqual(BATCH_SIZE + 1, m_batch.add.call_count)
+        self.assertEqual(2, m_batch.execute.call_count)
+        self.assertEqual(BATCH_SIZE + 1, len(results))
 
-        m_delete.assert_called_once_with(
-            calendarId="id@google.com", eventId=expected_item_id
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_add_events_reports_failure_per_operation(self, m_service):
+        first, second = [
+            Match(
+                host=Player(first_name="Marty", last_name="McFly"),
+                guest=Player(first_name="Emmet", last_name="Brown"),
+                start=datetime(2024, 11, day, 21, 30),
+                end=datetime(2024, 11, day, 23, 00),
+            ) for day in (5, 6)
+        ]
+        error = HttpError(resp=MagicMock(status=400), content=b"")
+
+        def new_batch_http_request(callback):
+            m_batch = MagicMock()
+            m_batch.execute.side_effect = lambda: (callback("0", {}, None), callback("1", None, error))
+            return m_batch
+        m_service.return_value.new_batch_http_request.side_effect = new_batch_http_request
+
+        results = self.client.add_events(schedule=[first, second])
+
+        self.assertTrue(results[0].succeeded)
+        self.assertFalse(results[1].succeeded)
+        self.assertEqual(error, results[1].error)
+
+    @patch("snookxporter.clients.google.rate_limit.time.sleep")
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_delete_events_retries_only_throttled_calls_of_batch(self, m_service, m_sleep):
+        events = [CalendarEvent(item_id=f"item_id_{i}") for i in range(3)]
+        throttled = HttpError(resp=httplib2.Response({'status': 429}), content=b"")
+        batches = []
+
+        def new_batch_http_request(callback):
+            m_batch = MagicMock()
+            batches.append(m_batch)
+            if len(batches) == 1:
+                m_batch.execute.side_effect = lambda: (
+                    callback("0", None, None), callback("1", None, throttled), callback("2", None, throttled)
+                )
+            else:
+                m_batch.execute.side_effect = lambda: (callback("1", None, None), callback("2", None, None))
+            return m_batch
+        m_service.return_value.new_batch_http_request.side_effect = new_batch_http_request
+
+        results = self.client.delete_events(events=events)
+
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(2, len(batches))
+        self.assertEqual(["1", "2"], [c.kwargs['request_id'] for c in batches[1].add.call_args_list])
+        m_sleep.assert_called_once()
+
+    @patch("snookxporter.clients.google.rate_limit.time.sleep")
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_delete_events_reports_calls_still_throttled_after_retries(self, m_service, m_sleep):
+        client = GoogleCalendarClient(
+            config=self.config, token=self.token, rate_limiter=RateLimiter(RateLimitConfig(max_retries=2)),
         )
-        m_delete.return_value.execute.assert_called_once()
+        throttled = HttpError(resp=httplib2.Response({'status': 503}), content=b"")
+
+        def new_batch_http_request(callback):
+            m_batch = MagicMock()
+            m_batch.execute.side_effect = lambda: callback("0", None, throttled)
+            return m_batch
+        m_service.return_value.new_batch_http_request.side_effect = new_batch_http_request
+
+        results = client.delete_events(events=[CalendarEvent(item_id="item_id_1")])
+
+        self.assertIs(throttled, results[0].error)
+        self.assertEqual(2, m_sleep.call_count)
+
+    @patch("snookxporter.clients.google.rate_limit.time.sleep")
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_get_events_retries_throttled_list_requests(self, m_service, m_sleep):
+        m_execute = m_service.return_value.events.return_value.list.return_value.execute
+        m_execute.side_effect = [
+            HttpError(resp=httplib2.Response({'status': 429}), content=b""),
+            self.calendar_items,
+        ]
+
+        events = self.client.get_events(past_days=3, future_days=26)
+
+        self.assertEqual(2, len(events))
+        m_sleep.assert_called_once()
+
+    @patch("snookxporter.clients.google.calendar.get_calendar_service")
+    def test_delete_events_marks_whole_batch_as_failed_if_batch_request_fails(self, m_service):
+        event = CalendarEvent(item_id="item_id_1")
+        error = HttpError(resp=MagicMock(status=400), content=b"")
+        m_service.return_value.new_batch_http_request.return_value.execute.side_effect = error
+
+        results = self.client.delete_events(events={event})
+
+        self.assertEqual(error, results[0].error)
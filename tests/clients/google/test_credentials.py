@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from freezegun import freeze_time
+from google.oauth2.credentials import Credentials
+
+from snookxporter.clients.google.credentials import CredentialManager, SharedCredentials
+
+TOKEN = {
+    "token": "token",
+    "refresh_token": "refresh_token",
+    "token_uri": "token_uri",
+    "client_id": "client_id",
+    "client_secret": "client_secret",
+    "scopes": ["scope"],
+    "expiry": "2000-01-01T10:00:00.12345Z",
+}
+
+
+def refresh(credentials: Credentials, _request) -> None:
+    time.sleep(0.01)
+    credentials.token = f"{credentials.token}+"
+    credentials.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+
+@patch.object(Credentials, 'refresh', autospec=True, side_effect=refresh)
+class SharedCredentialsTest(TestCase):
+
+    def test_refresh_refreshes_once_for_threads_waiting_for_it_and_writes_token_file_atomically(self, m_refresh):
+        credentials = SharedCredentials(token="token", refresh_token="refresh_token", expiry=datetime(2000, 1, 1))
+        with tempfile.TemporaryDirectory() as directory:
+            credentials.token_path = os.path.join(directory, "token.json")
+            threads = [threading.Thread(target=credentials.refresh, args=(None,)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            with open(credentials.token_path, encoding='utf8') as token_file:
+                written = json.load(token_file)
+            self.assertEqual(["token.json"], os.listdir(directory))
+
+        m_refresh.assert_called_once()
+        self.assertEqual("token+", credentials.token)
+        self.assertEqual("token+", written['token'])
+
+    def test_refresh_refreshes_valid_credentials_again_if_asked_to(self, m_refresh):
+        credentials = SharedCredentials(token="token", expiry=datetime(2999, 1, 1))
+
+        credentials.refresh(None)
+        credentials.refresh(None)
+
+        self.assertEqual(2, m_refresh.call_count)
+        self.assertEqual("token++", credentials.token)
+
+
+class CredentialManagerTest(TestCase):
+
+    def test_credentials_are_created_once_from_token_json(self):
+        credential_manager = CredentialManager(TOKEN)
+
+        credentials = credential_manager.credentials
+
+        self.assertIsInstance(credentials, SharedCredentials)
+        self.assertIs(credentials, credential_manager.credentials)
+        self.assertEqual("refresh_token", credentials.refresh_token)
+        self.assertEqual(datetime(2000, 1, 1, 10, 0, 0, 123450), credentials.expiry)
+        self.assertIsNone(credentials.token_path)
+
+    @patch("snookxporter.clients.google.credentials.os")
+    @patch("snookxporter.clients.google.credentials.SharedCredentials")
+    def test_credentials_are_read_from_token_file(self, m_credentials_class, m_os):
+        m_os.path.exists.return_value = True
+        m_credentials_class.from_authorized_user_file.return_value = credentials = MagicMock(valid=True)
+
+        self.assertIs(credentials, CredentialManager().credentials)
+        self.assertEqual("secrets/token.json", credentials.token_path)
+        credentials.refresh.assert_not_called()
+
+    @patch("snookxporter.clients.google.credentials.os")
+    @patch("snookxporter.clients.google.credentials.SharedCredentials")
+    def test_expired_credentials_of_token_file_are_refreshed(self, m_credentials_class, m_os):
+        m_os.path.exists.return_value = True
+        m_credentials_class.from_authorized_user_file.return_value = credentials = MagicMock(
+            valid=False, expired=True, refresh_token="refresh_token",
+        )
+
+        self.assertIs(credentials, CredentialManager().credentials)
+        credentials.refresh.assert_called_once()
+
+    @patch("snookxporter.clients.google.credentials.write_atomically")
+    @patch("google_auth_oauthlib.flow.InstalledAppFlow")
+    @patch("snookxporter.clients.google.credentials.os")
+    def test_credentials_are_authorized_and_written_to_token_file_without_one(self, m_os, m_flow_class, m_write):
+        m_os.path.exists.return_value = False
+        m_flow_class.from_client_secrets_file.return_value.run_local_server.return_value.to_json.return_value = (
+            json.dumps(TOKEN | {'expiry': "2999-01-01T10:00:00Z"})
+        )
+
+        credentials = CredentialManager().credentials
+
+        self.assertEqual("refresh_token", credentials.refresh_token)
+        self.assertEqual("secrets/token.json", credentials.token_path)
+        m_write.assert_called_once_with("secrets/token.json", credentials.to_json())
+
+    @patch.object(Credentials, 'refresh', autospec=True, side_effect=refresh)
+    def test_background_refresh_refreshes_credentials_before_expiry_until_closed(self, m_refresh):
+        expiry = (datetime.now(timezone.utc) + timedelta(minutes=4)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        credential_manager = CredentialManager(TOKEN | {'expiry': expiry}, background_refresh=True)
+
+        credentials = credential_manager.credentials
+        for _ in range(100):
+            if credentials.token != "token":
+                break
+            time.sleep(0.01)
+        credential_manager.close()
+
+        m_refresh.assert_called_once()
+        self.assertEqual("token+", credentials.token)
+
+    @patch("snookxporter.clients.google.credentials.RETRY_INTERVAL", 0)
+    @patch.object(Credentials, 'refresh', autospec=True)
+    def test_background_refresh_retries_failed_refresh(self, m_refresh):
+        refreshed = threading.Event()
+
+        def refresh_once_online(credentials, request):
+            if m_refresh.call_count == 1:
+                raise RuntimeError("offline")
+            refresh(credentials, request)
+            refreshed.set()
+        m_refresh.side_effect = refresh_once_online
+        credential_manager = CredentialManager(TOKEN, background_refresh=True)
+
+        with self.assertLogs("snookxporter.clients.google.credentials", level="INFO") as logs:
+            _ = credential_manager.credentials
+            self.assertTrue(refreshed.wait(1))
+            credential_manager.close()
+
+        self.assertEqual(2, m_refresh.call_count)
+        self.assertIn("Refreshing Google credentials failed", logs.output[0])
+
+    @patch.object(Credentials, 'refresh', autospec=True)
+    def test_close_stops_background_refresh_waiting_to_retry(self, m_refresh):
+        failed = threading.Event()
+
+        def refresh_offline(*_):
+            failed.set()
+            raise RuntimeError("offline")
+        m_refresh.side_effect = refresh_offline
+        credential_manager = CredentialManager(TOKEN, background_refresh=True)
+
+        with self.assertLogs("snookxporter.clients.google.credentials", level="ERROR"):
+            _ = credential_manager.credentials
+            self.assertTrue(failed.wait(1))
+            credential_manager.close()
+
+        m_refresh.assert_called_once()
+
+    @freeze_time("2024-11-05")
+    def test_refresh_delay_keeps_a_margin_before_expiry_and_fits_platform_waits(self):
+        # pylint: disable=protected-access
+        credential_manager = CredentialManager(TOKEN | {'expiry': "2024-11-05T01:00:00.0Z"})
+
+        self.assertEqual(55 * 60, credential_manager._get_refresh_delay())
+        credential_manager.credentials.expiry = datetime(2999, 1, 1)
+        self.assertEqual(threading.TIMEOUT_MAX, credential_manager._get_refresh_delay())
+        credential_manager.credentials.expiry = None
+        self.assertIsNone(credential_manager._get_refresh_delay())
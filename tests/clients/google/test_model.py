@@ -0,0 +1,16 @@
+from unittest import TestCase
+
+from snookxporter.clients.google.model import FastJsonModel
+
+
+class FastJsonModelTest(TestCase):
+
+    def test_deserialize_decodes_json_body(self):
+        self.assertEqual({'items': [{'id': "1"}]}, FastJsonModel().deserialize(b'{"items": [{"id": "1"}]}'))
+
+    def test_deserialize_unwraps_data_if_service_uses_data_wrapper(self):
+        self.assertEqual({'id': "1"}, FastJsonModel(data_wrapper=True).deserialize('{"data": {"id": "1"}}'))
+
+    def test_deserialize_returns_content_which_is_not_json(self):
+        self.assertEqual("Not Found", FastJsonModel().deserialize(b"Not Found"))
+        self.assertEqual("Not Found", FastJsonModel().deserialize("Not Found"))
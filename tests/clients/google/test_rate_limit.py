@@ -0,0 +1,234 @@
+import asyncio
+import json
+import threading
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httplib2
+from googleapiclient.errors import HttpError
+from parameterized import parameterized
+
+from snookxporter.clients.google.rate_limit import (AdaptiveConcurrency, AsyncAdaptiveConcurrency, AsyncRateLimiter,
+                                                    RateLimitConfig, RateLimiter, TokenBucket, is_retryable)
+
+
+def get_http_error(status: int, reason: str | None = None, headers: dict | None = None) -> HttpError:
+    content = json.dumps({'error': {'code': status, 'errors': [{'reason': reason}]}}).encode() if reason else b""
+    return HttpError(resp=httplib2.Response({'status': status, **(headers or {})}), content=content)
+
+
+@patch("snookxporter.clients.google.rate_limit.time")
+class TokenBucketTest(TestCase):
+
+    def test_acquire_takes_burst_without_waiting_and_then_waits_for_refill(self, m_time):
+        m_time.monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=10, capacity=5)
+
+        for _ in range(5):
+            bucket.acquire()
+        m_time.sleep.assert_not_called()
+        bucket.acquire(2)
+
+        m_time.sleep.assert_called_once_with(0.2)
+
+    def test_acquire_admits_more_tokens_than_capacity_and_makes_next_callers_wait(self, m_time):
+        m_time.monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=10, capacity=5)
+
+        bucket.acquire(50)
+        m_time.monotonic.return_value = 102.0
+        bucket.acquire()
+
+        self.assertEqual([4.5, 2.6], [c.args[0] for c in m_time.sleep.call_args_list])
+
+
+class AdaptiveConcurrencyTest(TestCase):
+
+    def test_release_raises_limit_additively_and_halves_it_on_throttling_once_per_cooldown(self):
+        concurrency = AdaptiveConcurrency(initial=4, maximum=5, cooldown=60)
+
+        for _ in range(8):
+            concurrency.acquire()
+            concurrency.release()
+        self.assertEqual(5, concurrency.limit)
+        for _ in range(2):
+            concurrency.acquire()
+            concurrency.release(throttled=True)
+
+        self.assertEqual(2.5, concurrency.limit)
+
+    def test_acquire_waits_for_free_slot(self):
+        concurrency = AdaptiveConcurrency(initial=1, maximum=1, cooldown=1)
+        concurrency.acquire()
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (concurrency.acquire(), acquired.set()))
+
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        concurrency.release()
+        thread.join()
+
+        self.assertTrue(acquired.is_set())
+
+
+class AsyncAdaptiveConcurrencyTest(IsolatedAsyncioTestCase):
+
+    async def test_acquire_waits_for_free_slot_and_release_does_not_block(self):
+        concurrency = AsyncAdaptiveConcurrency(initial=1, maximum=1, cooldown=1)
+        await concurrency.acquire()
+        waiting = asyncio.create_task(concurrency.acquire())
+
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        concurrency.release(throttled=True)
+        await asyncio.wait_for(waiting, 1)
+
+        self.assertEqual(1.0, concurrency.limit)
+
+    async def test_cancelled_waiters_pass_their_turn_and_slot_on(self):
+        concurrency = AsyncAdaptiveConcurrency(initial=1, maximum=1, cooldown=1)
+        await concurrency.acquire()
+        queued, woken, last = (asyncio.create_task(concurrency.acquire()) for _ in range(3))
+        await asyncio.sleep(0.01)
+
+        queued.cancel()
+        concurrency.release()
+        woken.cancel()
+        await asyncio.wait_for(last, 1)
+
+        self.assertTrue(queued.cancelled())
+        self.assertTrue(woken.cancelled())
+        self.assertFalse(concurrency._has_free_slot())  # pylint: disable=protected-access
+
+
+@patch("snookxporter.clients.google.rate_limit.time.sleep")
+class RateLimiterTest(TestCase):
+
+    def test_execute_retries_rate_limit_and_server_errors_with_growing_backoff(self, m_sleep):
+        limiter = RateLimiter(RateLimitConfig(requests_per_second=None, backoff_base=1, backoff_max=3))
+        request = MagicMock(side_effect=[
+            get_http_error(429), get_http_error(403, 'userRateLimitExceeded'), get_http_error(500), "result",
+        ])
+
+        self.assertEqual("result", limiter.execute(request))
+
+        self.assertEqual(4, request.call_count)
+        self.assertEqual(3, limiter.retries)
+        self.assertIsNone(limiter.bucket)
+        delays = [c.args[0] for c in m_sleep.call_args_list]
+        self.assertTrue(all(0 <= delay <= maximum for delay, maximum in zip(delays, [1, 2, 3])))
+
+    def test_execute_raises_other_errors_and_errors_exceeding_retries(self, m_sleep):
+        limiter = RateLimiter(RateLimitConfig(max_retries=1))
+        forbidden, throttled = get_http_error(403, 'forbidden'), get_http_error(429)
+
+        with self.assertRaises(HttpError) as forbidden_context:
+            limiter.execute(MagicMock(side_effect=forbidden))
+        with self.assertRaises(HttpError) as throttled_context:
+            limiter.execute(MagicMock(side_effect=throttled))
+
+        self.assertIs(forbidden, forbidden_context.exception)
+        self.assertIs(throttled, throttled_context.exception)
+        m_sleep.assert_called_once()
+
+    def test_execute_takes_tokens_of_cost_evaluated_for_every_attempt(self, _):
+        limiter = RateLimiter()
+        limiter.bucket = MagicMock()
+        pending = [1, 2, 3]
+
+        def request():
+            if len(pending) == 3:
+                pending.pop()
+                raise get_http_error(429)
+        limiter.execute(request, cost=lambda: len(pending))
+
+        self.assertEqual([3, 2], [c.args[0] for c in limiter.bucket.acquire.call_args_list])
+        self.assertEqual(5, limiter.calls)
+
+    def test_execute_releases_slot_of_request_raising_other_exception(self, _):
+        limiter = RateLimiter(RateLimitConfig(concurrency=1, max_concurrency=1))
+
+        with self.assertRaises(ConnectionError):
+            limiter.execute(MagicMock(side_effect=ConnectionError()))
+
+        self.assertEqual("result", limiter.execute(lambda: "result"))
+
+    def test_execute_counts_calls_and_retries_of_all_threads(self, _):
+        limiter = RateLimiter(RateLimitConfig(requests_per_second=None, max_concurrency=8))
+
+        def execute():
+            for _ in range(200):
+                limiter.execute(MagicMock(side_effect=[get_http_error(503), None]), cost=2)
+        threads = [threading.Thread(target=execute) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8 * 200 * 2 * 2, limiter.calls)
+        self.assertEqual(8 * 200, limiter.retries)
+
+    def test_get_backoff_respects_retry_after(self, _):
+        limiter = RateLimiter(RateLimitConfig(backoff_base=0.001))
+
+        self.assertEqual(7, limiter.get_backoff(0, get_http_error(429, headers={'retry-after': '7'})))
+        self.assertLessEqual(limiter.get_backoff(0, get_http_error(429, headers={'retry-after': 'soon'})), 0.001)
+
+
+@patch("snookxporter.clients.google.rate_limit.asyncio.sleep")
+class AsyncRateLimiterTest(IsolatedAsyncioTestCase):
+
+    async def test_execute_waits_for_tokens_and_retries_rate_limit_errors(self, m_sleep):
+        limiter = AsyncRateLimiter(RateLimitConfig(requests_per_second=10, burst=1, backoff_base=1))
+        request = AsyncMock(side_effect=[get_http_error(429, headers={'retry-after': '5'}), "result"])
+
+        self.assertEqual("result", await limiter.execute(request))
+
+        self.assertEqual(2, limiter.calls)
+        self.assertEqual(1, limiter.retries)
+        self.assertEqual(5, m_sleep.call_args_list[0].args[0])
+        self.assertAlmostEqual(0.1, m_sleep.call_args_list[1].args[0], places=2)
+
+    async def test_execute_raises_other_errors_and_releases_slots_of_cancelled_requests(self, _):
+        limiter = AsyncRateLimiter(RateLimitConfig(requests_per_second=None, concurrency=1, max_concurrency=1))
+        forbidden = get_http_error(403, 'forbidden')
+
+        with self.assertRaises(HttpError) as context:
+            await limiter.execute(AsyncMock(side_effect=forbidden))
+        with self.assertRaises(asyncio.CancelledError):
+            await limiter.execute(AsyncMock(side_effect=asyncio.CancelledError()))
+
+        self.assertIs(forbidden, context.exception)
+        self.assertEqual("result", await asyncio.wait_for(limiter.execute(AsyncMock(return_value="result")), 1))
+
+
+    async def test_execute_retries_transport_errors_of_the_caller_only(self, m_sleep):
+        limiter = AsyncRateLimiter(RateLimitConfig(requests_per_second=None, max_retries=1, backoff_base=1))
+        error = ConnectionError("refused")
+
+        self.assertEqual("result", await limiter.execute(
+            AsyncMock(side_effect=[error, "result"]), transport_errors=(ConnectionError,)
+        ))
+        with self.assertRaises(ConnectionError):
+            await limiter.execute(AsyncMock(side_effect=error), transport_errors=(ConnectionError,))
+        with self.assertRaises(ConnectionError):
+            await limiter.execute(AsyncMock(side_effect=error))
+
+        self.assertEqual(2, limiter.retries)
+        self.assertEqual(2, m_sleep.call_count)
+        self.assertLessEqual(m_sleep.call_args_list[0].args[0], 1)
+
+class IsRetryableTest(TestCase):
+
+    @parameterized.expand([
+        (get_http_error(429), True),
+        (get_http_error(503), True),
+        (get_http_error(403, 'rateLimitExceeded'), True),
+        (get_http_error(403, 'forbidden'), False),
+        (get_http_error(403), False),
+        (get_http_error(410), False),
+        (RuntimeError(), False),
+        (None, False),
+    ])
+    def test_is_retryable(self, error, expected):
+        self.assertEqual(expected, is_retryable(error))
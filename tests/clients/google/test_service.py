@@ -0,0 +1,55 @@
+import threading
+from unittest import TestCase
+from unittest.mock import ANY, MagicMock, patch
+
+from snookxporter.clients.google.model import FastJsonModel
+from snookxporter.clients.google.service import get_calendar_service, get_discovery_document
+
+
+class GoogleCalendarServiceTest(TestCase):
+
+    def test_get_discovery_document_returns_bundled_calendar_document(self):
+        document = get_discovery_document()
+
+        self.assertEqual("calendar", document["name"])
+        self.assertEqual("v3", document["version"])
+        self.assertIs(document, get_discovery_document())
+
+    @patch("googleapiclient.discovery.build_from_document")
+    def test_get_calendar_service_builds_service_once_per_credentials(self, m_build_from_document):
+        credentials, other_credentials = MagicMock(), MagicMock()
+        m_build_from_document.side_effect = lambda document, credentials, model: MagicMock()
+
+        service = get_calendar_service(credentials)
+
+        self.assertIs(service, get_calendar_service(credentials))
+        self.assertIsNot(service, get_calendar_service(other_credentials))
+        m_build_from_document.assert_any_call(get_discovery_document(), credentials=credentials, model=ANY)
+        self.assertIsInstance(m_build_from_document.call_args.kwargs['model'], FastJsonModel)
+        self.assertEqual(2, m_build_from_document.call_count)
+
+    @patch("googleapiclient.discovery.build_from_document")
+    def test_get_calendar_service_builds_separate_service_per_thread(self, m_build_from_document):
+        credentials = MagicMock()
+        m_build_from_document.side_effect = lambda document, credentials, model: MagicMock()
+        services = []
+
+        services.append(get_calendar_service(credentials))
+        thread = threading.Thread(target=lambda: services.append(get_calendar_service(credentials)))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(services[0], services[1])
+
+    @patch("googleapiclient.discovery.build_from_document")
+    def test_get_calendar_service_points_regular_and_batch_requests_at_root_url(self, m_build_from_document):
+        credentials = MagicMock()
+        m_build_from_document.side_effect = lambda document, credentials, model: MagicMock()
+
+        service = get_calendar_service(credentials, root_url="http://127.0.0.1:8081/")
+
+        self.assertIsNot(service, get_calendar_service(credentials))
+        document = m_build_from_document.call_args_list[0].args[0]
+        self.assertEqual("http://127.0.0.1:8081/", document["rootUrl"])
+        self.assertEqual(get_discovery_document()["batchPath"], document["batchPath"])
+        self.assertEqual("https://www.googleapis.com/", get_discovery_document()["rootUrl"])
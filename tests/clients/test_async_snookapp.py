@@ -0,0 +1,110 @@
+import json
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+from freezegun import freeze_time
+
+from snookxporter.clients.async_snookapp import AsyncSnookAppClient
+from snookxporter.clients.snookapp import SnookAppConfig
+
+DAYS = [
+    {"date": "1955-11-04", "matchCourts": []},
+    {"date": "1955-11-06", "matchCourts": []},
+    {"date": "1955-11-12", "matchCourts": []},
+]
+
+
+def get_body(days: list[dict]) -> bytes:
+    return json.dumps({"bookings": {"days": {"SNOOKER": days}}}).encode()
+
+
+@freeze_time("1955-11-05")
+@patch("snookxporter.clients.async_snookapp.asyncio.sleep")
+class AsyncSnookAppClientTest(IsolatedAsyncioTestCase):
+
+    def get_client(self, handler, **config) -> AsyncSnookAppClient:
+        client = AsyncSnookAppClient(
+            config=SnookAppConfig(base_url="http://snook.app.url", bookings_endpoint="/api", **config),
+            http=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+        self.addAsyncCleanup(client.aclose)
+        return client
+
+    async def test_get_schedule_fetches_chunks_and_merges_days_in_date_order(self, _):
+        chunks = {
+            "from=1955-11-02&to=1955-11-06": DAYS[:2],
+            "from=1955-11-06&to=1955-11-10": [DAYS[1]],
+            "from=1955-11-10&to=1955-11-14": DAYS[2:],
+        }
+        client = self.get_client(
+            lambda request: httpx.Response(200, stream=httpx.ByteStream(get_body(chunks[request.url.query.decode()]))),
+            chunk_days=4,
+        )
+
+        schedule = await client.get_schedule(past_days=3, future_days=9)
+
+        self.assertListEqual(DAYS, schedule)
+        self.assertFalse(client.schedule_unchanged)
+        self.assertEqual(sum(len(get_body(chunk)) for chunk in chunks.values()), client.received_bytes)
+
+    async def test_get_schedule_sends_conditional_request_and_reports_unchanged_schedule(self, _):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=get_body(DAYS), headers={"ETag": '"v1"'})
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = self.get_client(handler, cache_dir=cache_dir)
+            first_schedule = await client.get_schedule(past_days=3, future_days=6)
+            first_unchanged = client.schedule_unchanged
+            client.commit_cache()
+
+            second_schedule = await client.get_schedule(past_days=3, future_days=6)
+
+        self.assertFalse(first_unchanged)
+        self.assertTrue(client.schedule_unchanged)
+        self.assertListEqual(DAYS, first_schedule)
+        self.assertListEqual(DAYS, second_schedule)
+        self.assertEqual(2, len(requests))
+
+    async def test_get_schedule_retries_server_and_connection_errors(self, m_sleep):
+        responses = iter([
+            httpx.ConnectError("refused"), httpx.Response(503), httpx.Response(200, content=get_body(DAYS)),
+        ])
+
+        def handler(_: httpx.Request) -> httpx.Response:
+            response = next(responses)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        schedule = await self.get_client(handler, retries=2).get_schedule(past_days=3, future_days=6)
+
+        self.assertListEqual(DAYS, schedule)
+        self.assertEqual([0.5, 1.0], [c.args[0] for c in m_sleep.call_args_list])
+
+    async def test_get_schedule_raises_errors_exceeding_retries(self, _):
+        def refuse(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused", request=request)
+
+        refusing_client = self.get_client(refuse, retries=1)
+        failing_client = self.get_client(lambda request: httpx.Response(503), retries=1)
+
+        with self.assertRaises(httpx.ConnectError):
+            await refusing_client.get_schedule(past_days=3, future_days=6)
+        with self.assertRaises(httpx.HTTPStatusError):
+            await failing_client.get_schedule(past_days=3, future_days=6)
+
+    async def test_http_client_is_pooled_to_workers(self, _):
+        client = AsyncSnookAppClient(config=SnookAppConfig(
+            base_url="http://snook.app.url", bookings_endpoint="/api", workers=8, timeout=5,
+        ))
+        self.addAsyncCleanup(client.aclose)
+
+        self.assertEqual(8, client.http._transport._pool._max_connections)  # pylint: disable=protected-access
+        self.assertEqual(5, client.http.timeout.read)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from snookxporter.clients.http_cache import CacheEntry, HttpCache, get_content_hash
+
+
+class HttpCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = HttpCache(directory=self.directory, max_bytes=1024)
+        self.entry = CacheEntry(
+            content=b'{"bookings": {}}\n',
+            content_hash=get_content_hash(b'{"bookings": {}}\n'),
+            etag='"etag"',
+            last_modified="Sat, 05 Nov 1955 06:00:00 GMT",
+            fingerprint="fingerprint",
+        )
+
+    def test_get_returns_none_for_unknown_url(self):
+        self.assertIsNone(self.cache.get("http://snook.app/unknown"))
+
+    def test_put_stores_entry_per_url(self):
+        self.cache.put("http://snook.app/api", self.entry)
+
+        self.assertEqual(self.entry, self.cache.get("http://snook.app/api"))
+        self.assertEqual(self.entry, HttpCache(self.directory, max_bytes=1024).get("http://snook.app/api"))
+        self.assertIsNone(self.cache.get("http://snook.app/other"))
+
+    @parameterized.expand([
+        ("truncated", b'{"content_hash": "hash"'),
+        ("not_json", b'<html>\n'),
+        ("older_format", b'{"content_hash": "hash"}\n{}'),
+        ("not_object", b'[]\n{}'),
+    ])
+    def test_get_removes_unreadable_entry_and_returns_none(self, _, content):
+        with open(self.cache._get_path("http://snook.app/api"), 'wb') as cache_file:  # pylint: disable=protected-access
+            cache_file.write(content)
+
+        with self.assertLogs('snookxporter.clients.http_cache', level='WARNING'):
+            self.assertIsNone(self.cache.get("http://snook.app/api"))
+
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_put_of_concurrent_writers_leaves_a_complete_entry(self):
+        entries = [
+            CacheEntry(content=str(index).encode() * 100, content_hash=str(index), etag=None, last_modified=None)
+            for index in range(8)
+        ]
+        cache = HttpCache(directory=self.directory, max_bytes=1024 * 1024)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda entry: [cache.put("http://snook.app/api", entry) for _ in range(50)], entries))
+
+        self.assertIn(cache.get("http://snook.app/api"), entries)
+        self.assertEqual(1, len(os.listdir(self.directory)))
+
+    def test_put_evicts_least_recently_used_entries_over_max_bytes(self):
+        entry = CacheEntry(content=b"x" * 200, content_hash="hash")
+        for index, url in enumerate(["first", "second", "third"]):
+            self.cache.put(url, entry)
+            os.utime(self.cache._get_path(url), (index, index))  # pylint: disable=protected-access
+        self.cache.get("first")
+
+        self.cache.put("fourth", entry)
+
+        self.assertIsNotNone(self.cache.get("first"))
+        self.assertIsNone(self.cache.get("second"))
+        self.assertIsNotNone(self.cache.get("third"))
+        self.assertIsNotNone(self.cache.get("fourth"))
+
+    def test_get_conditional_headers_contains_only_known_validators(self):
+        self.assertDictEqual(
+            {"If-None-Match": '"etag"', "If-Modified-Since": "Sat, 05 Nov 1955 06:00:00 GMT"},
+            self.entry.get_conditional_headers()
+        )
+        self.assertDictEqual({}, CacheEntry(content=b"", content_hash="hash").get_conditional_headers())
@@ -1,5 +1,8 @@
+import json
+import tempfile
 from datetime import datetime
 from unittest import TestCase
+from unittest.mock import patch
 
 import responses
 from freezegun import freeze_time
@@ -128,6 +131,7 @@ class SnookAppClientTest(TestCase):
                 end=datetime(1955, 11, 5, 20, 0),
                 host_score=None,
                 guest_score=None,
+                table=1,
             )
         ]
 
@@ -137,6 +141,46 @@ class SnookAppClientTest(TestCase):
         )
 
         self.assertListEqual(expected_matches, matches)
+        self.assertIs(matches[0].host, matches[1].host)
+
+    def test_route_schedule_returns_matches_of_every_calendar_with_its_aliases(self):
+        marty = Player(first_name="Marty", last_name="McFly")
+        emmet = Player(first_name="Emmet", last_name="Brown")
+        george = Player(first_name="George", last_name="McFly")
+        calendars_players = [
+            [Player(first_name="Marty", last_name="McFly", alias="MM")],
+            [Player(first_name="Emmet", last_name="Brown", alias="Doc"), Player(first_name="Marty", last_name="McFly")],
+            [george],
+            [Player(first_name="Lorraine", last_name="Baines")],
+        ]
+
+        calendars_matches = self.client.route_schedule(
+            schedule=self.sample_response["bookings"]["days"]["SNOOKER"],
+            calendars_players=calendars_players,
+        )
+
+        self.assertListEqual(
+            [["MM v Emmet Brown", "MM v Biff Tannen"], ["Marty McFly v Doc", "Marty McFly v Biff Tannen"],
+             ["George McFly v Mr Strickland"], []],
+            [[f"{m.host.alias or m.host} v {m.guest.alias or m.guest}" for m in matches]
+             for matches in calendars_matches]
+        )
+        self.assertListEqual([marty, emmet], [calendars_matches[1][0].host, calendars_matches[1][0].guest])
+        self.assertEqual(datetime(1955, 11, 15, 8, 30), calendars_matches[2][0].start)
+        self.assertEqual(3, self.client.processed_bookings)
+
+    def test_route_schedule_skips_bookings_without_match_players(self):
+        schedule = [{"matchCourts": [{"number": 1, "bookingItems": [
+            {"timeFrom": "1955-11-04T06:30:00", "timeTo": "1955-11-04T07:30:00"},
+            {"timeFrom": "1955-11-04T06:30:00", "timeTo": "1955-11-04T07:30:00", "match": {"host": None}},
+        ]}]}]
+
+        calendars_matches = self.client.route_schedule(
+            schedule=schedule, calendars_players=[[Player(first_name="Marty", last_name="McFly")]]
+        )
+
+        self.assertListEqual([[]], calendars_matches)
+        self.assertEqual(0, self.client.processed_bookings)
 
     @responses.activate
     @freeze_time("1955-11-05")
@@ -153,3 +197,164 @@ class SnookAppClientTest(TestCase):
         )
 
         self.assertListEqual(self.sample_response["bookings"]["days"]["SNOOKER"], schedule)
+        self.assertEqual(len(json.dumps(self.sample_response)), self.client.received_bytes)
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    def test_iter_schedule_yields_schedule_days_from_streamed_response(self):
+        responses.get(
+            url=f"{self.config.url}?from=1955-11-02&to=1955-11-11",
+            json=self.sample_response,
+            status=200
+        )
+
+        schedule = self.client.iter_schedule(past_days=3, future_days=6)
+
+        self.assertNotIsInstance(schedule, list)
+        self.assertListEqual(self.sample_response["bookings"]["days"]["SNOOKER"], list(schedule))
+        self.assertEqual(len(json.dumps(self.sample_response)), self.client.received_bytes)
+
+    @responses.activate
+    def test_iter_schedule_resets_schedule_unchanged_before_anything_is_fetched(self):
+        self.client.schedule_unchanged = True
+
+        self.client.iter_schedule(past_days=3, future_days=6)
+
+        self.assertFalse(self.client.schedule_unchanged)
+        self.assertEqual(0, len(responses.calls))
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    @patch("snookxporter.clients.snookapp.ijson", None)
+    def test_iter_schedule_falls_back_to_whole_response_without_ijson(self):
+        responses.get(
+            url=f"{self.config.url}?from=1955-11-02&to=1955-11-11",
+            json=self.sample_response,
+            status=200
+        )
+
+        schedule = list(self.client.iter_schedule(past_days=3, future_days=6))
+
+        self.assertListEqual(self.sample_response["bookings"]["days"]["SNOOKER"], schedule)
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    def test_get_schedule_fetches_window_in_chunks_and_merges_days_in_date_order(self):
+        days = self.sample_response["bookings"]["days"]["SNOOKER"]
+        client = SnookAppClient(config=SnookAppConfig(
+            base_url="http://snook.app.url", bookings_endpoint="/api", chunk_days=4, workers=2
+        ))
+        for _from, _to, chunk in [
+            ("1955-11-02", "1955-11-06", days[:2]),
+            ("1955-11-06", "1955-11-10", []),
+            ("1955-11-10", "1955-11-14", days[2:]),
+        ]:
+            responses.get(
+                url=f"{self.config.url}?from={_from}&to={_to}",
+                json={"bookings": {"days": {"SNOOKER": chunk}}},
+                status=200
+            )
+
+        schedule = client.get_schedule(past_days=3, future_days=9)
+
+        self.assertListEqual(days, schedule)
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    def test_iter_schedule_streams_chunks_in_order_without_duplicated_boundary_days(self):
+        days = self.sample_response["bookings"]["days"]["SNOOKER"]
+        client = SnookAppClient(config=SnookAppConfig(
+            base_url="http://snook.app.url", bookings_endpoint="/api", chunk_days=3
+        ))
+        for _from, _to, chunk in [
+            ("1955-11-04", "1955-11-07", days[:2]),
+            ("1955-11-07", "1955-11-08", [days[1], {"matchCourts": []}]),
+        ]:
+            responses.get(
+                url=f"{self.config.url}?from={_from}&to={_to}",
+                json={"bookings": {"days": {"SNOOKER": chunk}}},
+                status=200
+            )
+
+        schedule = list(client.iter_schedule(past_days=1, future_days=3))
+
+        self.assertListEqual(days[:2] + [{"matchCourts": []}], schedule)
+
+    def test_session_is_pooled_and_retries_failed_requests(self):
+        client = SnookAppClient(config=SnookAppConfig(
+            base_url="http://snook.app.url", bookings_endpoint="/api", workers=8, retries=5
+        ))
+
+        adapter = client.session.get_adapter("https://snook.app.url")
+
+        self.assertEqual(8, adapter._pool_maxsize)  # pylint: disable=protected-access
+        self.assertEqual(5, adapter.max_retries.total)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertIn("gzip", client.session.headers["Accept-Encoding"])
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    def test_get_schedule_sends_conditional_request_and_reports_unchanged_schedule(self):
+        url = f"{self.config.url}?from=1955-11-02&to=1955-11-11"
+        body = json.dumps(self.sample_response)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = SnookAppClient(config=SnookAppConfig(
+                base_url="http://snook.app.url", bookings_endpoint="/api", cache_dir=cache_dir
+            ))
+            responses.get(url=url, body=body, status=200, headers={"ETag": '"v1"'})
+            first_schedule = client.get_schedule(past_days=3, future_days=6)
+            first_unchanged = client.schedule_unchanged
+            client.commit_cache()
+            responses.replace(responses.GET, url=url, body=b"", status=304)
+
+            second_schedule = client.get_schedule(past_days=3, future_days=6)
+
+            self.assertFalse(first_unchanged)
+            self.assertTrue(client.schedule_unchanged)
+            self.assertListEqual(first_schedule, second_schedule)
+            self.assertEqual('"v1"', responses.calls[1].request.headers["If-None-Match"])
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    def test_get_schedule_reports_schedule_cached_with_another_fingerprint_as_changed(self):
+        url = f"{self.config.url}?from=1955-11-02&to=1955-11-11"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = SnookAppClient(config=SnookAppConfig(
+                base_url="http://snook.app.url", bookings_endpoint="/api", cache_dir=cache_dir
+            ))
+            responses.get(url=url, json=self.sample_response, status=200)
+            client.get_schedule(past_days=3, future_days=6, fingerprint="one calendar")
+            client.commit_cache()
+
+            client.get_schedule(past_days=3, future_days=6, fingerprint="two calendars")
+            other_fingerprint_unchanged = client.schedule_unchanged
+            client.commit_cache()
+            client.get_schedule(past_days=3, future_days=6, fingerprint="two calendars")
+
+            self.assertFalse(other_fingerprint_unchanged)
+            self.assertTrue(client.schedule_unchanged)
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    def test_get_schedule_compares_content_hash_and_caches_only_committed_responses(self):
+        url = f"{self.config.url}?from=1955-11-02&to=1955-11-11"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = SnookAppClient(config=SnookAppConfig(
+                base_url="http://snook.app.url", bookings_endpoint="/api", cache_dir=cache_dir
+            ))
+            responses.get(url=url, json=self.sample_response, status=200)
+            client.get_schedule(past_days=3, future_days=6)
+            client.get_schedule(past_days=3, future_days=6)
+            not_committed_unchanged = client.schedule_unchanged
+            client.commit_cache()
+
+            client.get_schedule(past_days=3, future_days=6)
+            committed_unchanged = client.schedule_unchanged
+            responses.replace(responses.GET, url=url, json={"bookings": {"days": {"SNOOKER": []}}}, status=200)
+            schedule = client.get_schedule(past_days=3, future_days=6)
+
+            self.assertFalse(not_committed_unchanged)
+            self.assertTrue(committed_unchanged)
+            self.assertFalse(client.schedule_unchanged)
+            self.assertListEqual([], schedule)
@@ -2,20 +2,56 @@ from unittest import TestCase
 from unittest.mock import mock_open, patch
 
 from settings.config import ConfigParser
+from snookxporter.clients.google.calendar import GoogleCalendarConfig
+from snookxporter.clients.google.rate_limit import RateLimitConfig
 from snookxporter.clients.snookapp import SnookAppConfig
+from snookxporter.clubs import ClubConfig
 from snookxporter.entities import Player
+from snookxporter.logs import LoggingConfig
 
 CONFIG_YAML_CONTENT = """
 snook_app:
   base_url: http://snook.app
   bookings_endpoint: /endpoint
-  
+
+google_calendar:
+  root_url: http://127.0.0.1:8081/
+  rate_limit:
+    requests_per_second: 5
+    max_retries: 3
+
+logging:
+  level: INFO
+  format: json
+
 players:
   - first_name: Player
     last_name: One
     alias: p1
   - first_name: Player 
     last_name: Two
+
+calendars:
+  - id: calendar_id
+    players:
+      - first_name: Player
+        last_name: One
+"""
+
+CLUBS_CONFIG_YAML_CONTENT = """
+clubs:
+  - name: First club
+    snook_app:
+      base_url: http://snook.app
+      bookings_endpoint: /first
+    calendars:
+      - id: first_calendar_id
+        players: []
+  - snook_app:
+      base_url: http://snook.app
+      bookings_endpoint: /second
+      chunk_days: 7
+    calendars: []
 """
 
 
@@ -43,3 +79,50 @@ class ConfigTest(TestCase):
 
         m_open.assert_called_once()
         self.assertListEqual(expected_players, players)
+
+    def test_get_logging_config_returns_config_object_with_defaults(self, _):
+        config = ConfigParser().get_logging_config()
+
+        self.assertEqual(LoggingConfig(level='INFO', format='json'), config)
+
+    def test_config_is_read_from_given_file(self, m_open):
+        ConfigParser("/tmp/fake-servers.yaml")
+
+        self.assertEqual("/tmp/fake-servers.yaml", m_open.call_args.args[0])
+
+    def test_get_calendar_root_url_returns_configured_url(self, _):
+        self.assertEqual("http://127.0.0.1:8081/", ConfigParser().get_calendar_root_url())
+
+    def test_get_rate_limit_config_returns_config_object_with_defaults(self, _):
+        config = ConfigParser().get_rate_limit_config()
+
+        self.assertEqual(RateLimitConfig(requests_per_second=5, max_retries=3), config)
+
+    def test_get_clubs_config_returns_single_club_of_top_level_snook_app_and_calendars(self, _):
+        clubs = ConfigParser().get_clubs_config()
+
+        self.assertEqual([ClubConfig(
+            name="http://snook.app/endpoint",
+            snook_app=SnookAppConfig(base_url="http://snook.app", bookings_endpoint="/endpoint"),
+            calendars=[GoogleCalendarConfig(id="calendar_id", players=[Player(first_name="Player", last_name="One")])],
+        )], clubs)
+
+
+@patch("builtins.open", new_callable=mock_open, read_data=CLUBS_CONFIG_YAML_CONTENT)
+class ClubsConfigTest(TestCase):
+
+    def test_get_clubs_config_returns_every_club_with_its_snook_app_and_calendars(self, _):
+        clubs = ConfigParser().get_clubs_config()
+
+        self.assertEqual([
+            ClubConfig(
+                name="First club",
+                snook_app=SnookAppConfig(base_url="http://snook.app", bookings_endpoint="/first"),
+                calendars=[GoogleCalendarConfig(id="first_calendar_id", players=[])],
+            ),
+            ClubConfig(
+                name="http://snook.app/second",
+                snook_app=SnookAppConfig(base_url="http://snook.app", bookings_endpoint="/second", chunk_days=7),
+                calendars=[],
+            ),
+        ], clubs)
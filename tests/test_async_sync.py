@@ -0,0 +1,217 @@
+import asyncio
+from datetime import datetime
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+
+from snookxporter.async_sync import AsyncSynchronizer, sync_calendar
+from snookxporter.clients.google.calendar import GoogleCalendarConfig, OperationResult
+from snookxporter.clubs import ScheduleSource
+from snookxporter.entities import CalendarEvent, Match, Player
+from snookxporter.sync import CalendarSyncResult
+
+
+def get_calendar_client(calendar_id: str, events: list[CalendarEvent]) -> MagicMock:
+    calendar_client = MagicMock(calendar_id=calendar_id, state=None, listed_changes=None)
+    calendar_client.get_events = AsyncMock(return_value=events)
+    calendar_client.add_events = AsyncMock(return_value=[])
+    calendar_client.update_events = AsyncMock(return_value=[])
+    calendar_client.delete_events = AsyncMock(return_value=[])
+    return calendar_client
+
+
+class SyncCalendarTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.match = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Biff", last_name="Tannen"),
+            start=datetime(1955, 11, 5, 16, 30),
+            end=datetime(1955, 11, 5, 20, 0),
+            table=1,
+        )
+        self.stale = CalendarEvent(item_id="stale")
+        self.calendar_client = get_calendar_client("id@google.com", [self.stale])
+
+    async def test_sync_calendar_adds_missing_and_deletes_stale_events_of_listing(self):
+        self.calendar_client.add_events.return_value = [OperationResult(item=self.match)]
+        self.calendar_client.delete_events.return_value = [OperationResult(item=self.stale, error=RuntimeError())]
+        listing = asyncio.create_task(self.calendar_client.get_events(past_days=1, future_days=2))
+
+        result = await sync_calendar(calendar_client=self.calendar_client, listing=listing, matches=[self.match])
+
+        self.calendar_client.add_events.assert_awaited_once_with([self.match])
+        self.calendar_client.update_events.assert_awaited_once_with([])
+        self.calendar_client.delete_events.assert_awaited_once_with([self.stale])
+        self.assertEqual(CalendarSyncResult(calendar_id="id@google.com", added=1, failed=1), result)
+
+    async def test_sync_calendar_catches_listing_errors(self):
+        self.calendar_client.get_events.side_effect = RuntimeError("calendar unavailable")
+        listing = asyncio.create_task(self.calendar_client.get_events(past_days=1, future_days=2))
+
+        result = await sync_calendar(calendar_client=self.calendar_client, listing=listing, matches=[self.match])
+
+        self.assertIsInstance(result.error, RuntimeError)
+        self.calendar_client.add_events.assert_not_called()
+
+    @patch('snookxporter.sync.is_calendar_unchanged', return_value=True)
+    async def test_sync_calendar_skips_unchanged_calendar(self, _):
+        listing = asyncio.create_task(self.calendar_client.get_events(past_days=1, future_days=2))
+
+        result = await sync_calendar(
+            calendar_client=self.calendar_client, listing=listing, matches=[self.match], schedule_hash="hash",
+        )
+
+        self.assertTrue(result.unchanged)
+        self.calendar_client.add_events.assert_not_called()
+
+
+@patch('snookxporter.async_sync.AsyncGoogleCalendarClient')
+class AsyncSynchronizerTest(TestCase):
+    def setUp(self):
+        self.snook_app_client = MagicMock(schedule_unchanged=False)
+        self.snook_app_client.get_schedule = AsyncMock(return_value=[{'date': "1955-11-05"}])
+        self.snook_app_client.aclose = AsyncMock()
+        self.snook_app_client.route_schedule.side_effect = self.route_schedule
+        self.state = MagicMock()
+        self.synchronizer = AsyncSynchronizer(
+            sources=[ScheduleSource(snook_app_client=self.snook_app_client, calendars_config=[
+                GoogleCalendarConfig(id="11", players=[]), GoogleCalendarConfig(id="22", players=[]),
+            ])],
+            token={},
+            past_days=1,
+            future_days=2,
+            state=self.state,
+        )
+
+    def tearDown(self):
+        if not self.synchronizer.http.is_closed:
+            self.synchronizer.close()
+
+    @staticmethod
+    def route_schedule(schedule, calendars_players):
+        list(schedule)
+        return [[] for _ in calendars_players]
+
+    def set_calendar_clients(self, m_client_class) -> list[MagicMock]:
+        clients = [get_calendar_client("11", []), get_calendar_client("22", [])]
+        m_client_class.side_effect = clients
+        return clients
+
+    def test_synchronize_lists_calendars_while_schedule_is_downloaded_and_skips_synchronized_schedule(
+            self, m_client_class,
+    ):
+        clients = self.set_calendar_clients(m_client_class)
+        listed = asyncio.Event()
+
+        async def get_events(**_):
+            listed.set()
+            return []
+        clients[1].get_events.side_effect = get_events
+
+        async def get_schedule(**_):
+            await asyncio.wait_for(listed.wait(), 1)
+            return [{'date': "1955-11-05"}]
+        self.snook_app_client.get_schedule.side_effect = get_schedule
+        self.synchronizer.state = None
+
+        first = self.synchronizer.synchronize()
+        second = self.synchronizer.synchronize()
+
+        self.assertEqual([CalendarSyncResult(calendar_id="11"), CalendarSyncResult(calendar_id="22")], first)
+        self.assertEqual([], second)
+        self.assertEqual(2, m_client_class.call_count)
+        self.assertIs(m_client_class.call_args_list[0].kwargs['rate_limiter'],
+                      m_client_class.call_args_list[1].kwargs['rate_limiter'])
+        self.assertIs(self.synchronizer.http, m_client_class.call_args.kwargs['http'])
+        self.assertEqual(httpx.Timeout(30), self.synchronizer.http.timeout)
+        self.snook_app_client.commit_cache.assert_called_once()
+        self.assertEqual(2, clients[0].get_events.call_count)
+        self.assertEqual(
+            [{'calendar': "11", 'phase': 'list'}, {'calendar': "22", 'phase': 'list'}],
+            [labels for name, labels, _ in self.synchronizer.metrics.get_samples()
+             if name == 'phase_duration_seconds' and labels['phase'] == 'list'],
+        )
+        self.assertTrue(self.synchronizer.metrics.succeeded)
+
+    def test_synchronize_cancels_listings_of_unchanged_schedule(self, m_client_class):
+        clients = self.set_calendar_clients(m_client_class)
+        cancelled = asyncio.Event()
+
+        async def list_slowly(**_):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        clients[1].get_events.side_effect = list_slowly
+        self.snook_app_client.schedule_unchanged = True
+        self.synchronizer.state = None
+
+        results = self.synchronizer.synchronize()
+
+        self.assertEqual([], results)
+        self.assertTrue(cancelled.is_set())
+        clients[0].add_events.assert_not_called()
+
+    def test_synchronize_lets_calendars_decide_on_unchanged_schedule_with_state(self, m_client_class):
+        clients = self.set_calendar_clients(m_client_class)
+        self.snook_app_client.schedule_unchanged = True
+
+        results = self.synchronizer.synchronize()
+
+        self.assertEqual([CalendarSyncResult(calendar_id="11"), CalendarSyncResult(calendar_id="22")], results)
+        clients[0].add_events.assert_awaited_once()
+
+    def test_synchronize_forgets_hash_of_changes_listed_before_schedule_failed(self, m_client_class):
+        clients = self.set_calendar_clients(m_client_class)
+        clients[0].listed_changes = 2
+
+        async def get_schedule(**_):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("SnookApp unavailable")
+        self.snook_app_client.get_schedule.side_effect = get_schedule
+
+        results = self.synchronizer.synchronize()
+
+        self.assertEqual(["11", "22"], [result.calendar_id for result in results])
+        self.state.set_schedule_hash.assert_called_once_with("11", '')
+        clients[0].add_events.assert_not_called()
+
+    def test_synchronize_cancels_listings_and_fails_calendars_of_source_whose_schedule_failed(self, m_client_class):
+        failing_snook_app_client = MagicMock()
+        failing_snook_app_client.get_schedule = AsyncMock(side_effect=RuntimeError("SnookApp unavailable"))
+        failing_snook_app_client.aclose = AsyncMock()
+        self.synchronizer.sources.append(ScheduleSource(
+            snook_app_client=failing_snook_app_client, calendars_config=[GoogleCalendarConfig(id="33", players=[])],
+        ))
+        clients = self.set_calendar_clients(m_client_class) + [get_calendar_client("33", [])]
+        m_client_class.side_effect = clients
+
+        results = self.synchronizer.synchronize()
+
+        self.assertEqual(["33", "11", "22"], [result.calendar_id for result in results])
+        self.assertIsInstance(results[0].error, RuntimeError)
+        clients[2].add_events.assert_not_called()
+        clients[0].add_events.assert_awaited_once()
+        self.snook_app_client.commit_cache.assert_called_once()
+        failing_snook_app_client.commit_cache.assert_not_called()
+        self.synchronizer.close()
+        failing_snook_app_client.aclose.assert_awaited_once()
+
+    def test_synchronize_raises_cancellation_of_schedule_and_cancels_listings(self, m_client_class):
+        clients = self.set_calendar_clients(m_client_class)
+        self.snook_app_client.get_schedule.side_effect = asyncio.CancelledError()
+
+        with self.assertRaises(asyncio.CancelledError):
+            self.synchronizer.synchronize()
+
+        self.state.set_schedule_hash.assert_not_called()
+        clients[0].add_events.assert_not_called()
+
+    def test_close_closes_clients_loop_and_state(self, _):
+        self.synchronizer.close()
+
+        self.snook_app_client.aclose.assert_awaited_once()
+        self.assertTrue(self.synchronizer.http.is_closed)
+        self.state.close.assert_called_once()
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from snookxporter.clients.google.calendar import GoogleCalendarConfig
+from snookxporter.clients.snookapp import SnookAppConfig
+from snookxporter.clubs import ClubConfig, ScheduleSource, merge_clubs
+from snookxporter.entities import Player
+
+MARTY = Player(first_name="Marty", last_name="McFly")
+EMMET = Player(first_name="Emmet", last_name="Brown")
+
+
+class MergeClubsTest(TestCase):
+    def setUp(self):
+        self.snook_app = SnookAppConfig(base_url="http://snook.app", bookings_endpoint="/bookings/1")
+
+    def test_merge_clubs_fetches_schedule_of_the_same_bookings_url_once_for_calendars_of_all_clubs(self):
+        shared = GoogleCalendarConfig(id="shared", players=[MARTY])
+        clubs = [
+            ClubConfig(name="first", snook_app=self.snook_app, calendars=[shared]),
+            ClubConfig(name="other", snook_app=SnookAppConfig(base_url="http://snook.app", bookings_endpoint="/2"),
+                       calendars=[GoogleCalendarConfig(id="other", players=[EMMET])]),
+            ClubConfig(name="second", snook_app=SnookAppConfig(
+                base_url="http://snook.app", bookings_endpoint="/bookings/1", chunk_days=7,
+            ), calendars=[
+                GoogleCalendarConfig(id="second", players=[EMMET]),
+                GoogleCalendarConfig(id="shared", players=[MARTY, EMMET]),
+            ]),
+        ]
+
+        with self.assertLogs("snookxporter.clubs", level="INFO") as logs:
+            merged = merge_clubs(clubs)
+
+        self.assertEqual([
+            ClubConfig(name="first, second", snook_app=self.snook_app, calendars=[
+                GoogleCalendarConfig(id="shared", players=[MARTY, EMMET]),
+                GoogleCalendarConfig(id="second", players=[EMMET]),
+            ]),
+            clubs[1],
+        ], merged)
+        self.assertEqual([MARTY], shared.players)
+        self.assertEqual(2, len(logs.output))
+        self.assertIn("SnookApp settings of club second differ from those of club first", logs.output[1])
+
+    def test_merge_clubs_rejects_calendar_synchronized_with_different_schedules(self):
+        clubs = [
+            ClubConfig(name="first", snook_app=self.snook_app, calendars=[GoogleCalendarConfig(id="11", players=[])]),
+            ClubConfig(name="second", snook_app=SnookAppConfig(base_url="http://snook.app", bookings_endpoint="/2"),
+                       calendars=[GoogleCalendarConfig(id="11", players=[])]),
+        ]
+
+        with self.assertRaises(ValueError):
+            merge_clubs(clubs)
+
+
+class ScheduleSourceTest(TestCase):
+
+    def test_calendars_hash_depends_on_calendars_and_aliases_of_their_players(self):
+        def get_hash(*calendars: GoogleCalendarConfig) -> str:
+            return ScheduleSource(snook_app_client=MagicMock(), calendars_config=list(calendars)).calendars_hash
+
+        calendar = GoogleCalendarConfig(id="11", players=[MARTY])
+
+        self.assertEqual(get_hash(calendar), get_hash(GoogleCalendarConfig(id="11", players=[MARTY])))
+        self.assertNotEqual(get_hash(calendar), get_hash(calendar, GoogleCalendarConfig(id="22", players=[EMMET])))
+        self.assertNotEqual(get_hash(calendar), get_hash(GoogleCalendarConfig(
+            id="11", players=[Player(first_name="Marty", last_name="McFly", alias="MM")],
+        )))
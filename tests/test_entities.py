@@ -3,7 +3,7 @@ from unittest import TestCase
 
 from parameterized import parameterized
 
-from snookxporter.entities import Match, Player
+from snookxporter.entities import Match, Player, get_player
 
 
 class PlayerTest(TestCase):
@@ -25,6 +25,17 @@ class PlayerTest(TestCase):
         self.assertEqual(p1, p2)
         self.assertEqual(p1, p3)
         self.assertEqual(p2, p3)
+        self.assertEqual(hash(p1), hash(p3))
+        self.assertNotEqual(p1, Player(first_name="Other", last_name="Player"))
+        self.assertNotEqual(p1, "The Same Player")
+
+    def test_get_player_returns_shared_instance_per_name_and_alias(self):
+        player = get_player(first_name="Marty", last_name="McFly", alias="MM")
+
+        self.assertIs(player, get_player(first_name="Marty", last_name="McFly", alias="MM"))
+        self.assertIsNot(player, get_player(first_name="Marty", last_name="McFly"))
+        self.assertEqual("MM", player.alias)
+        self.assertFalse(hasattr(player, '__dict__'))
 
 
 class MatchTest(TestCase):
@@ -95,6 +106,26 @@ class MatchTest(TestCase):
         self.assertEqual(match_with_item_id, match_without_item_id)
         self.assertSetEqual(set(), {match_with_item_id} - {match_without_item_id})
 
+    def test_matches_at_different_tables_are_not_equal(self):
+        other_table = Match(
+            host=self.match_scheduled.host,
+            guest=self.match_scheduled.guest,
+            start=self.match_scheduled.start,
+            end=self.match_scheduled.end,
+            table=2,
+        )
+
+        self.assertNotEqual(self.match_scheduled, other_table)
+        self.assertSetEqual({other_table}, {other_table} - {self.match_scheduled})
+        self.assertNotEqual(self.match_scheduled, "match")
+
+    def test_match_caches_key_and_content_hash(self):
+        key, content_hash = self.match_scheduled.get_key(), self.match_scheduled.get_content_hash()
+
+        self.assertIs(key, self.match_scheduled.get_key())
+        self.assertIs(content_hash, self.match_scheduled.get_content_hash())
+        self.assertFalse(hasattr(self.match_scheduled, '__dict__'))
+
     @parameterized.expand([
         (None, None, None, None, "Player One v Player Two"),
         ("P1", None, None, None, "P1 v Player Two"),
@@ -150,23 +181,45 @@ class MatchTest(TestCase):
             self.match_finished.get_match_calendar_description()
         )
 
-    def test_match_to_delete_from_calendar_returns_dummy_match_with_item_id(self):
-        to_delete_item_id = "to_delete_item_id"
-        dummy_player = Player(
-            first_name="Dummy",
-            last_name="Player",
+    def test_match_key_identifies_fixture_regardless_of_result_and_table(self):
+        rescheduled = Match(
+            host=self.match_scheduled.host,
+            guest=self.match_scheduled.guest,
+            start=self.match_scheduled.end,
+            end=self.match_scheduled.end,
         )
-        expected_dummy_match = Match(
-            host=dummy_player,
-            guest=dummy_player,
-            start=datetime.fromtimestamp(0),
-            end=datetime.fromtimestamp(0),
-            item_id=to_delete_item_id
+        finished = Match(
+            host=self.match_scheduled.host,
+            guest=self.match_scheduled.guest,
+            start=self.match_scheduled.start,
+            end=self.match_scheduled.end,
+            host_score=2,
+            guest_score=3,
+            table=3,
         )
 
-        dummy_match = Match.get_match_to_delete_from_calendar(item_id=to_delete_item_id)
+        self.assertEqual(self.match_scheduled.get_key(), finished.get_key())
+        self.assertNotEqual(self.match_scheduled.get_key(), rescheduled.get_key())
+
+    def test_match_content_hash_changes_with_calendar_content(self):
+        same = Match(
+            host=self.match_scheduled.host,
+            guest=self.match_scheduled.guest,
+            start=self.match_scheduled.start,
+            end=self.match_scheduled.end,
+            table=1,
+            item_id="item_id",
+        )
+        other_table = Match(
+            host=self.match_scheduled.host,
+            guest=self.match_scheduled.guest,
+            start=self.match_scheduled.start,
+            end=self.match_scheduled.end,
+            table=2,
+        )
 
-        self.assertEqual(expected_dummy_match, dummy_match)
+        self.assertEqual(self.match_scheduled.get_content_hash(), same.get_content_hash())
+        self.assertNotEqual(self.match_scheduled.get_content_hash(), other_table.get_content_hash())
 
     def test_match_post_init_removes_timezone_info_from_datetime_objects(self):
         fixed_now = datetime.now(tz=timezone.utc)
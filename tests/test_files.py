@@ -0,0 +1,21 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from snookxporter.files import write_atomically
+
+
+class WriteAtomicallyTest(TestCase):
+
+    def test_write_atomically_replaces_file_and_leaves_nothing_behind_after_failure(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.prom")
+            write_atomically(path, "first")
+            with patch("snookxporter.files.os.replace", side_effect=OSError):
+                with self.assertRaises(OSError):
+                    write_atomically(path, "second")
+
+            with open(path, encoding='utf8') as file:
+                self.assertEqual("first", file.read())
+            self.assertEqual(["metrics.prom"], os.listdir(directory))
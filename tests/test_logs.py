@@ -0,0 +1,89 @@
+import atexit
+import json
+import logging
+import os
+import shutil
+import tempfile
+from logging.handlers import QueueListener, RotatingFileHandler
+from unittest import TestCase
+
+from snookxporter.logs import BackgroundQueueHandler, JsonFormatter, LoggingConfig, configure_logging
+
+
+class ConfigureLoggingTest(TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.root_level = self.root.level
+        self.root_handlers = list(self.root.handlers)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def tearDown(self):
+        for handler in self.root.handlers:
+            if handler not in self.root_handlers:
+                self.root.removeHandler(handler)
+        self.root.setLevel(self.root_level)
+
+    def configure(self, **config) -> tuple[str, QueueListener]:
+        path = os.path.join(self.directory, "logs", "debug.log")
+        listener = configure_logging(LoggingConfig(file=path, **config))
+        logging.getLogger("snookxporter.test").info("Events to %s: %d", "add", 3, extra={'phase': 'add'})
+        listener.stop()
+        atexit.unregister(listener.stop)
+        for handler in listener.handlers:
+            handler.close()
+        return path, listener
+
+    def test_configure_logging_writes_text_lines_to_rotated_file_through_queue(self):
+        path, listener = self.configure(level='INFO', max_bytes=1024, backup_count=2)
+
+        with open(path, encoding='utf8') as log_file:
+            self.assertIn("INFO] - Events to add: 3", log_file.read())
+        file_handler = listener.handlers[0]
+        assert isinstance(file_handler, RotatingFileHandler)
+        self.assertEqual((1024, 2), (file_handler.maxBytes, file_handler.backupCount))
+        self.assertEqual(logging.INFO, self.root.level)
+        self.assertTrue(any(isinstance(handler, BackgroundQueueHandler) for handler in self.root.handlers))
+
+    def test_configure_logging_writes_json_lines_if_configured(self):
+        path, _ = self.configure(format='json')
+
+        with open(path, encoding='utf8') as log_file:
+            entry = json.loads(log_file.readline())
+        self.assertEqual("Events to add: 3", entry['message'])
+        self.assertEqual("add", entry['phase'])
+        self.assertEqual("snookxporter.test", entry['logger'])
+
+    def test_logging_config_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            LoggingConfig(format='xml')
+
+
+class BackgroundQueueHandlerTest(TestCase):
+
+    def test_prepare_leaves_formatting_to_listener(self):
+        items = [object()]
+        record = logging.makeLogRecord({'msg': "Events: %s", 'args': (items,)})
+
+        prepared = BackgroundQueueHandler(None).prepare(record)  # type: ignore[arg-type]
+
+        self.assertIs(record, prepared)
+        self.assertIs(items, prepared.args[0])
+
+
+class JsonFormatterTest(TestCase):
+
+    def test_format_includes_extra_fields_and_exception(self):
+        error = RuntimeError("calendar unavailable")
+        record = logging.getLogger("snookxporter").makeRecord(
+            "snookxporter", logging.ERROR, __file__, 1, "Calendar (%s) failed", ("11",),
+            exc_info=(RuntimeError, error, None), extra={'calendar_id': "11", 'phase': 'list'},
+        )
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual("Calendar (11) failed", entry['message'])
+        self.assertEqual("ERROR", entry['level'])
+        self.assertEqual("11", entry['calendar_id'])
+        self.assertEqual("list", entry['phase'])
+        self.assertIn("RuntimeError: calendar unavailable", entry['exception'])
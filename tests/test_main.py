@@ -1,40 +1,404 @@
+import os
+import pstats
+import signal
+import subprocess
+import sys
+import tempfile
 from unittest import TestCase
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import ANY, MagicMock, call, patch
 
 from click.testing import CliRunner
 
-from snookxporter.__main__ import run
-from snookxporter.clients.google.calendar import GoogleCalendarConfig
+from snookxporter.__main__ import cli, daemon, run
+from snookxporter.clients.google.calendar import GoogleCalendarConfig, OperationResult
+from snookxporter.clients.snookapp import SnookAppConfig
+from snookxporter.clubs import ClubConfig, ScheduleSource
+from snookxporter.sync import CalendarSyncResult, get_schedule_hash
+
+SNOOK_APP_CONFIG = SnookAppConfig(base_url="http://snook.app", bookings_endpoint="/bookings")
+
+
+def set_calendars_config(m_config_parser: MagicMock, calendars: list[GoogleCalendarConfig]) -> None:
+    m_config_parser.return_value.get_clubs_config.return_value = [
+        ClubConfig(name="club", snook_app=SNOOK_APP_CONFIG, calendars=calendars),
+    ]
 
 
 class MainTest(TestCase):
 
-    @patch('snookxporter.__main__.GoogleCalendarClient')
-    @patch('snookxporter.__main__.SnookAppClient')
-    @patch('snookxporter.__main__.ConfigParser')
+    def setUp(self):
+        patcher = patch('snookxporter.__main__.configure_logging')
+        self.m_configure_logging = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
     def test_run_executes_all_necessary_methods_with_args(
             self, m_config_parser, m_snook_app_client_class, m_google_calendar_client_class,
     ):
-        m_config_parser.return_value.get_calendars_config.return_value = [
+        set_calendars_config(m_config_parser, [
             GoogleCalendarConfig(id="11", players=[]),
             GoogleCalendarConfig(id="22", players=[]),
-        ]
-        m_snook_app_client_class.return_value = m_snook_app_client = MagicMock()
+        ])
+        m_snook_app_client_class.return_value = m_snook_app_client = MagicMock(schedule_unchanged=False)
+        m_snook_app_client.route_schedule.return_value = [[], []]
         m_first_calendar_client, m_second_calendar_client = MagicMock(), MagicMock()
+        m_first_calendar_client.add_events.return_value = [OperationResult(item=MagicMock())]
+        m_first_calendar_client.delete_events.return_value = []
+        m_first_calendar_client.update_events.return_value = []
+        m_second_calendar_client.update_events.return_value = []
+        m_second_calendar_client.add_events.return_value = []
+        m_second_calendar_client.delete_events.return_value = [OperationResult(item=MagicMock())]
         m_google_calendar_client_class.side_effect = [
             m_first_calendar_client, m_second_calendar_client
         ]
         runner = CliRunner()
 
-        runner.invoke(run, ["--past-days", "1", "--future-days", "2"])
+        result = runner.invoke(run, ["--past-days", "1", "--future-days", "2"])
 
+        self.assertEqual(0, result.exit_code)
         m_snook_app_client.get_schedule.assert_called_once_with(
-            past_days=1, future_days=2
+            past_days=1, future_days=2, fingerprint=ANY
         )
+        m_snook_app_client.commit_cache.assert_called_once()
         m_google_calendar_client_class.assert_has_calls([
-            call(config=GoogleCalendarConfig(id="11", players=[]), token={}),
-            call(config=GoogleCalendarConfig(id="22", players=[]), token={})
+            call(config=GoogleCalendarConfig(id="11", players=[]), credential_manager=ANY,
+                 include_unmarked_events=False, state=None,
+                 root_url=m_config_parser.return_value.get_calendar_root_url(), rate_limiter=ANY),
+            call(config=GoogleCalendarConfig(id="22", players=[]), credential_manager=ANY,
+                 include_unmarked_events=False, state=None,
+                 root_url=m_config_parser.return_value.get_calendar_root_url(), rate_limiter=ANY),
         ])
+        first_call, second_call = m_google_calendar_client_class.call_args_list
+        self.assertIs(first_call.kwargs['rate_limiter'], second_call.kwargs['rate_limiter'])
+        self.assertIs(first_call.kwargs['credential_manager'], second_call.kwargs['credential_manager'])
         m_first_calendar_client.get_events.assert_called_once_with(past_days=1, future_days=2)
         m_second_calendar_client.get_events.assert_called_once_with(past_days=1, future_days=2)
-        self.assertEqual(2, m_snook_app_client.extract_players_matches_from_schedule.call_count)
+        self.assertEqual(
+            [m_first_calendar_client.players, m_second_calendar_client.players],
+            m_snook_app_client.route_schedule.call_args.kwargs['calendars_players'],
+        )
+
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_synchronizes_other_calendars_and_fails_if_one_calendar_fails(
+            self, m_config_parser, m_snook_app_client_class, m_google_calendar_client_class,
+    ):
+        m_snook_app_client_class.return_value.schedule_unchanged = False
+        m_snook_app_client_class.return_value.route_schedule.return_value = [[], [], []]
+        set_calendars_config(m_config_parser, [
+            GoogleCalendarConfig(id=str(i), players=[]) for i in range(3)
+        ])
+        clients = [MagicMock(calendar_id=str(i)) for i in range(3)]
+        for client in clients:
+            client.add_events.return_value = client.update_events.return_value = client.delete_events.return_value = []
+        clients[1].get_events.side_effect = RuntimeError("calendar unavailable")
+        m_google_calendar_client_class.side_effect = clients
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--workers", "3"])
+
+        self.assertEqual(1, result.exit_code)
+        self.assertIn("Synchronization of some calendars failed", result.output)
+        for client in clients:
+            client.get_events.assert_called_once_with(past_days=1, future_days=90)
+        clients[0].add_events.assert_called_once()
+        clients[2].add_events.assert_called_once()
+        clients[1].add_events.assert_not_called()
+        m_snook_app_client_class.return_value.commit_cache.assert_not_called()
+
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.state.StateStore')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_passes_state_store_and_schedule_hash_to_calendar_sync(
+            self, m_config_parser, m_snook_app_client_class, m_google_calendar_client_class, m_state_store_class,
+            m_sync_calendar,
+    ):
+        set_calendars_config(m_config_parser, [GoogleCalendarConfig(id="11", players=[])])
+        m_snook_app_client_class.return_value.get_schedule.return_value = []
+        m_snook_app_client_class.return_value.schedule_unchanged = False
+        m_snook_app_client_class.return_value.route_schedule.return_value = [[]]
+        m_sync_calendar.return_value = CalendarSyncResult(calendar_id="11", unchanged=True)
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--state-file", "state.sqlite"])
+
+        self.assertEqual(0, result.exit_code)
+        m_state_store_class.assert_called_once_with("state.sqlite")
+        self.assertIs(m_state_store_class.return_value, m_google_calendar_client_class.call_args.kwargs['state'])
+        self.assertEqual(get_schedule_hash([]), m_sync_calendar.call_args.kwargs['schedule_hash'])
+        m_state_store_class.return_value.close.assert_called_once()
+
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_routes_streamed_schedule_if_requested(self, m_config_parser, m_snook_app_client_class, _):
+        set_calendars_config(m_config_parser, [])
+        m_snook_app_client = m_snook_app_client_class.return_value
+        m_snook_app_client.schedule_unchanged = False
+        m_snook_app_client.route_schedule.return_value = []
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--stream-schedule"])
+
+        self.assertEqual(0, result.exit_code)
+        m_snook_app_client.iter_schedule.assert_called_once_with(past_days=1, future_days=90, fingerprint=ANY)
+        m_snook_app_client.get_schedule.assert_not_called()
+        m_snook_app_client.route_schedule.assert_called_once()
+
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_does_nothing_if_schedule_is_unchanged(
+            self, m_config_parser, m_snook_app_client_class, m_google_calendar_client_class,
+    ):
+        set_calendars_config(m_config_parser, [GoogleCalendarConfig(id="11", players=[])])
+        m_snook_app_client_class.return_value.schedule_unchanged = True
+        runner = CliRunner()
+
+        result = runner.invoke(run, [])
+
+        self.assertEqual(0, result.exit_code)
+        m_google_calendar_client_class.assert_not_called()
+        m_snook_app_client_class.return_value.route_schedule.assert_not_called()
+
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_reads_configuration_file_given_by_option_or_environment(self, m_config_parser, *_):
+        set_calendars_config(m_config_parser, [])
+        runner = CliRunner()
+
+        with tempfile.TemporaryDirectory() as directory:
+            option_path, environment_path = (os.path.join(directory, name) for name in ("option.yaml", "env.yaml"))
+            for path in (option_path, environment_path):
+                with open(path, 'w', encoding='utf8'):
+                    pass
+            option_result = runner.invoke(
+                run, ["--config", option_path], env={'SNOOKXPORTER_CONFIG': os.path.join(directory, "missing.yaml")},
+            )
+            environment_result = runner.invoke(run, [], env={'SNOOKXPORTER_CONFIG': environment_path})
+
+        self.assertEqual(0, option_result.exit_code)
+        self.assertEqual(0, environment_result.exit_code)
+        self.assertEqual([call(option_path), call(environment_path)], m_config_parser.call_args_list)
+
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_synchronizes_unchanged_schedule_if_unmarked_events_included(
+            self, m_config_parser, m_snook_app_client_class, _,
+    ):
+        set_calendars_config(m_config_parser, [])
+        m_snook_app_client_class.return_value.schedule_unchanged = True
+        m_snook_app_client_class.return_value.route_schedule.return_value = []
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--include-unmarked-events"])
+
+        self.assertEqual(0, result.exit_code)
+        m_snook_app_client_class.return_value.route_schedule.assert_called_once()
+
+    @patch('snookxporter.state.StateStore')
+    @patch('snookxporter.async_sync.AsyncSynchronizer')
+    @patch('snookxporter.clients.async_snookapp.AsyncSnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_uses_async_engine_if_requested(
+            self, m_config_parser, m_snook_app_client_class, m_synchronizer_class, m_state_store_class,
+    ):
+        set_calendars_config(m_config_parser, [GoogleCalendarConfig(id="11", players=[])])
+        m_synchronizer_class.return_value.synchronize.return_value = [CalendarSyncResult(calendar_id="11")]
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--engine", "async", "--state-file", "state.sqlite", "--stream-schedule"])
+
+        self.assertEqual(0, result.exit_code)
+        m_snook_app_client_class.assert_called_once_with(config=SNOOK_APP_CONFIG)
+        m_synchronizer_class.assert_called_once_with(
+            sources=[ScheduleSource(snook_app_client=m_snook_app_client_class.return_value,
+                                    calendars_config=[GoogleCalendarConfig(id="11", players=[])])],
+            token={},
+            past_days=1,
+            future_days=90,
+            include_unmarked_events=False,
+            state=m_state_store_class.return_value,
+            calendar_root_url=m_config_parser.return_value.get_calendar_root_url(),
+            rate_limit=m_config_parser.return_value.get_rate_limit_config(),
+            record_spans=False,
+        )
+        m_synchronizer_class.return_value.close.assert_called_once()
+
+    @patch.dict('sys.modules', {'snookxporter.async_sync': None})
+    @patch('settings.config.ConfigParser')
+    def test_run_fails_with_async_engine_without_httpx(self, _):
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--engine", "async"])
+
+        self.assertEqual(1, result.exit_code)
+        self.assertIn("poetry install --extras async", result.output)
+
+    @patch('settings.config.ConfigParser')
+    def test_run_fails_with_calendar_configured_with_schedules_of_different_clubs(self, m_config_parser):
+        calendar = GoogleCalendarConfig(id="11", players=[])
+        m_config_parser.return_value.get_clubs_config.return_value = [
+            ClubConfig(name="club", snook_app=SNOOK_APP_CONFIG, calendars=[calendar]),
+            ClubConfig(name="other club", snook_app=SnookAppConfig(base_url="http://other.club", bookings_endpoint="/"),
+                       calendars=[calendar]),
+        ]
+        runner = CliRunner()
+
+        result = runner.invoke(run, [])
+
+        self.assertEqual(1, result.exit_code)
+        self.assertIn("Calendar (11) is configured with schedules of both", result.output)
+
+    def test_run_rejects_non_positive_workers(self):
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--workers", "0"])
+
+        self.assertEqual(2, result.exit_code)
+
+    @patch('snookxporter.sync.Synchronizer')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_cli_runs_single_synchronization_if_no_command_given(self, _, __, m_synchronizer_class):
+        m_synchronizer_class.return_value.synchronize.return_value = []
+        runner = CliRunner()
+
+        result = runner.invoke(cli, ["--past-days", "3"])
+
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual(3, m_synchronizer_class.call_args.kwargs['past_days'])
+        self.m_configure_logging.assert_called_once()
+        m_synchronizer_class.return_value.synchronize.assert_called_once()
+        m_synchronizer_class.return_value.close.assert_called_once()
+
+    @patch('snookxporter.sync.Synchronizer')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_writes_metrics_of_the_run_and_only_logs_failed_write(self, _, __, m_synchronizer_class):
+        m_synchronizer_class.return_value.synchronize.return_value = []
+        m_write = m_synchronizer_class.return_value.metrics.write
+        m_write.side_effect = [None, PermissionError("read-only")]
+        runner = CliRunner()
+
+        written = runner.invoke(run, ["--metrics-file", "snookxporter.prom", "--report-file", "report.json"])
+        with self.assertLogs("snookxporter.__main__", level="ERROR") as logs:
+            failed = runner.invoke(run, ["--metrics-file", "snookxporter.prom"])
+
+        self.assertEqual(0, written.exit_code)
+        self.assertEqual(0, failed.exit_code)
+        m_write.assert_any_call(metrics_file="snookxporter.prom", report_file="report.json", trace_file=None)
+        self.assertIn("Writing metrics failed", logs.output[0])
+        self.assertNotIn('metrics_file', m_synchronizer_class.call_args.kwargs)
+
+    @patch('snookxporter.sync.Synchronizer')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_writes_cprofile_dump_and_warns_about_concurrent_workers(self, _, __, m_synchronizer_class):
+        def synchronize():
+            return []
+        m_synchronizer_class.return_value.synchronize.side_effect = synchronize
+        runner = CliRunner()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.prof")
+            with self.assertLogs("snookxporter.__main__", level="WARNING") as logs:
+                result = runner.invoke(run, ["--profile", path, "--workers", "4"])
+            stats = pstats.Stats(path)
+
+        self.assertEqual(0, result.exit_code)
+        self.assertIn("synchronize", [function for _, _, function in stats.stats])  # type: ignore[attr-defined]
+        self.assertIn("--profile-format trace", logs.output[0])
+        self.assertFalse(m_synchronizer_class.call_args.kwargs['record_spans'])
+        m_synchronizer_class.return_value.metrics.write.assert_called_once_with(
+            metrics_file=None, report_file=None, trace_file=None,
+        )
+
+    @patch('snookxporter.__main__.profiled')
+    @patch('snookxporter.sync.Synchronizer')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_run_records_spans_into_chrome_trace(self, _, __, m_synchronizer_class, m_profiled):
+        m_synchronizer_class.return_value.synchronize.return_value = []
+        runner = CliRunner()
+
+        result = runner.invoke(run, ["--profile", "run.json", "--profile-format", "trace"])
+
+        self.assertEqual(0, result.exit_code)
+        self.assertTrue(m_synchronizer_class.call_args.kwargs['record_spans'])
+        m_profiled.assert_called_once_with(None)
+        m_synchronizer_class.return_value.metrics.write.assert_called_once_with(
+            metrics_file=None, report_file=None, trace_file="run.json",
+        )
+
+    def test_cli_starts_without_loading_heavy_modules(self):
+        imported = subprocess.run(
+            [sys.executable, "-c", "import sys; import snookxporter.__main__; print(' '.join(sys.modules))"],
+            capture_output=True, check=True, text=True,
+        ).stdout.split()
+
+        for module in ("googleapiclient", "google_auth_oauthlib", "google.oauth2", "yaml", "requests"):
+            self.assertNotIn(module, imported)
+
+    def test_cli_shows_help_of_commands(self):
+        runner = CliRunner()
+
+        result = runner.invoke(cli, ["--help"])
+
+        self.assertEqual(0, result.exit_code)
+        self.assertIn("daemon", result.output)
+
+
+class DaemonTest(TestCase):
+
+    def setUp(self):
+        patcher = patch('snookxporter.__main__.configure_logging')
+        self.m_configure_logging = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('snookxporter.sync.Synchronizer')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_daemon_runs_cycles_until_sigterm_and_survives_failed_cycles(self, _, __, m_synchronizer_class):
+        m_synchronizer = m_synchronizer_class.return_value
+        cycles = []
+
+        def synchronize():
+            cycles.append(len(cycles))
+            if len(cycles) == 1:
+                raise RuntimeError("SnookApp unavailable")
+            if len(cycles) == 3:
+                os.kill(os.getpid(), signal.SIGTERM)
+            return []
+
+        m_synchronizer.synchronize.side_effect = synchronize
+        previous_handler = signal.getsignal(signal.SIGTERM)
+        runner = CliRunner()
+
+        result = runner.invoke(daemon, ["--interval", "0", "--workers", "2"])
+
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual(3, m_synchronizer.synchronize.call_count)
+        self.assertEqual(3, m_synchronizer.metrics.write.call_count)
+        self.assertEqual(2, m_synchronizer_class.call_args.kwargs['workers'])
+        m_synchronizer_class.return_value.close.assert_called_once()
+        self.assertIs(previous_handler, signal.getsignal(signal.SIGTERM))
+
+    @patch('snookxporter.sync.Synchronizer')
+    @patch('snookxporter.clients.snookapp.SnookAppClient')
+    @patch('settings.config.ConfigParser')
+    def test_cli_invokes_daemon_command(self, _, __, m_synchronizer_class):
+        m_synchronizer_class.return_value.synchronize.side_effect = lambda: os.kill(os.getpid(), signal.SIGINT)
+        runner = CliRunner()
+
+        result = runner.invoke(cli, ["daemon", "--interval", "60"])
+
+        self.assertEqual(0, result.exit_code)
+        m_synchronizer_class.return_value.synchronize.assert_called_once()
@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from snookxporter.clients.google.rate_limit import RateLimiter
+from snookxporter.metrics import RunMetrics
+from snookxporter.sync import CalendarSyncResult
+
+RESULTS = [
+    CalendarSyncResult(calendar_id="11", added=2, removed=1),
+    CalendarSyncResult(calendar_id="22", unchanged=True),
+    CalendarSyncResult(calendar_id="33", error=RuntimeError("forbidden")),
+]
+
+
+@patch("snookxporter.metrics.time")
+class RunMetricsTest(TestCase):
+
+    def get_finished_metrics(self, m_time) -> RunMetrics:
+        m_time.time.return_value = 500_000_000.0
+        m_time.perf_counter.return_value = 10.0
+        rate_limiter = RateLimiter()
+        rate_limiter.calls, rate_limiter.retries = 10, 1
+        metrics = RunMetrics(rate_limiter)
+        with metrics.measure('fetch', source='http://snook.app/"club"'):
+            m_time.perf_counter.return_value = 10.5
+        with metrics.measure('list', calendar="11"):
+            m_time.perf_counter.return_value = 10.75
+        m_time.perf_counter.return_value = 12.0
+        rate_limiter.calls, rate_limiter.retries = 16, 2
+        metrics.finish(RESULTS, [MagicMock(received_bytes=2048, config=MagicMock(url='http://snook.app/"club"'))])
+        return metrics
+
+    def test_measure_adds_durations_of_blocks_even_if_they_raise(self, m_time):
+        m_time.perf_counter.side_effect = [0.0, 1.0, 1.5, 2.0, 2.25]
+        metrics = RunMetrics()
+
+        with metrics.measure('add', calendar="11"):
+            pass
+        with self.assertRaises(RuntimeError):
+            with metrics.measure('add', calendar="11"):
+                raise RuntimeError()
+
+        self.assertIn(('phase_duration_seconds', {'calendar': "11", 'phase': 'add'}, 0.75), metrics.get_samples())
+        self.assertIsNone(metrics.spans)
+
+    def test_to_prometheus_formats_samples_of_the_run_in_textfile_format(self, m_time):
+        metrics = self.get_finished_metrics(m_time)
+
+        self.assertEqual(
+            '# HELP snookxporter_run_succeeded Whether every calendar of the last run was synchronized.\n'
+            '# TYPE snookxporter_run_succeeded gauge\n'
+            'snookxporter_run_succeeded 0\n'
+            '# HELP snookxporter_run_timestamp_seconds Unix time the last run ended at.\n'
+            '# TYPE snookxporter_run_timestamp_seconds gauge\n'
+            'snookxporter_run_timestamp_seconds 500000002.0\n'
+            '# HELP snookxporter_run_duration_seconds Duration of the last run.\n'
+            '# TYPE snookxporter_run_duration_seconds gauge\n'
+            'snookxporter_run_duration_seconds 2.0\n'
+            '# HELP snookxporter_phase_duration_seconds Seconds spent in a phase of the last run, '
+            'per source or calendar.\n'
+            '# TYPE snookxporter_phase_duration_seconds gauge\n'
+            'snookxporter_phase_duration_seconds{calendar="11",phase="list"} 0.25\n'
+            'snookxporter_phase_duration_seconds{phase="fetch",source="http://snook.app/\\"club\\""} 0.5\n'
+            '# HELP snookxporter_calendars Calendars of the last run by status.\n'
+            '# TYPE snookxporter_calendars gauge\n'
+            'snookxporter_calendars{status="failed"} 1\n'
+            'snookxporter_calendars{status="synchronized"} 1\n'
+            'snookxporter_calendars{status="unchanged"} 1\n'
+            '# HELP snookxporter_events Calendar events of the last run by operation.\n'
+            '# TYPE snookxporter_events gauge\n'
+            'snookxporter_events{operation="added"} 2\n'
+            'snookxporter_events{operation="failed"} 0\n'
+            'snookxporter_events{operation="removed"} 1\n'
+            'snookxporter_events{operation="updated"} 0\n'
+            '# HELP snookxporter_calendar_api_calls Calendar API calls of the last run, '
+            'counting every request of a batch and every attempt.\n'
+            '# TYPE snookxporter_calendar_api_calls gauge\n'
+            'snookxporter_calendar_api_calls 6\n'
+            '# HELP snookxporter_calendar_api_retries Calendar API requests of the last run retried after '
+            'rate-limit or server errors.\n'
+            '# TYPE snookxporter_calendar_api_retries gauge\n'
+            'snookxporter_calendar_api_retries 1\n'
+            '# HELP snookxporter_snookapp_received_bytes Bytes of SnookApp responses of the last run as received, '
+            'before decompression.\n'
+            '# TYPE snookxporter_snookapp_received_bytes gauge\n'
+            'snookxporter_snookapp_received_bytes{source="http://snook.app/\\"club\\""} 2048\n',
+            metrics.to_prometheus(),
+        )
+
+    def test_to_report_contains_results_and_samples_of_the_run(self, m_time):
+        report = self.get_finished_metrics(m_time).to_report()
+
+        self.assertEqual("1985-11-05T00:53:20.000+00:00", report['started'])
+        self.assertEqual(2.0, report['duration_seconds'])
+        self.assertFalse(report['succeeded'])
+        self.assertEqual(
+            {'calendar_id': "33", 'status': 'failed', 'added': 0, 'updated': 0, 'removed': 0, 'failed': 0,
+             'error': "RuntimeError('forbidden')"},
+            report['calendars'][2],
+        )
+        self.assertIn({'name': 'calendar_api_calls', 'labels': {}, 'value': 6}, report['metrics'])
+
+    @patch("snookxporter.metrics.os.getpid", return_value=42)
+    def test_to_chrome_trace_puts_spans_of_every_source_and_calendar_on_its_own_track(self, _, m_time):
+        m_time.perf_counter.return_value = 10.0
+        metrics = RunMetrics(record_spans=True)
+        with metrics.measure('fetch', source="http://snook.app"):
+            m_time.perf_counter.return_value = 10.5
+        with metrics.measure('list', calendar="11"):
+            m_time.perf_counter.return_value = 10.75
+        with metrics.measure('add', calendar="11"):
+            m_time.perf_counter.return_value = 11.0
+        metrics.finish([], [])
+
+        events = metrics.to_chrome_trace()['traceEvents']
+
+        self.assertEqual(
+            [('run', 0, 0, 1_000_000.0), ('fetch', 1, 0.0, 500_000.0), ('list', 2, 500_000.0, 250_000.0),
+             ('add', 2, 750_000.0, 250_000.0)],
+            [(event['name'], event['tid'], event['ts'], event['dur']) for event in events if event['ph'] == 'X'],
+        )
+        self.assertEqual(
+            {'name': 'list', 'cat': 'calendar', 'ph': 'X', 'ts': 500_000.0, 'dur': 250_000.0, 'pid': 42, 'tid': 2,
+             'args': {'calendar': "11", 'thread': "MainThread"}},
+            events[2],
+        )
+        self.assertEqual(
+            ["run", "http://snook.app", "11"], [event['args']['name'] for event in events if event['ph'] == 'M'],
+        )
+
+    def test_unfinished_or_failed_run_did_not_succeed(self, m_time):
+        m_time.time.return_value = 100.0
+        m_time.perf_counter.return_value = 1.0
+        metrics = RunMetrics()
+
+        unfinished = metrics.get_samples()
+        metrics.finish(None, [])
+
+        self.assertEqual([('run_succeeded', {}, 0), ('run_timestamp_seconds', {}, 100.0)], unfinished)
+        self.assertFalse(metrics.succeeded)
+        self.assertEqual([], metrics.to_report()['calendars'])
+
+    def test_write_writes_requested_files_only(self, m_time):
+        metrics = self.get_finished_metrics(m_time)
+
+        with tempfile.TemporaryDirectory() as directory:
+            metrics.write(report_file=os.path.join(directory, "report.json"))
+            metrics.write(metrics_file=os.path.join(directory, "snookxporter.prom"))
+            metrics.write(trace_file=os.path.join(directory, "trace.json"))
+
+            with open(os.path.join(directory, "report.json"), encoding='utf8') as file:
+                report = json.load(file)
+            with open(os.path.join(directory, "snookxporter.prom"), encoding='utf8') as file:
+                textfile = file.read()
+            with open(os.path.join(directory, "trace.json"), encoding='utf8') as file:
+                trace = json.load(file)
+
+        self.assertEqual(metrics.to_report(), report)
+        self.assertEqual(metrics.to_prometheus(), textfile)
+        self.assertEqual(metrics.to_chrome_trace(), trace)
@@ -0,0 +1,65 @@
+import json
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from snookxporter.parsing import ISO_DATETIME_FORMAT, ISO_DATETIME_FORMAT_WITH_TIMEZONE, loads, parse_datetime
+
+
+class ParseDatetimeTest(TestCase):
+
+    @parameterized.expand([
+        ("2024-12-01T12:00:00", ISO_DATETIME_FORMAT),
+        ("2024-1-1T1:2:3", ISO_DATETIME_FORMAT),
+        ("2024-12-01T12:00:00Z", ISO_DATETIME_FORMAT_WITH_TIMEZONE),
+        ("2024-12-01T12:00:00+01:00", ISO_DATETIME_FORMAT_WITH_TIMEZONE),
+        ("2024-12-01T12:00:00-05:30", ISO_DATETIME_FORMAT_WITH_TIMEZONE),
+        ("2024-12-01T12:00:00+0100", ISO_DATETIME_FORMAT_WITH_TIMEZONE),
+        ("2024-12-01 12:00:00", "%Y-%m-%d %H:%M:%S"),
+        ("2024-12-01T12:00:00.123456Z", "%Y-%m-%dT%H:%M:%S.%fZ"),
+    ])
+    def test_parse_datetime_returns_the_same_as_strptime(self, value, date_format):
+        parsed = parse_datetime(value, date_format)
+
+        self.assertEqual(datetime.strptime(value, date_format), parsed)
+        self.assertEqual(datetime.strptime(value, date_format).tzinfo, parsed.tzinfo)
+
+    @parameterized.expand([
+        ("2024-12-01T12:00:00+01:00", ISO_DATETIME_FORMAT),
+        ("2024-12-01T12:00:00", ISO_DATETIME_FORMAT_WITH_TIMEZONE),
+        ("2024-13-01T12:00:00", ISO_DATETIME_FORMAT),
+        ("2024-12-01T12:00+01", ISO_DATETIME_FORMAT),
+        ("2024-12-01T1a:00:00", ISO_DATETIME_FORMAT),
+    ])
+    def test_parse_datetime_rejects_what_strptime_rejects(self, value, date_format):
+        with self.assertRaises(ValueError):
+            datetime.strptime(value, date_format)
+        with self.assertRaises(ValueError):
+            parse_datetime(value, date_format)
+
+    def test_parse_datetime_caches_repeated_timestamps(self):
+        parse_datetime.cache_clear()
+
+        first = parse_datetime("1955-11-05T16:30:00", ISO_DATETIME_FORMAT)
+
+        self.assertIs(first, parse_datetime("1955-11-05T16:30:00", ISO_DATETIME_FORMAT))
+        # pylint cannot infer methods of the lru_cache wrapper and takes cache_info for parse_datetime itself
+        self.assertEqual(1, parse_datetime.cache_info().hits)  # pylint: disable=no-value-for-parameter
+
+
+class LoadsTest(TestCase):
+    document = b'{"bookings": {"days": {"SNOOKER": [{"date": "1955-11-05", "courts": [1, 2.5, null, true]}]}}}'
+
+    def test_loads_decodes_the_same_as_json(self):
+        self.assertEqual(json.loads(self.document), loads(self.document))
+        self.assertEqual(json.loads(self.document), loads(self.document.decode()))
+
+    @patch('snookxporter.parsing.orjson', None)
+    def test_loads_falls_back_to_json_without_orjson(self):
+        self.assertEqual(json.loads(self.document), loads(self.document))
+
+    def test_loads_raises_json_decode_error_on_invalid_document(self):
+        with self.assertRaises(json.JSONDecodeError):
+            loads(b"<html>")
@@ -0,0 +1,39 @@
+import os
+import pstats
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from snookxporter.profiling import profiled
+
+
+def work() -> int:
+    return sum(range(10))
+
+
+class ProfiledTest(TestCase):
+
+    def test_profiled_dumps_stats_of_the_block(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.prof")
+            with self.assertLogs("snookxporter.profiling", level="INFO"):
+                with profiled(path):
+                    work()
+            stats = pstats.Stats(path)
+
+        self.assertIn("work", [function for _, _, function in stats.stats])  # type: ignore[attr-defined]
+
+    @patch("snookxporter.profiling.cProfile")
+    def test_profiled_does_not_profile_without_path(self, m_cprofile):
+        with profiled(None):
+            work()
+
+        m_cprofile.Profile.assert_not_called()
+
+    def test_profiled_logs_failed_dump_and_raises_errors_of_the_block(self):
+        with self.assertLogs("snookxporter.profiling", level="ERROR") as logs:
+            with self.assertRaises(RuntimeError):
+                with profiled(os.path.join("missing", "directory", "run.prof")):
+                    raise RuntimeError()
+
+        self.assertIn("Writing the profile failed", logs.output[0])
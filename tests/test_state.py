@@ -0,0 +1,67 @@
+import threading
+from datetime import datetime
+from unittest import TestCase
+
+from snookxporter.entities import CalendarEvent
+from snookxporter.state import StateStore
+
+
+class StateStoreTest(TestCase):
+    def setUp(self):
+        self.state = StateStore(":memory:")
+        self.first = CalendarEvent(item_id="first", key="key_1", content_hash="hash_1", start=datetime(2024, 11, 5, 21))
+        self.second = CalendarEvent(item_id="second")
+
+    def tearDown(self):
+        self.state.close()
+
+    def test_state_store_returns_nothing_for_unknown_calendar(self):
+        self.assertIsNone(self.state.get_sync_token("calendar"))
+        self.assertListEqual([], self.state.get_events("calendar"))
+
+    def test_update_events_stores_events_and_sync_token_per_calendar(self):
+        self.state.update_events("calendar", sync_token="token", changed=[self.first, self.second], deleted_ids=[])
+
+        self.assertEqual("token", self.state.get_sync_token("calendar"))
+        self.assertListEqual([self.second, self.first], self.state.get_events("calendar"))
+        self.assertIsNone(self.state.get_sync_token("other_calendar"))
+
+    def test_update_events_applies_changes_and_deletions(self):
+        self.state.update_events("calendar", sync_token="token", changed=[self.first, self.second], deleted_ids=[])
+        changed_first = CalendarEvent(item_id="first", key="key_1", content_hash="hash_2")
+
+        self.state.update_events("calendar", sync_token="next", changed=[changed_first], deleted_ids=["second"])
+
+        self.assertEqual("next", self.state.get_sync_token("calendar"))
+        self.assertListEqual([changed_first], self.state.get_events("calendar"))
+
+    def test_update_events_with_replace_drops_previous_events(self):
+        self.state.update_events("calendar", sync_token="token", changed=[self.first], deleted_ids=[])
+
+        self.state.update_events("calendar", sync_token="new", changed=[self.second], deleted_ids=[], replace=True)
+
+        self.assertListEqual([self.second], self.state.get_events("calendar"))
+
+    def test_state_store_can_be_used_from_other_threads(self):
+        thread = threading.Thread(target=lambda: self.state.update_events(
+            "calendar", sync_token="token", changed=[self.first], deleted_ids=[]
+        ))
+        thread.start()
+        thread.join()
+
+        self.assertListEqual([self.first], self.state.get_events("calendar"))
+
+    def test_record_written_events_keeps_sync_token(self):
+        self.state.update_events("calendar", sync_token="token", changed=[self.first], deleted_ids=[])
+
+        self.state.record_written_events("calendar", written=[self.second], deleted_ids=["first"])
+
+        self.assertEqual("token", self.state.get_sync_token("calendar"))
+        self.assertListEqual([self.second], self.state.get_events("calendar"))
+
+    def test_schedule_hash_is_stored_per_calendar(self):
+        self.state.set_schedule_hash("calendar", "hash")
+        self.state.set_schedule_hash("calendar", "new_hash")
+
+        self.assertEqual("new_hash", self.state.get_schedule_hash("calendar"))
+        self.assertIsNone(self.state.get_schedule_hash("other_calendar"))
@@ -0,0 +1,450 @@
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import responses
+from freezegun import freeze_time
+
+from snookxporter.clients.google.calendar import GoogleCalendarConfig, OperationResult
+from snookxporter.clients.snookapp import SnookAppClient, SnookAppConfig
+from snookxporter.clubs import ScheduleSource
+from snookxporter.entities import CalendarEvent, Match, Player
+from snookxporter.sync import (CalendarSyncResult, ScheduleDigest, Synchronizer, get_calendar_schedule_hash,
+                               get_differences, get_schedule_hash, log_summary, sync_calendar)
+
+
+class SyncCalendarTest(TestCase):
+    def setUp(self):
+        self.kept = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Emmet", last_name="Brown"),
+            start=datetime(1955, 11, 4, 6, 30),
+            end=datetime(1955, 11, 4, 7, 30),
+            table=1,
+        )
+        self.new = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Biff", last_name="Tannen"),
+            start=datetime(1955, 11, 5, 16, 30),
+            end=datetime(1955, 11, 5, 20, 0),
+            table=1,
+        )
+        self.kept_event = CalendarEvent(
+            item_id="kept", key=self.kept.get_key(), content_hash=self.kept.get_content_hash()
+        )
+        self.stale = CalendarEvent(item_id="stale")
+        self.calendar_client = MagicMock(calendar_id="id@google.com", state=None)
+        self.calendar_client.update_events.return_value = []
+        self.calendar_client.get_events.return_value = [self.kept_event, self.stale]
+
+    def test_sync_calendar_adds_missing_and_deletes_stale_events(self):
+        self.calendar_client.add_events.return_value = [OperationResult(item=self.new)]
+        self.calendar_client.delete_events.return_value = [OperationResult(item=self.stale)]
+
+        result = sync_calendar(
+            calendar_client=self.calendar_client, matches=[self.kept, self.new], past_days=1, future_days=2,
+        )
+
+        self.calendar_client.get_events.assert_called_once_with(past_days=1, future_days=2)
+        self.calendar_client.add_events.assert_called_once_with([self.new])
+        self.calendar_client.update_events.assert_called_once_with([])
+        self.calendar_client.delete_events.assert_called_once_with([self.stale])
+        self.assertEqual(CalendarSyncResult(calendar_id="id@google.com", added=1, removed=1), result)
+        self.assertTrue(result.succeeded)
+
+    def test_sync_calendar_counts_failed_operations(self):
+        self.calendar_client.add_events.return_value = [OperationResult(item=self.new, error=RuntimeError())]
+        self.calendar_client.delete_events.return_value = [OperationResult(item=self.stale)]
+
+        result = sync_calendar(
+            calendar_client=self.calendar_client, matches=[self.kept, self.new], past_days=1, future_days=2,
+        )
+
+        self.assertEqual(CalendarSyncResult(calendar_id="id@google.com", added=0, removed=1, failed=1), result)
+        self.assertFalse(result.succeeded)
+
+    def test_sync_calendar_catches_errors(self):
+        error = RuntimeError("calendar unavailable")
+        self.calendar_client.get_events.side_effect = error
+
+        result = sync_calendar(
+            calendar_client=self.calendar_client, matches=[self.kept, self.new], past_days=1, future_days=2,
+        )
+
+        self.assertIs(error, result.error)
+        self.assertFalse(result.succeeded)
+        self.calendar_client.add_events.assert_not_called()
+
+    def test_sync_calendar_skips_unchanged_calendar_and_schedule(self):
+        self.calendar_client.state = state = MagicMock()
+        self.calendar_client.listed_changes = 0
+        state.get_schedule_hash.return_value = get_calendar_schedule_hash("schedule_hash", self.calendar_client.players)
+
+        result = sync_calendar(
+            calendar_client=self.calendar_client, matches=[self.kept, self.new], past_days=1, future_days=2,
+            schedule_hash="schedule_hash",
+        )
+
+        self.assertEqual(CalendarSyncResult(calendar_id="id@google.com", unchanged=True), result)
+        self.calendar_client.add_events.assert_not_called()
+        self.calendar_client.delete_events.assert_not_called()
+
+    def test_sync_calendar_stores_schedule_hash_after_successful_sync_of_changed_calendar(self):
+        self.calendar_client.state = state = MagicMock()
+        self.calendar_client.listed_changes = 1
+        self.calendar_client.add_events.return_value = self.calendar_client.delete_events.return_value = []
+        expected_hash = get_calendar_schedule_hash("schedule_hash", self.calendar_client.players)
+        state.get_schedule_hash.return_value = expected_hash
+
+        result = sync_calendar(
+            calendar_client=self.calendar_client, matches=[self.kept, self.new], past_days=1, future_days=2,
+            schedule_hash="schedule_hash",
+        )
+
+        self.assertFalse(result.unchanged)
+        self.calendar_client.add_events.assert_called_once()
+        state.set_schedule_hash.assert_called_once_with("id@google.com", expected_hash)
+
+    def test_sync_calendar_does_not_store_schedule_hash_after_failed_operations(self):
+        self.calendar_client.state = state = MagicMock()
+        self.calendar_client.listed_changes = 0
+        state.get_schedule_hash.return_value = None
+        self.calendar_client.add_events.return_value = [OperationResult(item=self.new, error=RuntimeError())]
+        self.calendar_client.delete_events.return_value = []
+
+        result = sync_calendar(
+            calendar_client=self.calendar_client, matches=[self.kept, self.new], past_days=1, future_days=2,
+            schedule_hash="schedule_hash",
+        )
+
+        self.assertEqual(1, result.failed)
+        state.set_schedule_hash.assert_not_called()
+
+
+class SynchronizerTest(TestCase):
+    def setUp(self):
+        self.snook_app_client = MagicMock(schedule_unchanged=False)
+        self.snook_app_client.get_schedule.return_value = [{'date': "1955-11-05"}]
+        self.snook_app_client.route_schedule.side_effect = self.route_schedule
+        self.state = MagicMock()
+        self.other_snook_app_client = MagicMock(schedule_unchanged=False)
+        self.other_snook_app_client.get_schedule.return_value = [{'date': "1955-11-12"}]
+        self.other_snook_app_client.route_schedule.side_effect = self.route_schedule
+        self.synchronizer = Synchronizer(
+            sources=[ScheduleSource(snook_app_client=self.snook_app_client,
+                                    calendars_config=[GoogleCalendarConfig(id="11", players=[])])],
+            token={},
+            past_days=1,
+            future_days=2,
+            state=self.state,
+        )
+
+    @staticmethod
+    def route_schedule(schedule, calendars_players):
+        list(schedule)
+        return [[] for _ in calendars_players]
+
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_reuses_calendar_clients_and_skips_schedule_synchronized_by_previous_cycle(
+            self, m_google_calendar_client_class, m_sync_calendar,
+    ):
+        m_sync_calendar.return_value = CalendarSyncResult(calendar_id="11")
+        self.synchronizer.state = None
+
+        first = self.synchronizer.synchronize()
+        second = self.synchronizer.synchronize()
+        self.snook_app_client.get_schedule.return_value = [{'date': "1955-11-12"}]
+        third = self.synchronizer.synchronize()
+
+        self.assertEqual([CalendarSyncResult(calendar_id="11")], first)
+        self.assertEqual([], second)
+        self.assertEqual([CalendarSyncResult(calendar_id="11")], third)
+        m_google_calendar_client_class.assert_called_once()
+        self.assertEqual(2, m_sync_calendar.call_count)
+        self.assertEqual(2, self.snook_app_client.commit_cache.call_count)
+
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_lets_calendars_decide_on_unchanged_schedule_with_state(self, _, m_sync_calendar):
+        m_sync_calendar.return_value = CalendarSyncResult(calendar_id="11", unchanged=True)
+
+        first = self.synchronizer.synchronize()
+        self.snook_app_client.schedule_unchanged = True
+        second = self.synchronizer.synchronize()
+
+        self.assertEqual(first, second)
+        self.assertEqual(2, m_sync_calendar.call_count)
+        self.assertEqual(m_sync_calendar.call_args_list[0].kwargs['schedule_hash'],
+                         m_sync_calendar.call_args_list[1].kwargs['schedule_hash'])
+
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_retries_schedule_of_failed_cycle(self, _, m_sync_calendar):
+        m_sync_calendar.side_effect = [
+            CalendarSyncResult(calendar_id="11", failed=1), CalendarSyncResult(calendar_id="11"),
+        ]
+
+        first = self.synchronizer.synchronize()
+        second = self.synchronizer.synchronize()
+
+        self.assertFalse(first[0].succeeded)
+        self.assertTrue(second[0].succeeded)
+        self.snook_app_client.commit_cache.assert_called_once()
+
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_skips_sources_with_unchanged_schedule_and_fails_calendars_of_failed_sources_only(
+            self, m_google_calendar_client_class, m_sync_calendar,
+    ):
+        failing_snook_app_client = MagicMock()
+        failing_snook_app_client.get_schedule.side_effect = RuntimeError("SnookApp unavailable")
+        self.synchronizer.sources += [
+            ScheduleSource(snook_app_client=self.other_snook_app_client, calendars_config=[
+                GoogleCalendarConfig(id="22", players=[]), GoogleCalendarConfig(id="33", players=[]),
+            ]),
+            ScheduleSource(snook_app_client=failing_snook_app_client,
+                           calendars_config=[GoogleCalendarConfig(id="44", players=[])]),
+        ]
+        self.synchronizer.state = None
+        m_google_calendar_client_class.side_effect = lambda config, **_: MagicMock(calendar_id=config.id)
+        m_sync_calendar.side_effect = lambda calendar_client, **_: CalendarSyncResult(
+            calendar_id=calendar_client.calendar_id, failed=calendar_client.calendar_id == "33",
+        )
+
+        first = self.synchronizer.synchronize()
+        self.other_snook_app_client.get_schedule.return_value = [{'date': "1955-11-19"}]
+        second = self.synchronizer.synchronize()
+
+        self.assertEqual(["44", "11", "22", "33"], [result.calendar_id for result in first])
+        self.assertIsInstance(first[0].error, RuntimeError)
+        self.assertEqual(["44", "22", "33"], [result.calendar_id for result in second])
+        self.assertEqual(4, m_google_calendar_client_class.call_count)
+        self.assertIs(m_google_calendar_client_class.call_args_list[0].kwargs['rate_limiter'],
+                      m_google_calendar_client_class.call_args_list[3].kwargs['rate_limiter'])
+        self.snook_app_client.commit_cache.assert_called_once()
+        self.other_snook_app_client.commit_cache.assert_not_called()
+        failing_snook_app_client.commit_cache.assert_not_called()
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_synchronizes_calendar_added_since_the_schedule_was_cached(
+            self, m_google_calendar_client_class, m_sync_calendar,
+    ):
+        responses.get(url="http://snook.app/api?from=1955-11-04&to=1955-11-07",
+                      json={'bookings': {'days': {'SNOOKER': []}}}, headers={'ETag': '"v1"'})
+        m_google_calendar_client_class.side_effect = lambda config, **_: MagicMock(calendar_id=config.id, players=[])
+        m_sync_calendar.side_effect = lambda calendar_client, **_: CalendarSyncResult(
+            calendar_id=calendar_client.calendar_id
+        )
+
+        def run(*calendar_ids: str) -> list[CalendarSyncResult]:
+            snook_app_client = SnookAppClient(SnookAppConfig(
+                base_url="http://snook.app", bookings_endpoint="/api", cache_dir=cache_dir,
+            ))
+            synchronizer = Synchronizer(
+                sources=[ScheduleSource(snook_app_client=snook_app_client, calendars_config=[
+                    GoogleCalendarConfig(id=calendar_id, players=[]) for calendar_id in calendar_ids
+                ])],
+                token={},
+                past_days=1,
+                future_days=2,
+            )
+            try:
+                return synchronizer.synchronize()
+            finally:
+                synchronizer.close()
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = run("11")
+            second = run("11", "22")
+            third = run("11", "22")
+
+        self.assertEqual(["11"], [result.calendar_id for result in first])
+        self.assertEqual(["11", "22"], [result.calendar_id for result in second])
+        self.assertEqual([], third)
+
+    @responses.activate
+    @freeze_time("1955-11-05")
+    @patch('snookxporter.clients.snookapp.ijson', None)
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_skips_streamed_schedule_only_once_it_is_fetched_unchanged(
+            self, m_google_calendar_client_class, m_sync_calendar,
+    ):
+        for day in ["1955-11-05", "1955-11-05", "1955-11-06"]:
+            responses.get(url="http://snook.app/api?from=1955-11-04&to=1955-11-07",
+                          json={'bookings': {'days': {'SNOOKER': [{'date': day, 'matchCourts': []}]}}})
+        m_google_calendar_client_class.return_value = MagicMock(calendar_id="11", players=[])
+        m_sync_calendar.return_value = CalendarSyncResult(calendar_id="11")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            synchronizer = Synchronizer(
+                sources=[ScheduleSource(
+                    snook_app_client=SnookAppClient(SnookAppConfig(
+                        base_url="http://snook.app", bookings_endpoint="/api", cache_dir=cache_dir,
+                    )),
+                    calendars_config=[GoogleCalendarConfig(id="11", players=[])],
+                )],
+                token={},
+                past_days=1,
+                future_days=2,
+                stream_schedule=True,
+            )
+            try:
+                cycles = [synchronizer.synchronize() for _ in range(3)]
+            finally:
+                synchronizer.close()
+
+        self.assertEqual([[CalendarSyncResult(calendar_id="11")], [], [CalendarSyncResult(calendar_id="11")]], cycles)
+        self.assertEqual(3, len(responses.calls))
+
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_collects_metrics_of_the_cycle(self, m_google_calendar_client_class):
+        self.snook_app_client.configure_mock(received_bytes=2048, processed_bookings=3)
+        self.snook_app_client.config.url = "http://snook.app/bookings"
+        calendar_client = m_google_calendar_client_class.return_value
+        calendar_client.configure_mock(calendar_id="11", players=[], state=None)
+        calendar_client.add_events.return_value = [OperationResult(item=MagicMock())]
+        calendar_client.update_events.return_value = calendar_client.delete_events.return_value = []
+
+        def get_events(**_):
+            self.synchronizer.rate_limiter.calls += 2
+            return []
+        calendar_client.get_events.side_effect = get_events
+        self.synchronizer.rate_limiter.calls = 5
+        self.synchronizer.record_spans = True
+
+        self.synchronizer.synchronize()
+
+        metrics = self.synchronizer.metrics
+        samples = {(name, tuple(labels.values())): value for name, labels, value in metrics.get_samples()}
+        self.assertTrue(metrics.succeeded)
+        self.assertEqual(2, samples[('calendar_api_calls', ())])
+        self.assertEqual(2048, samples[('snookapp_received_bytes', ("http://snook.app/bookings",))])
+        self.assertEqual(3, samples[('processed_bookings', ("http://snook.app/bookings",))])
+        self.assertEqual(1, samples[('events', ('added',))])
+        self.assertEqual(
+            {'fetch', 'extract', 'list', 'diff', 'add', 'update', 'remove'},
+            {labels['phase'] for name, labels, _ in metrics.get_samples() if name == 'phase_duration_seconds'},
+        )
+        self.assertEqual(['fetch', 'extract', 'list', 'diff', 'add', 'update', 'remove'],
+                         [span.phase for span in metrics.spans])
+
+    @patch('snookxporter.sync.sync_calendar')
+    @patch('snookxporter.sync.GoogleCalendarClient')
+    def test_synchronize_finishes_metrics_of_failed_cycle(self, _, m_sync_calendar):
+        m_sync_calendar.return_value = CalendarSyncResult(calendar_id="11")
+        self.snook_app_client.commit_cache.side_effect = OSError("disk full")
+
+        with self.assertRaises(OSError):
+            self.synchronizer.synchronize()
+
+        self.assertIsNone(self.synchronizer.metrics.results)
+        self.assertIsNotNone(self.synchronizer.metrics.duration)
+
+    def test_close_closes_state(self):
+        self.synchronizer.close()
+
+        self.state.close.assert_called_once()
+
+
+class ScheduleHashTest(TestCase):
+
+    def test_schedule_digest_hashes_schedule_while_it_is_consumed(self):
+        schedule = [{"date": "1955-11-04"}, {"date": "1955-11-05"}]
+        digest = ScheduleDigest()
+
+        days = list(digest.track(iter(schedule)))
+
+        self.assertListEqual(schedule, days)
+        self.assertEqual(get_schedule_hash(schedule), digest.hexdigest())
+
+    def test_get_schedule_hash_depends_on_content_only(self):
+        self.assertEqual(get_schedule_hash([{"a": 1, "b": 2}]), get_schedule_hash([{"b": 2, "a": 1}]))
+        self.assertNotEqual(get_schedule_hash([{"a": 1}]), get_schedule_hash([{"a": 2}]))
+
+    def test_get_calendar_schedule_hash_depends_on_players_aliases(self):
+        players = [Player(first_name="Marty", last_name="McFly")]
+        aliased_players = [Player(first_name="Marty", last_name="McFly", alias="MM")]
+
+        self.assertNotEqual(
+            get_calendar_schedule_hash("schedule_hash", players),
+            get_calendar_schedule_hash("schedule_hash", aliased_players),
+        )
+
+
+class GetDifferencesTest(TestCase):
+    def setUp(self):
+        self.scheduled = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Emmet", last_name="Brown"),
+            start=datetime(1955, 11, 4, 6, 30),
+            end=datetime(1955, 11, 4, 7, 30),
+            table=1,
+        )
+        self.finished = Match(
+            host=Player(first_name="Marty", last_name="McFly"),
+            guest=Player(first_name="Emmet", last_name="Brown"),
+            start=datetime(1955, 11, 4, 6, 30),
+            end=datetime(1955, 11, 4, 7, 30),
+            host_score=3,
+            guest_score=2,
+            table=1,
+        )
+
+    def test_get_differences_updates_events_of_the_same_fixture_with_different_content_hash(self):
+        outdated = CalendarEvent(
+            item_id="outdated", key=self.scheduled.get_key(), content_hash=self.scheduled.get_content_hash()
+        )
+
+        unrelated = CalendarEvent(item_id="unrelated", key="other_key", content_hash="other_hash")
+
+        to_add, to_update, to_remove = get_differences(matches=[self.finished], events=[outdated, unrelated])
+
+        self.assertListEqual([], to_add)
+        self.assertListEqual([(outdated, self.finished)], to_update)
+        self.assertListEqual([unrelated], to_remove)
+
+    def test_get_differences_adds_matches_without_event_of_the_same_fixture(self):
+        to_add, to_update, to_remove = get_differences(matches=[self.finished], events=[])
+
+        self.assertListEqual([self.finished], to_add)
+        self.assertListEqual([], to_update)
+        self.assertListEqual([], to_remove)
+
+    def test_get_differences_keeps_one_event_and_removes_duplicates_and_unmarked_events(self):
+        content_hash = self.finished.get_content_hash()
+        first = CalendarEvent(item_id="first", key=self.finished.get_key(), content_hash=content_hash)
+        duplicate = CalendarEvent(item_id="duplicate", key=self.finished.get_key(), content_hash=content_hash)
+        unmarked = CalendarEvent(item_id="unmarked")
+
+        to_add, to_update, to_remove = get_differences(matches=[self.finished], events=[first, duplicate, unmarked])
+
+        self.assertListEqual([], to_add)
+        self.assertListEqual([], to_update)
+        self.assertListEqual([duplicate, unmarked], to_remove)
+
+
+class LogSummaryTest(TestCase):
+
+    def test_log_summary_logs_every_calendar_and_totals(self):
+        results = [
+            CalendarSyncResult(calendar_id="first", added=2, updated=3, removed=1),
+            CalendarSyncResult(calendar_id="second", error=RuntimeError("boom")),
+            CalendarSyncResult(calendar_id="third", unchanged=True),
+        ]
+
+        with self.assertLogs("snookxporter.sync", level="INFO") as logs:
+            log_summary(results)
+
+        self.assertEqual([
+            "INFO:snookxporter.sync:Synchronized calendar first: added 2, updated 3, removed 1, failed 0",
+            "ERROR:snookxporter.sync:Synchronized calendar second: error: RuntimeError('boom')",
+            "INFO:snookxporter.sync:Synchronized calendar third: unchanged",
+            "INFO:snookxporter.sync:Synchronized 2/3 calendars (1 unchanged): added 2, updated 3, removed 1, "
+            "failed 0",
+        ], logs.output)